@@ -1,21 +1,15 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import ast
 import gzip
 import hashlib
-import io
 import json
 import os
 import re
-import shutil
 import sys
-import tempfile
 import traceback
-import zipfile
 from collections import Counter, defaultdict
 from datetime import datetime, timezone
-from urllib.request import Request, urlopen
 from typing import Any, Dict, List, Optional
 
 import streamlit as st
@@ -30,6 +24,20 @@ except Exception:
 
 from dotenv import load_dotenv
 
+from graph_columnar import (PYARROW_AVAILABLE, ColumnarGraph, has_columnar, save_columnar_from_compact,
+                            save_columnar_from_v1)
+from graph_stats import (compute_graph_stats, load_graph_stats, save_graph_stats, stats_aggregates,
+                         summary_from_stats)
+from graph_view import CompactGraphView, V1GraphView, graph_view
+from import_postings import add_import_postings
+from import_resolution import add_file_deps, import_module_names
+from artifact_catalog import artifact_label, list_artifacts, record_artifact
+from load_cache import cached_load
+from repo_fetch import fetch_repo_archive, get_default_branch
+from file_classifier import FileClassifier
+from repo_scan import (ParseReport, ZipRepoSource, content_keys, count_skipped, open_local_repo_source,
+                       open_repo_source, scan_repo_files)
+
 # ===================== Load environment variables =====================
 
 load_dotenv()
@@ -42,29 +50,29 @@ DEFAULT_MANIFEST_BASE = os.path.join(os.getcwd(), ".cache", "graphs_compact") #
 os.makedirs(DEFAULT_V1_DIR, exist_ok=True)
 os.makedirs(DEFAULT_V2_DIR, exist_ok=True)
 
-SKIP_DIRS = {
-    ".git", "__pycache__", "venv", ".venv", "build", "dist", "node_modules",
-    ".mypy_cache", ".pytest_cache", "target", "out", ".gradle", ".idea"
-}
-MAX_FILE_BYTES = 2 * 1024 * 1024  # 2MB per file safety limit
-
-# Language sets by extension
-PY_EXTS   = {"py"}
-JS_TS_EXTS= {"js", "jsx", "ts", "tsx", "mjs", "cjs"}
-JAVA_EXTS = {"java"}
-GO_EXTS   = {"go"}
-C_EXTS    = {"c", "h"}
-CPP_EXTS  = {"cc", "cpp", "cxx", "hpp", "hh", "hxx", "h++", "c++"}
-RUST_EXTS = {"rs"}
-RUBY_EXTS = {"rb"}
-PHP_EXTS  = {"php"}
-KT_EXTS   = {"kt", "kts"}
-
 # ===================== Utilities =====================
 
 def now_iso():
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
 
+def show_parse_report(parse: dict, skipped: Optional[dict] = None):
+    """
+    Parse budget fallbacks and slowest files of a build (meta["parse"], see
+    repo_scan.ParseReport, which also counts copies of already parsed files), plus
+    the generated/vendored files it skipped (totals["skipped"]).
+    """
+    if skipped:
+        st.caption("Skipped without parsing: " + ", ".join(f"{n} {reason}" for reason, n in sorted(skipped.items())))
+    if parse.get("duplicates"):
+        st.caption(f"{parse['duplicates']} file(s) were byte-identical copies and reused an earlier parse.")
+    fallbacks = set(parse.get("fallbacks", []))
+    if fallbacks:
+        st.warning(f"{len(fallbacks)} file(s) exceeded the {parse['budget_s']:g}s parse budget "
+                   f"and were scanned line by line: {', '.join(sorted(fallbacks)[:10])}")
+    if parse.get("slowest"):
+        with st.expander(f"Slowest files to parse ({parse['files']} parsed, {parse['total_ms'] / 1000:.1f}s total)"):
+            st.table([{"File": p, "Parse (ms)": ms, "Line fallback": p in fallbacks} for p, ms in parse["slowest"]])
+
 def sanitize_repo_name(name: str) -> str:
     return re.sub(r"[^\w\-\.]+", "-", name).strip("-")
 
@@ -87,92 +95,6 @@ def parse_github_url(url: str):
     subpath = (subpath or "").lstrip("/")
     return {"owner": owner, "repo": repo, "branch": branch, "subpath": subpath, "kind": kind or "repo"}
 
-def http_get_json(url: str, token: Optional[str] = None):
-    headers = {"User-Agent": "streamlit-kg-app"}
-    if token:
-        headers["Authorization"] = f"Bearer {token}"
-    req = Request(url, headers=headers)
-    with urlopen(req, timeout=30) as resp:
-        return json.load(io.TextIOWrapper(resp, encoding="utf-8"))
-
-def get_default_branch(owner: str, repo: str, token: Optional[str] = None) -> str:
-    try:
-        info = http_get_json(f"https://api.github.com/repos/{owner}/{repo}", token=token)
-        if info.get("default_branch"):
-            return info["default_branch"]
-    except Exception:
-        pass
-    for candidate in ("main", "master"):
-        if can_download_zip(owner, repo, candidate):
-            return candidate
-    return "main"
-
-def can_download_zip(owner: str, repo: str, branch: str) -> bool:
-    url = f"https://codeload.github.com/{owner}/{repo}/zip/refs/heads/{branch}"
-    try:
-        req = Request(url, headers={"User-Agent": "streamlit-kg-app"})
-        with urlopen(req, timeout=10) as resp:
-            return resp.status == 200
-    except Exception:
-        return False
-
-def download_repo_zip(owner: str, repo: str, branch: str) -> bytes:
-    url = f"https://codeload.github.com/{owner}/{repo}/zip/refs/heads/{branch}"
-    req = Request(url, headers={"User-Agent": "streamlit-kg-app"})
-    with urlopen(req, timeout=60) as resp:
-        return resp.read()
-
-def unzip_to_temp(zip_bytes: bytes) -> str:
-    tmpdir = tempfile.mkdtemp(prefix="ghrepo_")
-    with zipfile.ZipFile(io.BytesIO(zip_bytes)) as zf:
-        zf.extractall(tmpdir)
-    entries = [os.path.join(tmpdir, d) for d in os.listdir(tmpdir)]
-    dirs = [p for p in entries if os.path.isdir(p)]
-    if not dirs:
-        raise RuntimeError("Unexpected ZIP structure.")
-    # pick largest
-    return max(dirs, key=lambda p: sum(len(files) for _, _, files in os.walk(p)))
-
-def detect_lang_by_ext(ext: str) -> str:
-    e = ext.lower().lstrip(".")
-    if e in PY_EXTS: return "python"
-    if e in JS_TS_EXTS: return "javascript"
-    if e in JAVA_EXTS: return "java"
-    if e in GO_EXTS: return "go"
-    if e in CPP_EXTS or e in C_EXTS: return "cpp" if e in CPP_EXTS else "c"
-    if e in RUST_EXTS: return "rust"
-    if e in RUBY_EXTS: return "ruby"
-    if e in PHP_EXTS: return "php"
-    if e in KT_EXTS: return "kotlin"
-    return "text"
-
-def iter_repo_files(root_dir: str, subpath: Optional[str] = None, max_files: Optional[int] = None):
-    base = os.path.join(root_dir, subpath) if subpath else root_dir
-    count = 0
-    for dirpath, dirnames, filenames in os.walk(base):
-        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.startswith(".")]
-        for fn in filenames:
-            abs_path = os.path.join(dirpath, fn)
-            rel_path = os.path.relpath(abs_path, root_dir).replace("\\", "/")
-            yield abs_path, rel_path
-            count += 1
-            if max_files and count >= max_files:
-                return
-def read_text_file(path: str) -> Optional[str]:
-    try:
-        if os.path.getsize(path) > MAX_FILE_BYTES:
-            return None
-        with open(path, "rb") as f:
-            data = f.read()
-        if b"\x00" in data:
-            return None
-        try:
-            return data.decode("utf-8")
-        except UnicodeDecodeError:
-            return data.decode("utf-8", errors="ignore")
-    except Exception:
-        return None
-
 def ensure_dir(path: str) -> str:
     os.makedirs(path, exist_ok=True)
     return path
@@ -193,6 +115,10 @@ def load_json_autoz(path: str) -> Dict[str, Any]:
 
 from typing import Dict, Any
 
+def load_json_cached(path: str) -> Dict[str, Any]:
+    """load_json_autoz memoized across reruns (load_cache); treat the result as read-only."""
+    return cached_load(path, load_json_autoz)
+
 def wiki_default_output_path(graph_meta: Dict[str, Any]) -> str:
     """
     Save XML like we save graphs:
@@ -216,171 +142,6 @@ def wiki_partial_output_path(graph_meta: Dict[str, Any], shard_name: str) -> str
     return os.path.join(base_dir, fname)
 
 
-# ===================== Language Parsers =====================
-
-def parse_python_text(py_src: str):
-    classes, imports, functions = [], [], []
-    try:
-        tree = ast.parse(py_src)
-    except SyntaxError:
-        return classes, imports, functions
-    if hasattr(tree, "body"):
-        for n in tree.body:
-            if isinstance(n, ast.FunctionDef) or isinstance(n, ast.AsyncFunctionDef):
-                functions.append(n.name)
-    for node in ast.walk(tree):
-        if isinstance(node, ast.ClassDef):
-            classes.append(node.name)
-        elif isinstance(node, ast.Import):
-            for alias in node.names:
-                imports.append({"type": "import", "module": alias.name, "names": [], "level": 0})
-        elif isinstance(node, ast.ImportFrom):
-            mod = node.module or ""
-            names = [alias.name for alias in node.names]
-            imports.append({"type": "from", "module": mod, "names": names, "level": node.level or 0})
-    return classes, imports, functions
-
-_ident = r"[A-Za-z_][A-Za-z0-9_]*"
-_js_ident = r"[A-Za-z_$][A-Za-z0-9_$]*"
-
-def parse_js_ts_text(src: str):
-    classes, imports, functions = [], [], []
-    for m in re.finditer(rf"\bclass\s+({_js_ident})\b", src):
-        classes.append(m.group(1))
-    for m in re.finditer(r"""import\s+(?:[\s\S]*?\s+from\s+)?'"['"]""", src):
-        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
-    for m in re.finditer(r"""require\(\s*['"]([^'"\)""", src):
-        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
-    for m in re.finditer(rf"\bfunction\s+({_js_ident})\s*\(", src):
-        functions.append(m.group(1))
-    for m in re.finditer(rf"\bexport\s+function\s+({_js_ident})\s*\(", src):
-        functions.append(m.group(1))
-    for m in re.finditer(rf"\b(?:const|let|var)\s+({_js_ident})\s*=\s*function\b", src):
-        functions.append(m.group(1))
-    for m in re.finditer(rf"\b(?:const|let|var)\s+({_js_ident})\s*=\s*\(", src):
-        functions.append(m.group(1))
-    return classes, imports, list(dict.fromkeys(functions))
-
-def parse_java_text(src: str):
-    classes, imports, functions = [], [], []
-    for m in re.finditer(rf"\b(class|interface|enum)\s+({_ident})\b", src):
-        classes.append(m.group(2))
-    for m in re.finditer(r"\bimport\s+([a-zA-Z0-9_\.]+)\s*;", src):
-        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
-    return classes, imports, functions
-
-def parse_go_text(src: str):
-    classes, imports, functions = [], [], []
-    for m in re.finditer(r'import\s+"([^"]+)"', src):
-        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
-    block = re.search(r"import\s*\((.*?)\)", src, re.S)
-    if block:
-        for m in re.finditer(r'"([^"]+)"', block.group(1)):
-            imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
-    for m in re.finditer(rf"\btype\s+({_ident})\s+struct\b", src):
-        classes.append(m.group(1))
-    for m in re.finditer(rf"\bfunc\s+(?:\([^)]+\)\s*)?({_ident})\s*\(", src):
-        functions.append(m.group(1))
-    return classes, imports, functions
-
-def parse_c_cpp_text(src: str):
-    """
-    Heuristic parsing for C/C++:
-      - #include "..." and #include <...>  -> imports
-      - class/struct <Name>                -> classes
-      - top-level function definitions     -> functions (declarations excluded)
-    """
-    import re
-
-    classes, imports, functions = [], [], []
-
-    # Includes: #include <header> or #include "header"
-    include_pattern = r'#\s*include\s*<"[>"]'
-    for m in re.finditer(include_pattern, src):
-        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
-
-    # Identifier pattern
-    _ident = r"[A-Za-z_][A-Za-z0-9_]*"
-
-    # class/struct names
-    for m in re.finditer(rf"\b(class|struct)\s+({_ident})\b", src):
-        classes.append(m.group(2))
-
-    # Heuristic top-level function definition (requires a body '{', avoids ';' declarations)
-    # Examples matched:
-    #   int foo(int a) { ... }
-    #   static inline MyType ns::Class::method(T x) { ... }
-    #   template<typename T> T bar(T x) { ... }
-    func_pattern = (
-        r"(?m)^[ \t]*"                 # line start
-        r"[A-Za-z_][\w:\s\*\&\<\>]*\s+" # return type / qualifiers
-        r"(" + _ident + r")"           # function name (capture)
-        r"\s*\([^;]*\)"                # args (not containing ';')
-        r"\s*\{"                       # opening brace of body
-    )
-    for m in re.finditer(func_pattern, src):
-        functions.append(m.group(1))
-
-    # De-dup preserve order
-    functions = list(dict.fromkeys(functions))
-    return classes, imports, functions
-
-def parse_rust_text(src: str):
-    classes, imports, functions = [], [], []
-    for m in re.finditer(r"\buse\s+([A-Za-z0-9_:\{\}\*,\s]+);", src):
-        mod = re.sub(r"\s+", " ", m.group(1)).strip()
-        imports.append({"type": "import", "module": mod, "names": [], "level": 0})
-    for m in re.finditer(rf"\b(struct|enum)\s+({_ident})\b", src):
-        classes.append(m.group(2))
-    for m in re.finditer(rf"\bfn\s+({_ident})\s*\(", src):
-        functions.append(m.group(1))
-    return classes, imports, functions
-
-def parse_ruby_text(src: str):
-    classes, imports, functions = [], [], []
-    for m in re.finditer(rf"\bclass\s+({_ident})\b", src):
-        classes.append(m.group(1))
-    for m in re.finditer(r"""(?:require|require_relative)\s+'"['"]""", src):
-        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
-    for m in re.finditer(rf"(?m)^\s*def\s+({_ident})\b", src):
-        functions.append(m.group(1))
-    return classes, imports, functions
-
-def parse_php_text(src: str):
-    classes, imports, functions = [], [], []
-    for m in re.finditer(rf"\bclass\s+({_ident})\b", src):
-        classes.append(m.group(1))
-    for m in re.finditer(rf"\bfunction\s+({_ident})\s*\(", src):
-        functions.append(m.group(1))
-    for m in re.finditer(rf"\buse\s+([A-Za-z0-9_\\]+)\s*;", src):
-        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
-    return classes, imports, functions
-
-def parse_kotlin_text(src: str):
-    classes, imports, functions = [], [], []
-    for m in re.finditer(rf"\b(class|object|interface)\s+({_ident})\b", src):
-        classes.append(m.group(2))
-    for m in re.finditer(rf"\bimport\s+([A-Za-z0-9_\.]+)\s*", src):
-        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
-    for m in re.finditer(rf"\bfun\s+({_ident})\s*\(", src):
-        functions.append(m.group(1))
-    return classes, imports, functions
-
-def parse_any_text_by_ext(ext: str, text: str):
-    e = ext.lower().lstrip(".")
-    if e in PY_EXTS: return parse_python_text(text)
-    if e in JS_TS_EXTS: return parse_js_ts_text(text)
-    if e in JAVA_EXTS: return parse_java_text(text)
-    if e in GO_EXTS: return parse_go_text(text)
-    if e in C_EXTS or e in CPP_EXTS: return parse_c_cpp_text(text)
-    if e in RUST_EXTS: return parse_rust_text(text)
-    if e in RUBY_EXTS: return parse_ruby_text(text)
-    if e in PHP_EXTS: return parse_php_text(text)
-    if e in KT_EXTS: return parse_kotlin_text(text)
-    return [], [], []
-
-
-
 # ===================== Relevance Guard: Signals, Allowed Sections, Pruning =====================
 
 def _norm_title(s: str) -> str:
@@ -676,13 +437,18 @@ def first_existing_path(paths: List[str]) -> Optional[str]:
 
 # ===================== Graph Builders =====================
 
-def build_repo_kg_v1(root_dir: str, subpath: Optional[str] = None, progress=None, max_files: Optional[int] = None):
+def build_repo_kg_v1(root_dir, subpath: Optional[str] = None, progress=None, max_files: Optional[int] = None,
+                     workers: Optional[int] = None, parse_report: Optional[ParseReport] = None,
+                     skip_generated: bool = True):
     """
     Verbose v1: nodes + edges
+    (root_dir: directory or repo source; parsed by `workers` processes, merged in file order,
+    byte-identical files parsed once; per-file parse timings go to parse_report when given; with skip_generated,
+    generated/minified/vendored files keep a file node tagged "skipped" but are not parsed)
     """
     graph = {"nodes": [], "edges": []}
     nodes_index = {}
-    totals = {"files": 0, "classes": 0, "imports": 0, "functions": 0}
+    totals = {"files": 0, "classes": 0, "imports": 0, "functions": 0, "skipped": {}}
 
     def add_node(node_id, node_type, label, **props):
         if node_id in nodes_index: return
@@ -696,25 +462,31 @@ def build_repo_kg_v1(root_dir: str, subpath: Optional[str] = None, progress=None
         edge.update(props)
         graph["edges"].append(edge)
 
-    file_list = list(iter_repo_files(root_dir, subpath, max_files=max_files))
+    source = open_repo_source(root_dir)
+    file_list = list(source.iter_files(subpath, max_files=max_files))
     n = len(file_list)
+    classifier = FileClassifier.from_source(source, file_list, subpath) if skip_generated else None
 
-    for i, (abs_path, rel_path) in enumerate(file_list, start=1):
+    scans = scan_repo_files(file_list, workers=workers, source=source, classifier=classifier,
+                            dedup_keys=content_keys(file_list, source))
+    for i, (rel_path, scanned) in enumerate(scans, start=1):
         if progress:
             progress.progress(min(i / max(n, 1), 1.0), text=f"Scanning {rel_path} ({i}/{n})")
+        if parse_report:
+            parse_report.add(rel_path, scanned)
 
-        ext = os.path.splitext(rel_path)[1]
-        lang = detect_lang_by_ext(ext)
-        file_text = read_text_file(abs_path)
+        lang = scanned["lang"]
 
         file_node_id = f"file:{rel_path}"
-        add_node(file_node_id, "file", rel_path, path=rel_path, lang=lang)
+        reason = count_skipped(totals, scanned)
+        tags = {"skipped": reason} if reason else {}
+        add_node(file_node_id, "file", rel_path, path=rel_path, lang=lang, **tags)
         totals["files"] += 1
 
-        if not file_text:
+        if not scanned["has_text"]:
             continue
 
-        classes, imports, functions = parse_any_text_by_ext(ext, file_text)
+        classes, imports, functions = scanned["classes"], scanned["imports"], scanned["functions"]
 
         for cls in classes:
             class_node_id = f"class:{rel_path}#{cls}"
@@ -745,13 +517,25 @@ def save_graph_v1(cache_dir: str, meta: dict, graph: dict) -> str:
     out_path = os.path.join(cache_dir, filename)
     with open(out_path, "w", encoding="utf-8") as f:
         json.dump({"meta": meta, **graph}, f, ensure_ascii=False, indent=2)
+    if PYARROW_AVAILABLE:
+        save_columnar_from_v1(out_path, meta, graph)
+    save_graph_stats(out_path, compute_graph_stats(graph, meta))
+    record_artifact(out_path, "graph_v1", meta)
     return out_path
 
-def build_repo_compact_v2(root_dir: str, subpath: Optional[str] = None, progress=None, max_files: Optional[int] = None):
+def build_repo_compact_v2(root_dir, subpath: Optional[str] = None, progress=None, max_files: Optional[int] = None,
+                          workers: Optional[int] = None, parse_report: Optional[ParseReport] = None,
+                          skip_generated: bool = True):
     """
     Compact v2:
       - Global dicts.imports (deduped)
       - Per-file records: path, lang, classes[], functions[], imports[] (indices)
+    root_dir is a directory or a repo source (e.g. repo_scan.ZipRepoSource).
+    Parsing fans out over `workers` processes; results are merged in file order,
+    so import indices match a serial build. Byte-identical files are parsed once
+    (repo_scan.content_keys). Per-file parse timings go to
+    parse_report when given. With skip_generated, generated / minified /
+    vendored files are not parsed; their records carry "skipped" (the reason).
     """
     files = []
     import_to_idx = {}
@@ -763,26 +547,30 @@ def build_repo_compact_v2(root_dir: str, subpath: Optional[str] = None, progress
             imports_list.append(name)
         return import_to_idx[name]
 
-    file_list = list(iter_repo_files(root_dir, subpath, max_files=max_files))
+    source = open_repo_source(root_dir)
+    file_list = list(source.iter_files(subpath, max_files=max_files))
     n = len(file_list)
-    totals = {"files": 0, "classes": 0, "functions": 0, "imports": 0}
+    totals = {"files": 0, "classes": 0, "functions": 0, "imports": 0, "skipped": {}}
+    classifier = FileClassifier.from_source(source, file_list, subpath) if skip_generated else None
 
-    for i, (abs_path, rel_path) in enumerate(file_list, start=1):
+    scans = scan_repo_files(file_list, workers=workers, source=source, classifier=classifier,
+                            dedup_keys=content_keys(file_list, source))
+    for i, (rel_path, scanned) in enumerate(scans, start=1):
         if progress:
             progress.progress(min(i / max(n, 1), 1.0), text=f"Scanning {rel_path} ({i}/{n})")
+        if parse_report:
+            parse_report.add(rel_path, scanned)
 
-        ext = os.path.splitext(rel_path)[1]
-        lang = detect_lang_by_ext(ext)
-        text = read_text_file(abs_path)
-
-        rec = {"path": rel_path, "lang": lang, "classes": [], "functions": [], "imports": []}
+        rec = {"path": rel_path, "lang": scanned["lang"], "classes": [], "functions": [], "imports": []}
         totals["files"] += 1
+        if count_skipped(totals, scanned):
+            rec["skipped"] = scanned["skipped"]
 
-        if not text:
+        if not scanned["has_text"]:
             files.append(rec)
             continue
 
-        classes, imports, functions = parse_any_text_by_ext(ext, text)
+        classes, imports, functions = scanned["classes"], scanned["imports"], scanned["functions"]
 
         if classes:
             rec["classes"] = sorted(set(classes))
@@ -795,10 +583,7 @@ def build_repo_compact_v2(root_dir: str, subpath: Optional[str] = None, progress
         if imports:
             mods = []
             for imp in imports:
-                module = (imp.get("module") or "").strip()
-                if not module:
-                    continue
-                mods.append(module)
+                mods.extend(import_module_names(imp))
             if mods:
                 mods = sorted(set(mods))
                 rec["imports"] = [get_import_index(m) for m in mods]
@@ -820,6 +605,8 @@ def save_json_gz(obj: dict, path: str):
 
 def save_compact_graph_v2(cache_dir: str, meta: dict, compact: dict, gzip_out: bool = True) -> str:
     compact["meta"] = meta | {"schema": "v2-compact"}
+    add_import_postings(compact)
+    add_file_deps(compact)
     base_name = f"{meta['owner']}__{meta['repo']}__{meta['branch']}__{meta['graph_id']}__v2.json"
     base_name = base_name.replace("/", "_")
     out_path = os.path.join(cache_dir, base_name + (".gz" if gzip_out else ""))
@@ -829,13 +616,38 @@ def save_compact_graph_v2(cache_dir: str, meta: dict, compact: dict, gzip_out: b
         ensure_dir(os.path.dirname(out_path))
         with open(out_path, "w", encoding="utf-8") as f:
             json.dump(compact, f, ensure_ascii=False, separators=(",", ":"))
+    if PYARROW_AVAILABLE:
+        # Columnar copy (<name>.columnar/) read lazily by Preview and the single-pass wiki
+        save_columnar_from_compact(out_path, compact["meta"], compact)
+    save_graph_stats(out_path, compute_graph_stats(compact))
+    record_artifact(out_path, "graph_v2", compact["meta"])
     return out_path
 
+def compact_import_dict(files: List[Dict[str, Any]], imports: List[str]):
+    """
+    Return (files, imports) restricted to the modules the files reference,
+    renumbered by first use. Used for shard-local dictionaries, so a shard's
+    size and load time depend on its own content only.
+    """
+    remap, compacted = {}, []
+    out = []
+    for f in files:
+        idxs = f.get("imports", [])
+        for idx in idxs:
+            if idx not in remap:
+                remap[idx] = len(compacted)
+                compacted.append(imports[idx])
+        out.append(f | {"imports": [remap[idx] for idx in idxs]} if idxs else f)
+    return out, compacted
+
 def shard_compact_by_top_dir(compact: dict, out_dir: str, gzip_out: bool = True) -> dict:
     """
     Writes shards and a manifest:
       - out_dir/manifest.json[.gz]
       - out_dir/shards/shard__<topdir>.json[.gz]
+    Each shard carries its own compact import dictionary (compact_import_dict) and
+    its graph_stats block (listing each file's resolved deps from the whole graph);
+    the manifest keeps the aggregate part per shard.
     """
     imports = compact.get("dicts", {}).get("imports", [])
     files = compact.get("files", [])
@@ -849,9 +661,13 @@ def shard_compact_by_top_dir(compact: dict, out_dir: str, gzip_out: bool = True)
     ensure_dir(shards_dir)
 
     meta = compact.get("meta", {})
+    deps_view = CompactGraphView(compact)  # resolved deps reach files in other shards
     shard_records = []
     for top, flist in groups.items():
-        shard = {"meta": meta | {"shard": top}, "dicts": {"imports": imports}, "files": flist}
+        shard_files, shard_imports = compact_import_dict(flist, imports)
+        shard = {"meta": meta | {"shard": top}, "dicts": {"imports": shard_imports}, "files": shard_files}
+        add_import_postings(shard)
+        shard["stats"] = compute_graph_stats(shard, deps_view=deps_view)
         name = f"shard__{top or '_root'}.json" + (".gz" if gzip_out else "")
         path = os.path.join(shards_dir, name)
         if gzip_out:
@@ -859,7 +675,8 @@ def shard_compact_by_top_dir(compact: dict, out_dir: str, gzip_out: bool = True)
         else:
             with open(path, "w", encoding="utf-8") as f:
                 json.dump(shard, f, ensure_ascii=False, separators=(",", ":"))
-        shard_records.append({"topdir": top, "path": os.path.relpath(path, out_dir)})
+        shard_records.append({"topdir": top, "path": os.path.relpath(path, out_dir),
+                              "stats": stats_aggregates(shard["stats"])})
 
     manifest = {"meta": meta, "shards": shard_records, "imports_count": len(imports), "files_total": len(files)}
     man_path = os.path.join(out_dir, "manifest.json" + (".gz" if gzip_out else ""))
@@ -868,44 +685,9 @@ def shard_compact_by_top_dir(compact: dict, out_dir: str, gzip_out: bool = True)
     else:
         with open(man_path, "w", encoding="utf-8") as f:
             json.dump(manifest, f, ensure_ascii=False, separators=(",", ":"))
+    record_artifact(man_path, "manifest", meta, extra={"strategy": "top_dir", "shards": len(shard_records)})
     return manifest
 
-def expand_compact_to_v1(compact: dict) -> dict:
-    """
-    Reconstruct a v1-like graph (nodes+edges) from compact v2 for viewer/preview/wiki.
-    """
-    nodes, edges = [], []
-    imports = compact.get("dicts", {}).get("imports", [])
-    files = compact.get("files", [])
-
-    import_nodes_added = set()
-
-    for f in files:
-        file_id = f"file:{f['path']}"
-        nodes.append({"id": file_id, "type": "file", "label": f["path"], "path": f["path"], "lang": f.get("lang", "")})
-
-        for cname in f.get("classes", []):
-            cid = f"class:{f['path']}#{cname}"
-            nodes.append({"id": cid, "type": "class", "label": cname, "file": f["path"], "lang": f.get("lang", "")})
-            edges.append({"source": file_id, "target": cid, "type": "FILE_CONTAINS_CLASS"})
-
-        for gname in f.get("functions", []):
-            gid = f"function:{f['path']}#{gname}"
-            nodes.append({"id": gid, "type": "function", "label": gname, "file": f["path"], "lang": f.get("lang", "")})
-            edges.append({"source": file_id, "target": gid, "type": "FILE_CONTAINS_FUNCTION"})
-
-        for idx in f.get("imports", []):
-            if idx < 0 or idx >= len(imports): continue
-            mod = imports[idx]
-            iid = f"import:{mod}"
-            if iid not in import_nodes_added:
-                nodes.append({"id": iid, "type": "import", "label": mod, "kind": "import"})
-                import_nodes_added.add(iid)
-            edges.append({"source": file_id, "target": iid, "type": "FILE_IMPORTS"})
-
-    return {"meta": compact.get("meta", {}), "nodes": nodes, "edges": edges}
-
-
 # ===================== LLM (Local) for Wiki =====================
 
 def qgenie_generate_xml(
@@ -941,13 +723,30 @@ st.title("📚 GitHub → Knowledge Graph (Polyglot) → 🧩 Compact v2 + Shard
 
 with st.sidebar:
     st.header("Input")
-    gh_url = st.text_input(
-        "GitHub URL",
-        help="Examples:\n- https://github.com/pallets/flask\n- https://github.com/pallets/flask/tree/main/src\n- https://github.com/owner/repo/blob/main/path/to/file.js"
-    )
-    token = st.text_input("GitHub token (optional)", type="password",
-                          help="Improves API rate limits. Create a fine-grained token with minimal permissions.")
+    source_mode = st.radio("Source", ["GitHub URL", "Local path"], horizontal=True,
+                           help="Local path: a git working tree or bare repo (blobs read from the object "
+                                "database, no checkout) or a plain directory.")
+    if source_mode == "Local path":
+        local_path = st.text_input("Repository path", help="Working tree, bare repo (*.git) or plain directory.")
+        local_rev = st.text_input("Commit-ish (optional)", help="Branch, tag or SHA to read; defaults to HEAD.")
+        local_subpath = st.text_input("Subpath (optional)")
+        gh_url, token = "", ""
+    else:
+        gh_url = st.text_input(
+            "GitHub URL",
+            help="Examples:\n- https://github.com/pallets/flask\n- https://github.com/pallets/flask/tree/main/src\n- https://github.com/owner/repo/blob/main/path/to/file.js"
+        )
+        token = st.text_input("GitHub token (optional)", type="password",
+                              help="Improves API rate limits. Create a fine-grained token with minimal permissions.")
+        local_path = local_rev = local_subpath = ""
     max_files = st.number_input("Max files to scan (0 = no limit)", min_value=0, value=0, step=25)
+    scan_workers = st.number_input("Parse worker processes (0 = all cores)", min_value=0, value=0, step=1,
+                                   help="1 parses in a single worker process (the parse time budget cannot be "
+                                        "enforced from the app thread); results are identical for any value.")
+    skip_generated = st.checkbox("Skip generated / minified / vendored files", value=True,
+                                 help="Lockfiles, codegen output, minified bundles, vendor dirs, linguist-generated/"
+                                      "vendored (.gitattributes) and, for a plain local directory, .gitignore'd files keep a file "
+                                      "entry but are not parsed.")
 
     st.divider()
     st.header("Storage")
@@ -978,61 +777,89 @@ if run_btn:
     with tab_build:
         st.subheader("Build Log")
         try:
-            if not gh_url:
-                st.error("Please enter a GitHub URL.")
-                st.stop()
-
-            parts = parse_github_url(gh_url)
-            owner = parts["owner"]
-            repo = parts["repo"]
-            branch = parts["branch"] or get_default_branch(owner, repo, token=token)
-            subpath = parts["subpath"] or None
+            repo_src = None
+            if source_mode == "Local path":
+                if not local_path:
+                    st.error("Please enter a local repository path.")
+                    st.stop()
+                repo_src = open_local_repo_source(local_path, rev=local_rev.strip() or None)
+                info = repo_src.describe()
+                owner, repo, branch = info["owner"], info["repo"], info["branch"]
+                subpath = local_subpath.strip("/") or None
+                source_url, commit_sha = info["source_url"], info["commit_sha"]
+                # local graphs are keyed on the commit SHA (path for plain directories)
+                g_id = fingerprint(owner, repo, commit_sha or branch, subpath, commit_sha or source_url)
+            else:
+                if not gh_url:
+                    st.error("Please enter a GitHub URL.")
+                    st.stop()
+
+                parts = parse_github_url(gh_url)
+                owner = parts["owner"]
+                repo = parts["repo"]
+                branch = parts["branch"] or get_default_branch(owner, repo, token=token)
+                subpath = parts["subpath"] or None
+                source_url, commit_sha = gh_url, ""
+                g_id = fingerprint(owner, repo, branch, subpath, gh_url)
 
             st.write(f"**Repo:** `{owner}/{repo}`  |  **Branch:** `{branch}`  |  **Subpath:** `{subpath or '.'}`")
 
-            with st.status("Downloading repository...", expanded=False) as status:
-                zip_bytes = download_repo_zip(owner, repo, branch)
-                status.update(label="Downloaded ZIP ✔️")
+            if repo_src is None:
+                with st.status("Downloading repository...", expanded=False) as status:
+                    archive = fetch_repo_archive(owner, repo, branch, token=token)
+                    if archive["from_cache"]:
+                        status.update(label="Archive unchanged, using cached ZIP ✔️")
+                    else:
+                        status.update(label=f"Downloaded ZIP ({archive['bytes_downloaded'] / 1e6:.1f} MB) ✔️")
 
-            with st.status("Unzipping archive...", expanded=False) as status:
-                repo_root = unzip_to_temp(zip_bytes)
-                status.update(label="Unzipped ✔️")
+                with st.status("Reading archive index...", expanded=False) as status:
+                    repo_src = ZipRepoSource(archive["path"])
+                    commit_sha = archive["sha"] or ""
+                    status.update(label="Archive indexed (streaming, no extraction) ✔️")
 
             st.write("Scanning repository files (polyglot)...")
             progress = st.progress(0.0, text="Starting...")
             limit = max_files if max_files and max_files > 0 else None
 
-            g_id = fingerprint(owner, repo, branch, subpath, gh_url)
             meta_common = {
-                "source_url": gh_url,
+                "source_url": source_url,
                 "owner": owner,
                 "repo": repo,
                 "branch": branch,
                 "subpath": subpath or "",
                 "created_at": now_iso(),
                 "graph_id": g_id,
+                "commit_sha": commit_sha,
             }
 
             if storage_format == "Verbose v1 (legacy)":
-                graph_v1, totals = build_repo_kg_v1(repo_root, subpath=subpath, progress=progress, max_files=limit)
-                meta = meta_common | {"totals": totals}
+                parse_report = ParseReport()
+                graph_v1, totals = build_repo_kg_v1(repo_src, subpath=subpath, progress=progress, max_files=limit,
+                                                    workers=int(scan_workers) or None, parse_report=parse_report,
+                                                    skip_generated=skip_generated)
+                meta = meta_common | {"totals": totals, "parse": parse_report.to_meta()}
                 out_path = save_graph_v1(v1_dir, meta, graph_v1)
                 st.success("Verbose graph built and saved!")
                 c1, c2, c3, c4 = st.columns(4)
                 c1.metric("Files", totals["files"]); c2.metric("Classes", totals["classes"])
                 c3.metric("Functions", totals["functions"]); c4.metric("Imports", totals["imports"])
+                show_parse_report(meta["parse"], totals.get("skipped"))
                 st.code(out_path, language="bash")
                 with open(out_path, "r", encoding="utf-8") as f:
                     st.download_button("Download Graph JSON (v1)", f.read(), file_name=os.path.basename(out_path),
                                        mime="application/json", use_container_width=True)
             else:
-                compact, totals = build_repo_compact_v2(repo_root, subpath=subpath, progress=progress, max_files=limit)
-                meta = meta_common | {"totals": totals}
+                parse_report = ParseReport()
+                compact, totals = build_repo_compact_v2(repo_src, subpath=subpath, progress=progress, max_files=limit,
+                                                        workers=int(scan_workers) or None, parse_report=parse_report,
+                                                        skip_generated=skip_generated)
+                meta = meta_common | {"totals": totals, "parse": parse_report.to_meta()}
                 out_path = save_compact_graph_v2(v2_dir, meta, compact, gzip_out=gzip_out)
                 st.success("Compact v2 graph built and saved!")
                 c1, c2, c3, c4 = st.columns(4)
                 c1.metric("Files", totals["files"]); c2.metric("Classes", totals["classes"])
                 c3.metric("Functions", totals["functions"]); c4.metric("Imports", totals["imports"])
+                show_parse_report(meta["parse"], totals.get("skipped"))
                 st.code(out_path, language="bash")
                 if out_path.endswith(".gz"):
                     with gzip.open(out_path, "rt", encoding="utf-8") as f:
@@ -1052,11 +879,8 @@ if run_btn:
                     st.success(f"Manifest & shards written under: {out_dir}")
                     st.code(man_path, language="bash")
 
-            # Cleanup temp
-            try:
-                shutil.rmtree(os.path.dirname(repo_root))
-            except Exception:
-                pass
+            # Release the in-memory archive
+            repo_src.close()
 
             st.info("Next: use **Preview/Viewer** to explore, or **Generate Wiki** to create documentation XML.")
 
@@ -1073,53 +897,43 @@ with tab_preview:
         base_dir = v2_dir if mode != "Verbose v1" else v1_dir
 
         ensure_dir(base_dir)
-        # collect candidate files
-        files = []
-        if mode == "Verbose v1":
-            files = [os.path.join(base_dir, f) for f in os.listdir(base_dir) if f.lower().endswith(".json")]
-        elif mode == "Compact v2 (single)":
-            files = [os.path.join(base_dir, f) for f in os.listdir(base_dir) if f.endswith(".json") or f.endswith(".json.gz")]
-        else:
-            # list manifests under <v2>/<graph_id>/manifest.json[.gz]
-            for sub in os.listdir(base_dir):
-                man1 = os.path.join(base_dir, sub, "manifest.json")
-                man2 = man1 + ".gz"
-                if os.path.isfile(man1):
-                    files.append(man1)
-                if os.path.isfile(man2):
-                    files.append(man2)
-
-        files.sort(reverse=True)
+        # candidate files from the artifact catalog (manifests: <v2>/<graph_id>/manifest.json[.gz])
+        kind = {"Verbose v1": "graph_v1", "Compact v2 (single)": "graph_v2"}.get(mode, "manifest")
+        files = {r["path"]: artifact_label(r, base_dir) for r in list_artifacts(kind, base_dir)}
         if not files:
             st.info("No files found. Build graphs first.")
         else:
-            display = [os.path.relpath(p, base_dir) for p in files]
-            selected_rel = st.selectbox("Select a graph source", options=display, key="preview_select")
-            selected = os.path.join(base_dir, selected_rel)
-
-            # Load and normalize to v1-like
-            if mode == "Verbose v1":
-                data_v1 = load_json_autoz(selected)
+            selected = st.selectbox("Select a graph source", options=list(files), format_func=files.get,
+                                    key="preview_select")
+
+            # Per-file view: columnar copy when present, otherwise a lazy view over the loaded JSON.
+            # Both the loads and the per-file index are memoized, so filter/sort reruns reuse them.
+            # views answer the reverse import lookup of the "Imported module" filter
+            if mode != "Manifest (sharded)" and has_columnar(selected):
+                cg = cached_load(selected, ColumnarGraph, kind="columnar")
+                raw = {"meta": cg.meta}
+                views = [cg]
+                file_index = cached_load(selected, lambda _: cg.file_index(), kind="columnar_file_index")
+            elif mode == "Verbose v1":
+                raw = load_json_cached(selected)
+                views = [V1GraphView(raw)]
+                file_index = cached_load(selected, lambda _: views[0].file_index(), kind="file_index")
             elif mode == "Compact v2 (single)":
-                compact = load_json_autoz(selected)
-                data_v1 = expand_compact_to_v1(compact)
+                raw = load_json_cached(selected)
+                views = [CompactGraphView(raw)]
+                file_index = cached_load(selected, lambda _: views[0].file_index(), kind="file_index")
             else:
-                manifest = load_json_autoz(selected)
-                # merge shards into a single v1-like structure (may be heavy)
-                nodes_all, edges_all = [], []
-                for s in manifest.get("shards", []):
+                raw = load_json_cached(selected)
+                # merge the per-shard file views (shards hold disjoint files)
+                views, file_index = [], {}
+                for s in raw.get("shards", []):
                     spath = s.get("path")
                     if spath and not os.path.isabs(spath):
                         spath = os.path.join(os.path.dirname(selected), spath)
-                    shard = load_json_autoz(spath)
-                    v1 = expand_compact_to_v1(shard)
-                    nodes_all.extend(v1.get("nodes", []))
-                    edges_all.extend(v1.get("edges", []))
-                data_v1 = {"meta": manifest.get("meta", {}), "nodes": nodes_all, "edges": edges_all}
+                    views.append(CompactGraphView(load_json_cached(spath)))
+                    file_index.update(cached_load(spath, lambda _: views[-1].file_index(), kind="file_index"))
 
-            meta = data_v1.get("meta", {})
-            nodes = data_v1.get("nodes", [])
-            edges = data_v1.get("edges", [])
+            meta = raw.get("meta", {})
 
             st.write(
                 f"**Repo:** `{meta.get('owner','')}/{meta.get('repo','')}`  |  "
@@ -1127,50 +941,24 @@ with tab_preview:
                 f"**Subpath:** `{meta.get('subpath','') or '.'}`"
             )
 
-            # Build file-centric index
-            nodes_by_id = {n["id"]: n for n in nodes}
-            files_by_id = {n["id"]: n for n in nodes if n.get("type") == "file"}
-
-            file_index = {
-                fid: {
-                    "path": fnode.get("path", fnode.get("label", "")),
-                    "lang": fnode.get("lang", ""),
-                    "classes": [],
-                    "functions": [],
-                    "imports": [],
-                }
-                for fid, fnode in files_by_id.items()
-            }
-
-            for e in edges:
-                src = e.get("source"); dst = e.get("target"); etype = e.get("type")
-                if src not in file_index: continue
-                tnode = nodes_by_id.get(dst)
-                if not tnode: continue
-
-                if etype == "FILE_CONTAINS_CLASS" and tnode.get("type") == "class":
-                    file_index[src]["classes"].append(tnode.get("label", ""))
-                elif etype == "FILE_CONTAINS_FUNCTION" and tnode.get("type") == "function":
-                    file_index[src]["functions"].append(tnode.get("label", ""))
-                elif etype == "FILE_IMPORTS" and tnode.get("type") == "import":
-                    file_index[src]["imports"].append(tnode.get("label", ""))
-
-            for rec in file_index.values():
-                rec["classes"] = sorted(set([x for x in rec["classes"] if x]))
-                rec["functions"] = sorted(set([x for x in rec["functions"] if x]))
-                rec["imports"] = sorted(set([x for x in rec["imports"] if x]))
-
             st.markdown("### Files (Imports, Classes, Functions)")
 
             colf1, colf2, colf3 = st.columns([2, 1, 1])
             with colf1:
                 substr = st.text_input("Filter by file path (substring)", value="", key="file_filter")
                 substr_norm = substr.strip().lower()
+                import_filter = st.text_input("Imported module (exact name, shows its importers)", value="",
+                                              key="import_filter").strip()
             with colf2:
                 show_empty = st.checkbox("Show files with no detected symbols", value=False, key="show_empty_files")
             with colf3:
                 view_mode = st.radio("View as", options=["Expanders", "Table"], horizontal=True, key="file_view_mode")
 
+            importer_ids = None
+            if import_filter:
+                importer_ids = {f"file:{p}" for v in views for p in v.importers(import_filter)}
+                st.caption(f"{len(importer_ids)} file(s) import `{import_filter}`")
+
             sort_by = st.selectbox(
                 "Sort by",
                 options=["path", "lang", "imports", "classes", "functions"],
@@ -1181,11 +969,12 @@ with tab_preview:
 
             rows = []
             for fid, rec in file_index.items():
-                path = rec["path"] or files_by_id[fid].get("label", "")
+                path = rec["path"]
                 lang = rec.get("lang", "")
                 is_empty = not (rec["classes"] or rec["functions"] or rec["imports"])
                 if substr_norm and substr_norm not in path.lower(): continue
                 if not show_empty and is_empty: continue
+                if importer_ids is not None and fid not in importer_ids: continue
                 rows.append({
                     "id": fid, "path": path, "lang": lang,
                     "imports": rec["imports"], "classes": rec["classes"], "functions": rec["functions"],
@@ -1249,8 +1038,8 @@ with tab_preview:
                                 st.code("\n".join(r["functions"]) or "(none)")
 
             with st.expander("Raw JSON (first 300 lines)"):
-                # Show the underlying (expanded) v1 JSON currently in use
-                text = json.dumps(data_v1, indent=2, ensure_ascii=False).splitlines()
+                # Show the loaded document as stored (v1, compact v2 or manifest)
+                text = json.dumps(raw, indent=2, ensure_ascii=False).splitlines()
                 st.code("\n".join(text[:300]))
     except Exception as e:
         st.error(f"Failed to load cached graphs: {e}")
@@ -1292,42 +1081,44 @@ XML_SPEC = """Return your analysis in the following XML format:
 </wiki_structure>
 """
 
-def summarize_for_prompt_v1like(graph_v1: dict, max_files_in_prompt: int = 200, top_imports_k: int = 50) -> dict:
-    nodes = graph_v1.get("nodes", [])
-    edges = graph_v1.get("edges", [])
-    meta = graph_v1.get("meta", {})
-
-    nodes_by_id = {n["id"]: n for n in nodes}
-    file_nodes = [n for n in nodes if n.get("type") == "file"]
-
-    file_index = {
-        fn["id"]: {"path": fn.get("path", fn.get("label", "")), "lang": fn.get("lang", ""),
-                   "classes": [], "functions": [], "imports": []}
-        for fn in file_nodes
+def summarize_for_prompt_columnar(cg: ColumnarGraph, max_files_in_prompt: int = 200, top_imports_k: int = 50) -> dict:
+    """
+    summarize_for_prompt_v1like over a columnar graph: files are ranked on the
+    precomputed per-file counts and symbol lists are read only for the files
+    that make it into the prompt.
+    """
+    files_t = cg.table("files", ["path", "lang", "n_classes", "n_functions", "n_imports"])
+    paths = files_t["path"].to_pylist()
+    langs = [lang or "unknown" for lang in files_t["lang"].to_pylist()]
+    counts = [c + f + i for c, f, i in zip(files_t["n_classes"].to_pylist(), files_t["n_functions"].to_pylist(),
+                                           files_t["n_imports"].to_pylist())]
+    order = sorted(range(len(paths)), key=lambda i: (counts[i], paths[i].lower()), reverse=True)
+    files_included = [{"path": paths[i], "lang": langs[i], **cg.file_details(i), "symbol_count": counts[i]}
+                      for i in order[:max_files_in_prompt]]
+    top_dirs = Counter(p.split("/", 1)[0] for p in paths if "/" in p)
+    return {
+        "meta": cg.meta,
+        "langs": Counter(langs).most_common(),
+        "top_dirs": top_dirs.most_common(20),
+        "top_imports": cg.import_counts().most_common(top_imports_k),
+        "files": files_included,
+        "files_total": len(paths),
     }
-    for e in edges:
-        src = e.get("source"); dst = e.get("target"); etype = e.get("type")
-        if src not in file_index: continue
-        t = nodes_by_id.get(dst, {})
-        if etype == "FILE_CONTAINS_CLASS" and t.get("type") == "class":
-            file_index[src]["classes"].append(t.get("label", ""))
-        elif etype == "FILE_CONTAINS_FUNCTION" and t.get("type") == "function":
-            file_index[src]["functions"].append(t.get("label", ""))
-        elif etype == "FILE_IMPORTS" and t.get("type") == "import":
-            file_index[src]["imports"].append(t.get("label", ""))
+
+def summarize_for_prompt_v1like(graph: dict, max_files_in_prompt: int = 200, top_imports_k: int = 50) -> dict:
+    """Prompt summary of a v1 or compact v2 graph (read through graph_view, nothing is expanded)."""
+    view = graph_view(graph)
+    meta = view.meta
 
     files = []
     langs = Counter()
-    imports_counter = Counter()
-    for rec in file_index.values():
-        path = rec["path"]; lang = rec.get("lang") or "unknown"
-        classes = sorted(set(rec["classes"]))
-        functions = sorted(set(rec["functions"]))
-        imps = sorted(set(rec["imports"]))
+    imports_counter = view.import_counts()
+    for rec in view.iter_files():
+        lang = rec.get("lang") or "unknown"
         langs[lang] += 1
-        imports_counter.update(imps)
-        files.append({"path": path, "lang": lang, "classes": classes, "functions": functions, "imports": imps,
-                      "symbol_count": len(classes) + len(functions) + len(imps)})
+        files.append({"path": rec["path"], "lang": lang, "classes": rec["classes"], "functions": rec["functions"],
+                      "imports": rec["imports"],
+                      "symbol_count": len(rec["classes"]) + len(rec["functions"]) + len(rec["imports"])})
 
     files.sort(key=lambda r: (r["symbol_count"], r["path"].lower()), reverse=True)
     files_included = files[:max_files_in_prompt]
@@ -1353,6 +1144,7 @@ def build_prompt_single(summary: dict, lang_text: str) -> str:
         files_lines.append({
             "path": f["path"], "lang": f["lang"],
             "classes": f["classes"][:12], "functions": f["functions"][:12], "imports": f["imports"][:12],
+            "depends_on": f.get("depends_on", [])[:12],
         })
     return f"""You are a senior documentation architect.
 
@@ -1433,6 +1225,7 @@ def build_prompt_shard(owner_repo: str, source_url: str, lang_text: str, shard_n
         files_lines.append({
             "path": f["path"], "lang": f["lang"],
             "classes": f["classes"][:10], "functions": f["functions"][:10], "imports": f["imports"][:10],
+            "depends_on": f.get("depends_on", [])[:10],
         })
     return f"""You are a senior documentation architect.
 
@@ -1462,6 +1255,7 @@ def build_prompt_single_guarded(summary: dict, lang_text: str, allowed_sections_
         files_lines.append({
             "path": f["path"], "lang": f["lang"],
             "classes": f["classes"][:12], "functions": f["functions"][:12], "imports": f["imports"][:12],
+            "depends_on": f.get("depends_on", [])[:12],
         })
     return f"""You are a senior documentation architect.
 
@@ -1500,6 +1294,7 @@ def build_prompt_shard_guarded(owner_repo: str, source_url: str, lang_text: str,
         files_lines.append({
             "path": f["path"], "lang": f["lang"],
             "classes": f["classes"][:10], "functions": f["functions"][:10], "imports": f["imports"][:10],
+            "depends_on": f.get("depends_on", [])[:10],
         })
     return f"""You are a senior documentation architect.
 
@@ -1676,15 +1471,13 @@ with tab_wiki:
             base_dir = v2_dir if mode == "Compact v2 (single)" else v1_dir
             ensure_dir(base_dir)
 
-            candidates = [os.path.join(base_dir, f) for f in os.listdir(base_dir)
-                          if (f.endswith(".json") or f.endswith(".json.gz"))]
-            candidates.sort(reverse=True)
+            kind = "graph_v2" if mode == "Compact v2 (single)" else "graph_v1"
+            candidates = {r["path"]: artifact_label(r, base_dir) for r in list_artifacts(kind, base_dir)}
             if not candidates:
                 st.info("No graphs found. Build one first.")
                 st.stop()
-            display = [os.path.relpath(p, base_dir) for p in candidates]
-            selected_rel = st.selectbox("Select graph file", options=display, key="wiki_single_select")
-            selected = os.path.join(base_dir, selected_rel)
+            selected = st.selectbox("Select graph file", options=list(candidates), format_func=candidates.get,
+                                    key="wiki_single_select")
 
             max_files_in_prompt = st.number_input("Max files in prompt", 20, 1000, 200, step=10)
             top_imports_k = st.slider("Top-K imports", 10, 200, 50, step=5)
@@ -1693,13 +1486,25 @@ with tab_wiki:
             if run:
                 try:
 
-                    if mode == "Verbose v1":
-                        data_v1 = load_json_autoz(selected)
+                    stats = load_graph_stats(selected)
+                    summary = summary_from_stats(stats, max_files=int(max_files_in_prompt), top_imports_k=top_imports_k)
+                    if summary is not None:
+                        # aggregates saved at build time: no graph read at all
+                        graph_meta_loaded = stats.get("meta", {})
+                        all_paths = stats.get("paths", [])
+                    elif has_columnar(selected):
+                        cg = cached_load(selected, ColumnarGraph, kind="columnar")
+                        graph_meta_loaded = cg.meta
+                        all_paths = cg.column("files", "path")
+                        summary = summarize_for_prompt_columnar(cg, max_files_in_prompt=int(max_files_in_prompt), top_imports_k=top_imports_k)
+                    elif mode == "Verbose v1":
+                        data_v1 = load_json_cached(selected)
+                        graph_meta_loaded = data_v1.get("meta", {})
                         all_paths = _collect_all_paths_from_v1like(data_v1)
                         summary = summarize_for_prompt_v1like(data_v1, max_files_in_prompt=int(max_files_in_prompt), top_imports_k=top_imports_k)
                     else:
-                        compact = load_json_autoz(selected)
-                        data_v1 = expand_compact_to_v1(compact)
+                        compact = load_json_cached(selected)
+                        graph_meta_loaded = compact.get("meta", {})
                         all_paths = _collect_all_paths_from_compact(compact)
                         summary = summarize_for_prompt_v1like(compact, max_files_in_prompt=int(max_files_in_prompt), top_imports_k=top_imports_k)
 
@@ -1721,12 +1526,7 @@ with tab_wiki:
                     if strict_relevance:
                         xml_text = _prune_and_renumber_wiki(xml_text, allowed_norm, set(all_paths))
                     # Determine correct meta for naming
-                    graph_meta_for_save = {}
-                    if mode == "Verbose v1":
-                        graph_meta_for_save = data_v1.get("meta", {})
-                    else:
-                        # We loaded compact above, keep its meta
-                        graph_meta_for_save = compact.get("meta", {})
+                    graph_meta_for_save = graph_meta_loaded
                     
                     # Save using the standard path
                     final_path = wiki_default_output_path(graph_meta_for_save)
@@ -1756,19 +1556,12 @@ with tab_wiki:
         else:
             # Sharded pipeline
             ensure_dir(v2_dir)
-            manifests = []
-            for sub in os.listdir(v2_dir):
-                man1 = os.path.join(v2_dir, sub, "manifest.json")
-                man2 = man1 + ".gz"
-                if os.path.isfile(man1): manifests.append(man1)
-                if os.path.isfile(man2): manifests.append(man2)
-            manifests.sort(reverse=True)
+            manifests = {r["path"]: artifact_label(r, v2_dir) for r in list_artifacts("manifest", v2_dir)}
             if not manifests:
                 st.info("No manifests found. Build compact v2 with shards first.")
                 st.stop()
-            display = [os.path.relpath(m, v2_dir) for m in manifests]
-            selected_rel = st.selectbox("Select manifest", options=display, key="wiki_manifest_select")
-            manifest_path = os.path.join(v2_dir, selected_rel)
+            manifest_path = st.selectbox("Select manifest", options=list(manifests), format_func=manifests.get,
+                                         key="wiki_manifest_select")
 
             max_files_per_shard = st.number_input("Max files per shard (prompt)", 20, 1000, 200, step=10)
             refine = st.checkbox("Final refine pass", value=True)
@@ -1778,7 +1571,7 @@ with tab_wiki:
             if run_sharded:
                 try:
 
-                    manifest = load_json_autoz(manifest_path)
+                    manifest = load_json_cached(manifest_path)
                     graph_meta = manifest.get("meta", {})  # <-- use meta for naming
                     owner_repo = f"{graph_meta.get('owner','')}/{graph_meta.get('repo','')}".strip("/")
                     source_url = graph_meta.get("source_url", "")
@@ -1788,7 +1581,7 @@ with tab_wiki:
                         spath = s.get("path")
                         if spath and not os.path.isabs(spath):
                             spath = os.path.join(os.path.dirname(manifest_path), spath)
-                        shard = load_json_autoz(spath)
+                        shard = load_json_cached(spath)
                         all_paths.extend(_collect_all_paths_from_compact(shard))
                     signals = _derive_repo_signals_from_paths(all_paths)
                     allowed_norm, forbidden_norm = _allowed_forbidden_sections(signals)
@@ -1800,13 +1593,14 @@ with tab_wiki:
                         spath = s.get("path")
                         if spath and not os.path.isabs(spath):
                             spath = os.path.join(os.path.dirname(manifest_path), spath)
-                        shard = load_json_autoz(spath)
+                        shard = load_json_cached(spath)
 
                         shard_name = shard.get("meta", {}).get("shard") or f"shard{idx}"
                         safe_shard_name = shard_name.replace("/", "_")
                         dict_imports = shard.get("dicts", {}).get("imports", [])
                         files = shard.get("files", [])
-                        shard_summary = summarize_shard_files(files, dict_imports, max_files=int(max_files_per_shard))
+                        shard_summary = (summary_from_stats(shard.get("stats"), max_files=int(max_files_per_shard))
+                                         or summarize_shard_files(files, dict_imports, max_files=int(max_files_per_shard)))
 
                         if strict_relevance:
                             prompt = build_prompt_shard_guarded(owner_repo, source_url, lang_text, safe_shard_name, shard_summary, allowed_norm, forbidden_norm)
@@ -1,56 +1,63 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import ast
 import gzip
 import hashlib
-import io
 import json
 import textwrap
 import os
+import posixpath
 import re
-import shutil
 import sys
-import tempfile
 import traceback
-import zipfile
 from collections import Counter, defaultdict
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
-from urllib.request import Request, urlopen
+from typing import Any, Callable, Dict, List, Optional
 
 import streamlit as st
 from dotenv import load_dotenv
 
+from graph_stats import compute_graph_stats, stats_aggregates, summary_from_stats
+from graph_view import CompactGraphView
+from import_postings import add_import_postings
+from import_resolution import add_file_deps, import_module_names
+from artifact_catalog import artifact_label, list_artifacts, record_artifact
+from file_classifier import RULE_FILE_NAMES, FileClassifier
+from load_cache import cached_load
+from repo_fetch import fetch_repo_archive, get_default_branch
+from repo_scan import (PARSER_VERSION, ParseReport, ZipRepoSource, content_keys, count_skipped,
+                       is_readme_path, open_local_repo_source, open_repo_source, scan_repo_files)
+
 # ===================== Load environment variables =====================
 
 load_dotenv()
 # ===================== Paths / Config =====================
 DEFAULT_V2_DIR = os.path.join(os.getcwd(), ".cache", "graphs_compact")
 os.makedirs(DEFAULT_V2_DIR, exist_ok=True)
-MAX_FILE_BYTES = 2 * 1024 * 1024  # 2MB per file safety limit
-SKIP_DIRS = {
-    ".git", "__pycache__", "venv", ".venv", "build", "dist", "node_modules",
-    ".mypy_cache", ".pytest_cache", "target", "out", ".gradle", ".idea"
-}
-
-# Extension → language (heuristic)
-PY_EXTS   = {"py"}
-JS_TS_EXTS= {"js", "jsx", "ts", "tsx", "mjs", "cjs"}
-JAVA_EXTS = {"java"}
-GO_EXTS   = {"go"}
-C_EXTS    = {"c", "h"}
-CPP_EXTS  = {"cc", "cpp", "cxx", "hpp", "hh", "hxx", "h++", "c++"}
-RUST_EXTS = {"rs"}
-RUBY_EXTS = {"rb"}
-PHP_EXTS  = {"php"}
-KT_EXTS   = {"kt", "kts"}
 
 # ===================== Utilities =====================
 
 def now_iso():
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
 
+def show_parse_report(parse: dict, skipped: Optional[dict] = None):
+    """
+    Parse budget fallbacks and slowest files of a build (meta["parse"], see
+    repo_scan.ParseReport, which also counts copies of already parsed files), plus
+    the generated/vendored files it skipped (totals["skipped"]).
+    """
+    if skipped:
+        st.caption("Skipped without parsing: " + ", ".join(f"{n} {reason}" for reason, n in sorted(skipped.items())))
+    if parse.get("duplicates"):
+        st.caption(f"{parse['duplicates']} file(s) were byte-identical copies and reused an earlier parse.")
+    fallbacks = set(parse.get("fallbacks", []))
+    if fallbacks:
+        st.warning(f"{len(fallbacks)} file(s) exceeded the {parse['budget_s']:g}s parse budget "
+                   f"and were scanned line by line: {', '.join(sorted(fallbacks)[:10])}")
+    if parse.get("slowest"):
+        with st.expander(f"Slowest files to parse ({parse['files']} parsed, {parse['total_ms'] / 1000:.1f}s total)"):
+            st.table([{"File": p, "Parse (ms)": ms, "Line fallback": p in fallbacks} for p, ms in parse["slowest"]])
+
 def sanitize_repo_name(name: str) -> str:
     return re.sub(r"[^\w\-\.]+", "-", name).strip("-")
 
@@ -73,93 +80,6 @@ def parse_github_url(url: str):
     subpath = (subpath or "").lstrip("/")
     return {"owner": owner, "repo": repo, "branch": branch, "subpath": subpath, "kind": kind or "repo"}
 
-def http_get_json(url: str, token: Optional[str] = None):
-    headers = {"User-Agent": "streamlit-kg-app"}
-    if token:
-        headers["Authorization"] = f"Bearer {token}"
-    req = Request(url, headers=headers)
-    with urlopen(req, timeout=30) as resp:
-        return json.load(io.TextIOWrapper(resp, encoding="utf-8"))
-
-def get_default_branch(owner: str, repo: str, token: Optional[str] = None) -> str:
-    try:
-        info = http_get_json(f"https://api.github.com/repos/{owner}/{repo}", token=token)
-        if info.get("default_branch"):
-            return info["default_branch"]
-    except Exception:
-        pass
-    for candidate in ("main", "master"):
-        if can_download_zip(owner, repo, candidate):
-            return candidate
-    return "main"
-
-def can_download_zip(owner: str, repo: str, branch: str) -> bool:
-    url = f"https://codeload.github.com/{owner}/{repo}/zip/refs/heads/{branch}"
-    try:
-        req = Request(url, headers={"User-Agent": "streamlit-kg-app"})
-        with urlopen(req, timeout=10) as resp:
-            return resp.status == 200
-    except Exception:
-        return False
-
-def download_repo_zip(owner: str, repo: str, branch: str) -> bytes:
-    url = f"https://codeload.github.com/{owner}/{repo}/zip/refs/heads/{branch}"
-    req = Request(url, headers={"User-Agent": "streamlit-kg-app"})
-    with urlopen(req, timeout=60) as resp:
-        return resp.read()
-
-def unzip_to_temp(zip_bytes: bytes) -> str:
-    tmpdir = tempfile.mkdtemp(prefix="ghrepo_")
-    with zipfile.ZipFile(io.BytesIO(zip_bytes)) as zf:
-        zf.extractall(tmpdir)
-    entries = [os.path.join(tmpdir, d) for d in os.listdir(tmpdir)]
-    dirs = [p for p in entries if os.path.isdir(p)]
-    if not dirs:
-        raise RuntimeError("Unexpected ZIP structure.")
-    # pick largest by file count
-    return max(dirs, key=lambda p: sum(len(files) for _, _, files in os.walk(p)))
-
-def detect_lang_by_ext(ext: str) -> str:
-    e = ext.lower().lstrip(".")
-    if e in PY_EXTS: return "python"
-    if e in JS_TS_EXTS: return "javascript"
-    if e in JAVA_EXTS: return "java"
-    if e in GO_EXTS: return "go"
-    if e in CPP_EXTS or e in C_EXTS: return "cpp" if e in CPP_EXTS else "c"
-    if e in RUST_EXTS: return "rust"
-    if e in RUBY_EXTS: return "ruby"
-    if e in PHP_EXTS: return "php"
-    if e in KT_EXTS: return "kotlin"
-    return "text"
-
-def iter_repo_files(root_dir: str, subpath: Optional[str] = None, max_files: Optional[int] = None):
-    base = os.path.join(root_dir, subpath) if subpath else root_dir
-    count = 0
-    for dirpath, dirnames, filenames in os.walk(base):
-        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.startswith(".")]
-        for fn in filenames:
-            abs_path = os.path.join(dirpath, fn)
-            rel_path = os.path.relpath(abs_path, root_dir).replace("\\", "/")
-            yield abs_path, rel_path
-            count += 1
-            if max_files and count >= max_files:
-                return
-
-def read_text_file(path: str) -> Optional[str]:
-    try:
-        if os.path.getsize(path) > MAX_FILE_BYTES:
-            return None
-        with open(path, "rb") as f:
-            data = f.read()
-        if b"\x00" in data:
-            return None
-        try:
-            return data.decode("utf-8")
-        except UnicodeDecodeError:
-            return data.decode("utf-8", errors="ignore")
-    except Exception:
-        return None
-
 def ensure_dir(path: str) -> str:
     os.makedirs(path, exist_ok=True)
     return path
@@ -175,184 +95,68 @@ def load_json_autoz(path: str) -> Dict[str, Any]:
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
+def load_json_cached(path: str) -> Dict[str, Any]:
+    """load_json_autoz memoized across reruns (load_cache); treat the result as read-only."""
+    return cached_load(path, load_json_autoz)
+
 def save_json_gz(obj: dict, path: str):
     ensure_dir(os.path.dirname(path))
     with gzip.open(path, "wt", encoding="utf-8") as f:
         json.dump(obj, f, ensure_ascii=False, separators=(",", ":"))
 
-# ===================== Language Parsers =====================
+def save_json_out(obj: dict, path: str, gzip_out: bool = True):
+    if gzip_out:
+        save_json_gz(obj, path)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(obj, f, ensure_ascii=False, separators=(",", ":"))
 
-def parse_python_text(py_src: str):
-    classes, imports, functions = [], [], []
-    try:
-        tree = ast.parse(py_src)
-    except SyntaxError:
-        return classes, imports, functions
-    if hasattr(tree, "body"):
-        for n in tree.body:
-            if isinstance(n, ast.FunctionDef) or isinstance(n, ast.AsyncFunctionDef):
-                functions.append(n.name)
-    for node in ast.walk(tree):
-        if isinstance(node, ast.ClassDef):
-            classes.append(node.name)
-        elif isinstance(node, ast.Import):
-            for alias in node.names:
-                imports.append({"type": "import", "module": alias.name, "names": [], "level": 0})
-        elif isinstance(node, ast.ImportFrom):
-            mod = node.module or ""
-            names = [alias.name for alias in node.names]
-            imports.append({"type": "from", "module": mod, "names": names, "level": node.level or 0})
-    return classes, imports, functions
-
-_ident = r"[A-Za-z_][A-Za-z0-9_]*"
-_js_ident = r"[A-Za-z_$][A-Za-z0-9_$]*"
-
-def parse_js_ts_text(src: str):
-    classes, imports, functions = [], [], []
-    for m in re.finditer(rf"\bclass\s+({_js_ident})\b", src):
-        classes.append(m.group(1))
-    for m in re.finditer(r"""import\s+(?:[\s\S]*?\s+from\s+)?['"'"]""", src):
-        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
-    for m in re.finditer(r"""require\(\s*'"['"]\s*\)""", src):
-        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
-    for m in re.finditer(rf"\bfunction\s+({_js_ident})\s*\(", src):
-        functions.append(m.group(1))
-    for m in re.finditer(rf"\bexport\s+function\s+({_js_ident})\s*\(", src):
-        functions.append(m.group(1))
-    for m in re.finditer(rf"\b(?:const|let|var)\s+({_js_ident})\s*=\s*function\b", src):
-        functions.append(m.group(1))
-    for m in re.finditer(rf"\b(?:const|let|var)\s+({_js_ident})\s*=\s*\(", src):
-        functions.append(m.group(1))
-    return classes, imports, list(dict.fromkeys(functions))
-
-def parse_java_text(src: str):
-    classes, imports, functions = [], [], []
-    for m in re.finditer(rf"\b(class|interface|enum)\s+({_ident})\b", src):
-        classes.append(m.group(2))
-    for m in re.finditer(r"\bimport\s+([a-zA-Z0-9_\.]+)(?:\s*;\s*)", src):
-        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
-    return classes, imports, functions
-
-def parse_go_text(src: str):
-    classes, imports, functions = [], [], []
-    for m in re.finditer(r'import\s+"([^"]+)"', src):
-        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
-    block = re.search(r"import\s*\((.*?)\)", src, re.S)
-    if block:
-        for m in re.finditer(r'"([^"]+)"', block.group(1)):
-            imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
-    for m in re.finditer(rf"\btype\s+({_ident})\s+struct\b", src):
-        classes.append(m.group(1))
-    for m in re.finditer(rf"\bfunc\s+(?:\([^)]+\)\s*)?({_ident})\s*\(", src):
-        functions.append(m.group(1))
-    return classes, imports, functions
-
-def parse_c_cpp_text(src: str):
-    """
-    Heuristic parsing for C/C++:
-      - #include "..." and #include <...>  -> imports
-      - class/struct <Name>                -> classes
-      - top-level function definitions     -> functions (declarations excluded)
-    """
-    import re
-
-    classes, imports, functions = [], [], []
-
-    # Includes: #include <header> or #include "header"
-    include_pattern = r'#\s*include\s*<"[>"]'
-    for m in re.finditer(include_pattern, src):
-        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
-
-    # Identifier pattern
-    _ident = r"[A-Za-z_][A-Za-z0-9_]*"
-
-    # class/struct names
-    for m in re.finditer(rf"\b(class|struct)\s+({_ident})\b", src):
-        classes.append(m.group(2))
-
-    # Heuristic top-level function definition (requires a body '{', avoids ';' declarations)
-    # Examples matched:
-    #   int foo(int a) { ... }
-    #   static inline MyType ns::Class::method(T x) { ... }
-    #   template<typename T> T bar(T x) { ... }
-    func_pattern = (
-        r"(?m)^[ \t]*"                 # line start
-        r"[A-Za-z_][\w:\s\*\&\<\>]*\s+" # return type / qualifiers
-        r"(" + _ident + r")"           # function name (capture)
-        r"\s*\([^;]*\)"                # args (not containing ';')
-        r"\s*\{"                       # opening brace of body
-    )
-    for m in re.finditer(func_pattern, src):
-        functions.append(m.group(1))
-
-    # De-dup preserve order
-    functions = list(dict.fromkeys(functions))
-    return classes, imports, functions
-
-
-
-def parse_rust_text(src: str):
-    classes, imports, functions = [], [], []
-    for m in re.finditer(r"\buse\s+([A-Za-z0-9_:\{\}\*,\s]+);", src):
-        mod = re.sub(r"\s+", " ", m.group(1)).strip()
-        imports.append({"type": "import", "module": mod, "names": [], "level": 0})
-    for m in re.finditer(rf"\b(struct|enum)\s+({_ident})\b", src):
-        classes.append(m.group(2))
-    for m in re.finditer(rf"\bfn\s+({_ident})\s*\(", src):
-        functions.append(m.group(1))
-    return classes, imports, functions
-
-def parse_ruby_text(src: str):
-    classes, imports, functions = [], [], []
-    for m in re.finditer(rf"\bclass\s+({_ident})\b", src):
-        classes.append(m.group(1))
-    for m in re.finditer(r"""(?:require|require_relative)\s+'"['"]""", src):
-        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
-    for m in re.finditer(rf"(?m)^\s*def\s+({_ident})\b", src):
-        functions.append(m.group(1))
-    return classes, imports, functions
-
-def parse_php_text(src: str):
-    classes, imports, functions = [], [], []
-    for m in re.finditer(rf"\bclass\s+({_ident})\b", src):
-        classes.append(m.group(1))
-    for m in re.finditer(rf"\bfunction\s+({_ident})\s*\(", src):
-        functions.append(m.group(1))
-    for m in re.finditer(rf"\buse\s+([A-Za-z0-9_\\]+)\s*;", src):
-        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
-    return classes, imports, functions
-
-def parse_kotlin_text(src: str):
-    classes, imports, functions = [], [], []
-    for m in re.finditer(rf"\b(class|object|interface)\s+({_ident})\b", src):
-        classes.append(m.group(2))
-    for m in re.finditer(rf"\bimport\s+([A-Za-z0-9_\.]+)\s*", src):
-        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
-    for m in re.finditer(rf"\bfun\s+({_ident})\s*\(", src):
-        functions.append(m.group(1))
-    return classes, imports, functions
-
-def parse_any_text_by_ext(ext: str, text: str):
-    e = ext.lower().lstrip(".")
-    if e in PY_EXTS: return parse_python_text(text)
-    if e in JS_TS_EXTS: return parse_js_ts_text(text)
-    if e in JAVA_EXTS: return parse_java_text(text)
-    if e in GO_EXTS: return parse_go_text(text)
-    if e in C_EXTS or e in CPP_EXTS: return parse_c_cpp_text(text)
-    if e in RUST_EXTS: return parse_rust_text(text)
-    if e in RUBY_EXTS: return parse_ruby_text(text)
-    if e in PHP_EXTS: return parse_php_text(text)
-    if e in KT_EXTS: return parse_kotlin_text(text)
-    return [], [], []
+# ===================== Compact v2 (per-file) + Sharding =====================
 
+def _compact_file_record(rel_path: str, scanned: Dict[str, Any], get_import_index, totals: Dict[str, int]) -> Dict[str, Any]:
+    rec = {"path": rel_path, "lang": scanned["lang"], "classes": [], "functions": [], "imports": []}
+    totals["files"] += 1
+    if count_skipped(totals, scanned):
+        rec["skipped"] = scanned["skipped"]
 
-# ===================== Compact v2 (per-file) + Sharding =====================
+    if not scanned["has_text"]:
+        return rec
 
-def build_repo_compact_v2(root_dir: str, subpath: Optional[str] = None, progress=None, max_files: Optional[int] = None):
+    classes, imports, functions = scanned["classes"], scanned["imports"], scanned["functions"]
+
+    if classes:
+        rec["classes"] = sorted(set(classes))
+        totals["classes"] += len(rec["classes"])
+
+    if functions:
+        rec["functions"] = sorted(set(functions))
+        totals["functions"] += len(rec["functions"])
+
+    if imports:
+        mods = []
+        for imp in imports:
+            mods.extend(import_module_names(imp))
+        if mods:
+            mods = sorted(set(mods))
+            rec["imports"] = [get_import_index(m) for m in mods]
+            totals["imports"] += len(mods)
+
+    return rec
+
+def build_repo_compact_v2(root_dir, subpath: Optional[str] = None, progress=None, max_files: Optional[int] = None,
+                          workers: Optional[int] = None, parse_report: Optional[ParseReport] = None,
+                          skip_generated: bool = True):
     """
     Compact v2:
       - dicts.imports (deduped module/header names)
       - files: [{path, lang, classes[], functions[], imports[idx]}]
+    root_dir is a directory or a repo source (e.g. repo_scan.ZipRepoSource).
+    Parsing fans out over `workers` processes (None = all cores, 1 = serial);
+    results are merged in file order, so import indices are deterministic.
+    Byte-identical files are parsed once (repo_scan.content_keys).
+    Per-file parse timings go to parse_report when given. With skip_generated,
+    generated / minified / vendored files (file_classifier) are not parsed;
+    their records carry the reason under "skipped".
     """
     files = []
     import_to_idx = {}
@@ -364,55 +168,196 @@ def build_repo_compact_v2(root_dir: str, subpath: Optional[str] = None, progress
             imports_list.append(name)
         return import_to_idx[name]
 
-    file_list = list(iter_repo_files(root_dir, subpath, max_files=max_files))
+    source = open_repo_source(root_dir)
+    file_list = list(source.iter_files(subpath, max_files=max_files))
     n = len(file_list)
-    totals = {"files": 0, "classes": 0, "functions": 0, "imports": 0}
+    totals = {"files": 0, "classes": 0, "functions": 0, "imports": 0, "skipped": {}}
+    classifier = FileClassifier.from_source(source, file_list, subpath) if skip_generated else None
 
-    for i, (abs_path, rel_path) in enumerate(file_list, start=1):
+    scans = scan_repo_files(file_list, workers=workers, source=source, classifier=classifier,
+                            dedup_keys=content_keys(file_list, source))
+    for i, (rel_path, scanned) in enumerate(scans, start=1):
         if progress:
             progress.progress(min(i / max(n, 1), 1.0), text=f"Scanning {rel_path} ({i}/{n})")
+        if parse_report:
+            parse_report.add(rel_path, scanned)
+        files.append(_compact_file_record(rel_path, scanned, get_import_index, totals))
 
-        ext = os.path.splitext(rel_path)[1]
-        lang = detect_lang_by_ext(ext)
-        text = read_text_file(abs_path)
+    compact = {"meta": {}, "dicts": {"imports": imports_list}, "files": files}
+    return compact, totals
 
-        rec = {"path": rel_path, "lang": lang, "classes": [], "functions": [], "imports": []}
-        totals["files"] += 1
+# ===================== Incremental rebuild (per-file content hashes) =====================
 
-        if not text:
-            files.append(rec)
-            continue
+# Renumber the import dictionary once more than this fraction of it is unreferenced.
+IMPORTS_GC_RATIO = 0.5
+
+def shard_top_dir(path: str) -> str:
+    return (path.split("/", 1)[0]) if "/" in path else ""
+
+def file_hashes_path(v2_dir: str, graph_id: str) -> str:
+    return os.path.join(v2_dir, graph_id, "file_hashes.json.gz")
+
+def load_file_hashes(graph_id: str, v2_dir: str) -> Optional[Dict[str, str]]:
+    p = file_hashes_path(v2_dir, graph_id)
+    if not os.path.isfile(p):
+        return None
+    return load_json_autoz(p).get("files", {})
+
+def save_file_hashes(graph_meta: Dict[str, Any], v2_dir: str, hashes: Dict[str, str]) -> str:
+    """
+    Save {rel_path: content hash} under: <v2_dir>/<graph_id>/file_hashes.json.gz
+    """
+    out_path = file_hashes_path(v2_dir, graph_meta["graph_id"])
+    save_json_gz({"meta": graph_meta, "files": hashes}, out_path)
+    return out_path
+
+def load_previous_compact_v2(cache_dir: str, meta: dict) -> Optional[Dict[str, Any]]:
+    base = compact_v2_base_name(meta)
+    for name in (base + ".gz", base):
+        p = os.path.join(cache_dir, name)
+        if os.path.isfile(p):
+            return load_json_autoz(p)
+    return None
+
+def build_repo_compact_v2_incremental(root_dir, prev_compact: Optional[Dict[str, Any]] = None,
+                                      prev_hashes: Optional[Dict[str, str]] = None,
+                                      subpath: Optional[str] = None, progress=None,
+                                      max_files: Optional[int] = None, workers: Optional[int] = None,
+                                      with_units: bool = False,
+                                      always_scan: Optional[Callable[[str], bool]] = None,
+                                      on_scanned: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                                      skip_generated: bool = True):
+    """
+    Rebuild compact v2 re-parsing only files whose content hash differs from
+    prev_hashes; unchanged records are reused from prev_compact and deleted
+    files are dropped. Without previous state every file counts as added, which
+    is equivalent to build_repo_compact_v2.
+
+    Import indices of reused records are kept stable (new modules are appended);
+    the dictionary is renumbered in file order once too much of it is
+    unreferenced. Shards use their own local dictionaries, so renumbering does
+    not invalidate shards that did not change.
+
+    Other consumers of the build hook into the same read: on_scanned(rel_path,
+    scanned) is called for every parsed file in file order (scanned carries
+    "readme" text and, with with_units, "units"), and always_scan(rel_path)
+    forces unchanged files to be read anyway (their records are rebuilt from
+    the fresh parse and do not count as modified).
+
+    skip_generated and the parsing of byte-identical files once (their units
+    share a "content_key") are as in build_repo_compact_v2. Skip rules apply to every
+    file, so when they change (a .gitignore / .gitattributes was touched, or
+    skip_generated differs from meta["skip_generated"] of prev_compact) all
+    files are re-parsed and every shard counts as changed. The same holds when
+    meta["parser_version"] of prev_compact is not repo_scan.PARSER_VERSION:
+    records from another parser are never mixed with fresh ones.
+
+    Returns (compact, totals, hashes, changes) where changes has
+    added/modified/deleted path lists, changed_tops (shard keys to rewrite) and
+    reindexed (True if the global import dictionary was renumbered).
+    """
+    prev_compact = prev_compact or {}
+    prev_hashes = prev_hashes or {}
+    prev_files = {f["path"]: f for f in prev_compact.get("files", [])}
+    prev_imports = prev_compact.get("dicts", {}).get("imports", [])
 
-        classes, imports, functions = parse_any_text_by_ext(ext, text)
+    source = open_repo_source(root_dir)
+    file_list = list(source.iter_files(subpath, max_files=max_files))
+    n = len(file_list)
 
-        if classes:
-            rec["classes"] = sorted(set(classes))
-            totals["classes"] += len(rec["classes"])
+    hashes = {}
+    to_parse = []
+    added, modified = [], []
+    for i, (locator, rel_path) in enumerate(file_list, start=1):
+        if progress and (i % 200 == 0 or i == n):
+            progress.progress(min(i / max(n, 1), 1.0), text=f"Hashing files ({i}/{n})")
+        h = source.content_hash(locator)
+        hashes[rel_path] = h
+        if rel_path not in prev_files:
+            added.append(rel_path)
+            to_parse.append((locator, rel_path))
+        elif h is None or prev_hashes.get(rel_path) != h:
+            modified.append(rel_path)
+            to_parse.append((locator, rel_path))
+        elif always_scan and always_scan(rel_path):
+            to_parse.append((locator, rel_path))
+    current = set(hashes)
+    deleted = [p for p in prev_files if p not in current]
+
+    classifier = FileClassifier.from_source(source, file_list, subpath) if skip_generated else None
+    prev_meta = prev_compact.get("meta", {})
+    rules_changed = bool(prev_files) and (
+        prev_meta.get("parser_version") != PARSER_VERSION
+        or bool(prev_meta.get("skip_generated")) != skip_generated
+        or any(posixpath.basename(p) in RULE_FILE_NAMES for p in added + modified + deleted))
+    if rules_changed:
+        to_parse = list(file_list)
+
+    parsed = {}
+    m = len(to_parse)
+    scans = scan_repo_files(to_parse, workers=workers, source=source, with_units=with_units, classifier=classifier,
+                            dedup_keys=content_keys(to_parse, source, hashes=hashes))
+    for i, (rel_path, scanned) in enumerate(scans, start=1):
+        if progress:
+            progress.progress(min(i / max(m, 1), 1.0), text=f"Scanning {rel_path} ({i}/{m})")
+        if on_scanned:
+            on_scanned(rel_path, scanned)
+        parsed[rel_path] = scanned
 
-        if functions:
-            rec["functions"] = sorted(set(functions))
-            totals["functions"] += len(rec["functions"])
+    imports_list = list(prev_imports)
+    import_to_idx = {name: idx for idx, name in enumerate(imports_list)}
 
-        if imports:
-            mods = []
-            for imp in imports:
-                module = (imp.get("module") or "").strip()
-                if module:
-                    mods.append(module)
-            if mods:
-                mods = sorted(set(mods))
-                rec["imports"] = [get_import_index(m) for m in mods]
-                totals["imports"] += len(mods)
+    def get_import_index(name: str) -> int:
+        if name not in import_to_idx:
+            import_to_idx[name] = len(imports_list)
+            imports_list.append(name)
+        return import_to_idx[name]
 
+    files = []
+    totals = {"files": 0, "classes": 0, "functions": 0, "imports": 0, "skipped": {}}
+    for _, rel_path in file_list:
+        if rel_path in parsed:
+            files.append(_compact_file_record(rel_path, parsed[rel_path], get_import_index, totals))
+            continue
+        rec = prev_files[rel_path]
+        totals["files"] += 1
+        count_skipped(totals, rec)
+        totals["classes"] += len(rec.get("classes", []))
+        totals["functions"] += len(rec.get("functions", []))
+        totals["imports"] += len(rec.get("imports", []))
         files.append(rec)
 
+    used = {idx for f in files for idx in f.get("imports", [])}
+    reindexed = bool(imports_list) and (len(imports_list) - len(used)) > IMPORTS_GC_RATIO * len(imports_list)
+    if reindexed:
+        files, imports_list = compact_import_dict(files, imports_list)
+
+    changed_paths = list(hashes) + deleted if rules_changed else added + modified + deleted
+    changes = {
+        "added": added,
+        "modified": modified,
+        "deleted": deleted,
+        "changed_tops": {shard_top_dir(p) for p in changed_paths},
+        "reindexed": reindexed,
+    }
     compact = {"meta": {}, "dicts": {"imports": imports_list}, "files": files}
-    return compact, totals
+    return compact, totals, hashes, changes
+
+def dep_changed_tops(prev_compact: Dict[str, Any], compact: Dict[str, Any]) -> set:
+    """Top dirs of files whose resolved deps differ between two compact graphs (both with "deps")."""
+    prev_view, view = CompactGraphView(prev_compact), CompactGraphView(compact)
+    return {shard_top_dir(f["path"]) for f in compact.get("files", [])
+            if view.dependencies(f["path"]) != prev_view.dependencies(f["path"])}
+
+def compact_v2_base_name(meta: dict) -> str:
+    base_name = f"{meta['owner']}__{meta['repo']}__{meta['branch']}__{meta['graph_id']}__v2.json"
+    return base_name.replace("/", "_")
 
 def save_compact_graph_v2(cache_dir: str, meta: dict, compact: dict, gzip_out: bool = True) -> str:
     compact["meta"] = meta | {"schema": "v2-compact"}
-    base_name = f"{meta['owner']}__{meta['repo']}__{meta['branch']}__{meta['graph_id']}__v2.json"
-    base_name = base_name.replace("/", "_")
+    add_import_postings(compact)
+    add_file_deps(compact)
+    base_name = compact_v2_base_name(meta)
     out_path = os.path.join(cache_dir, base_name + (".gz" if gzip_out else ""))
     if gzip_out:
         save_json_gz(compact, out_path)
@@ -420,94 +365,280 @@ def save_compact_graph_v2(cache_dir: str, meta: dict, compact: dict, gzip_out: b
         ensure_dir(os.path.dirname(out_path))
         with open(out_path, "w", encoding="utf-8") as f:
             json.dump(compact, f, ensure_ascii=False, separators=(",", ":"))
+    record_artifact(out_path, "graph_v2", compact["meta"])
     return out_path
 
-def shard_compact_by_top_dir(compact: dict, out_dir: str, gzip_out: bool = True) -> dict:
+def compact_import_dict(files: List[Dict[str, Any]], imports: List[str]):
+    """
+    Return (files, imports) restricted to the modules the files reference,
+    renumbered by first use. Used for shard-local dictionaries, so a shard's
+    size and load time depend on its own content only.
+    """
+    remap, compacted = {}, []
+    out = []
+    for f in files:
+        idxs = f.get("imports", [])
+        for idx in idxs:
+            if idx not in remap:
+                remap[idx] = len(compacted)
+                compacted.append(imports[idx])
+        out.append(f | {"imports": [remap[idx] for idx in idxs]} if idxs else f)
+    return out, compacted
+
+def shard_compact_by_top_dir(compact: dict, out_dir: str, gzip_out: bool = True,
+                             only_tops: Optional[set] = None) -> dict:
     """
     Writes:
       - out_dir/manifest.json[.gz]
       - out_dir/shards/shard__<topdir>.json[.gz]
+    Each shard carries its own compact import dictionary (compact_import_dict) and
+    its graph_stats block, whose aggregates are also kept per shard in the manifest;
+    imports_count in the manifest is the size of the global one. The stats list
+    each file's resolved deps from the whole graph's "deps".
+    With only_tops (incremental rebuild), shards for other top dirs are left
+    untouched if already on disk, and shards for vanished top dirs are removed;
+    pass the tops of files whose deps changed too (dep_changed_tops).
     """
     imports = compact.get("dicts", {}).get("imports", [])
     files = compact.get("files", [])
     groups = defaultdict(list)
     for f in files:
-        top = (f["path"].split("/", 1)[0]) if "/" in f["path"] else ""
-        groups[top].append(f)
+        groups[shard_top_dir(f["path"])].append(f)
 
     ensure_dir(out_dir)
     shards_dir = os.path.join(out_dir, "shards")
     ensure_dir(shards_dir)
 
     meta = compact.get("meta", {})
+    deps_view = CompactGraphView(compact)  # resolved deps reach files in other shards
     shard_records = []
+    keep_names = set()
     for top, flist in groups.items():
-        shard = {"meta": meta | {"shard": top}, "dicts": {"imports": imports}, "files": flist}
         name = f"shard__{top or '_root'}.json" + (".gz" if gzip_out else "")
         path = os.path.join(shards_dir, name)
-        if gzip_out:
-            save_json_gz(shard, path)
-        else:
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(shard, f, ensure_ascii=False, separators=(",", ":"))
-        shard_records.append({"topdir": top, "path": os.path.relpath(path, out_dir)})
+        keep_names.add(name)
+        stats = compute_graph_stats({"dicts": {"imports": imports}, "files": flist}, meta | {"shard": top},
+                                    deps_view=deps_view)
+        shard_records.append({"topdir": top, "path": os.path.relpath(path, out_dir), "stats": stats_aggregates(stats)})
+        if only_tops is not None and top not in only_tops and os.path.isfile(path):
+            continue
+        shard_files, shard_imports = compact_import_dict(flist, imports)
+        shard = {"meta": meta | {"shard": top}, "dicts": {"imports": shard_imports}, "files": shard_files,
+                 "stats": stats}
+        add_import_postings(shard)
+        save_json_out(shard, path, gzip_out)
 
-    manifest = {"meta": meta, "shards": shard_records, "imports_count": len(imports), "files_total": len(files)}
+    if only_tops is not None:
+        remove_stale_shards(shards_dir, keep_names, gzip_out)
+
+    manifest = {"meta": meta, "strategy": "top_dir", "shards": shard_records,
+                "imports_count": len(imports), "files_total": len(files)}
     man_path = os.path.join(out_dir, "manifest.json" + (".gz" if gzip_out else ""))
-    if gzip_out:
-        save_json_gz(manifest, man_path)
-    else:
-        with open(man_path, "w", encoding="utf-8") as f:
-            json.dump(manifest, f, ensure_ascii=False, separators=(",", ":"))
+    save_json_out(manifest, man_path, gzip_out)
+    record_artifact(man_path, "manifest", meta, extra={"strategy": "top_dir", "shards": len(shard_records)})
     return manifest
 
-# ===================== Expand v2 to v1-like (Preview only) =====================
+def remove_stale_shards(shards_dir: str, keep_names: set, gzip_out: bool = True):
+    for name in os.listdir(shards_dir):
+        if name.startswith("shard__") and name.endswith(".gz" if gzip_out else ".json") and name not in keep_names:
+            os.remove(os.path.join(shards_dir, name))
+
+# ----- Size-balanced sharding -----
+# Shards cover glob-style prefixes: "dir/**" is a whole subtree, "dir/*" only the
+# files directly in dir ("**" / "*" for the repo root). When the direct files of
+# dir are split into chunks, chunk k covers "dir/*>=<name>": the direct files
+# whose name sorts at or after its first file's, up to the next chunk's start
+# (the first chunk starts at ""), so every path maps to exactly one shard.
+
+DEFAULT_SHARD_BUDGET = 1500   # files + symbols (classes/functions) per shard
+
+def shard_file_weight(f: Dict[str, Any]) -> int:
+    return 1 + len(f.get("classes", [])) + len(f.get("functions", []))
 
-def expand_compact_to_v1(compact: dict) -> dict:
-    nodes, edges = [], []
+def plan_balanced_shards(files: List[Dict[str, Any]], budget: int = DEFAULT_SHARD_BUDGET) -> List[Dict[str, Any]]:
+    """
+    Group files into shards of at most ~budget weight (shard_file_weight):
+      - a directory over budget is split by subdirectory (recursively); its direct
+        files form their own group, chunked in path order if still over budget
+      - consecutive groups (path order) are then packed together up to budget
+    Returns [{name, prefixes, files, weight}] in path order.
+    """
+    budget = max(1, int(budget))
+    groups = []
+
+    def add_group(prefix: str, flist: List[Dict[str, Any]]):
+        chunks, chunk, w = [], [], 0
+        for f in flist:
+            fw = shard_file_weight(f)
+            if chunk and w + fw > budget:
+                chunks.append((chunk, w))
+                chunk, w = [], 0
+            chunk.append(f)
+            w += fw
+        if chunk:
+            chunks.append((chunk, w))
+        for k, (chunk, w) in enumerate(chunks):
+            cover = prefix
+            if len(chunks) > 1:
+                cover += ">=" + (posixpath.basename(chunk[0]["path"]) if k else "")
+            groups.append({"prefixes": [cover], "files": chunk, "weight": w})
+
+    def split(dir_path: str, flist: List[Dict[str, Any]]):
+        base = dir_path + "/" if dir_path else ""
+        if sum(shard_file_weight(f) for f in flist) <= budget:
+            groups.append({"prefixes": [base + "**"], "files": flist,
+                           "weight": sum(shard_file_weight(f) for f in flist)})
+            return
+        direct, children = [], defaultdict(list)
+        for f in flist:
+            rest = f["path"][len(base):]
+            if "/" in rest:
+                children[rest.split("/", 1)[0]].append(f)
+            else:
+                direct.append(f)
+        if direct:
+            add_group(base + "*", direct)
+        for child in sorted(children):
+            split(base + child, children[child])
+
+    split("", sorted(files, key=lambda f: f["path"]))
+
+    shards = []
+    for g in groups:
+        last = shards[-1] if shards else None
+        if last is not None and last["weight"] + g["weight"] <= budget:
+            last["prefixes"] += g["prefixes"]
+            last["files"] += g["files"]
+            last["weight"] += g["weight"]
+        else:
+            shards.append(dict(g))
+
+    used = set()
+    for sh in shards:
+        label = sh["prefixes"][0].split("*", 1)[0].rstrip("/") or "_root"
+        if len(sh["prefixes"]) > 1:
+            label += f"+{len(sh['prefixes']) - 1}"
+        name, n = label, 2
+        while name in used:
+            name, n = f"{label}~{n}", n + 1
+        used.add(name)
+        sh["name"] = name
+    return shards
+
+def _prefix_match(prefix: str, path: str):
+    """Sort key of a coverage prefix matching path (more specific is larger), None if it does not match."""
+    base, _, rest = prefix.partition("*")
+    if not path.startswith(base):
+        return None
+    if rest.startswith("*"):
+        return (len(base), 0, "")
+    name = path[len(base):]
+    if "/" in name:
+        return None
+    low = rest[2:] if rest.startswith(">=") else ""
+    return (len(base), 1, low) if name >= low else None
+
+def shard_for_path(manifest: Dict[str, Any], path: str) -> Optional[Dict[str, Any]]:
+    """Manifest shard record covering a file path (top dir, or the most specific balanced prefix)."""
+    shards = manifest.get("shards", [])
+    if manifest.get("strategy") != "balanced":
+        top = shard_top_dir(path)
+        return next((s for s in shards if s.get("topdir") == top), None)
+    best, best_key = None, None
+    for s in shards:
+        for prefix in s.get("prefixes", []):
+            key = _prefix_match(prefix, path)
+            if key is not None and (best_key is None or key > best_key):
+                best, best_key = s, key
+    return best
+
+def shard_compact_balanced(compact: dict, out_dir: str, gzip_out: bool = True,
+                           budget: int = DEFAULT_SHARD_BUDGET, reuse_unchanged: bool = False) -> dict:
+    """
+    Sibling of shard_compact_by_top_dir using plan_balanced_shards. Same on-disk
+    layout; manifest shard records add {prefixes, files, weight, digest}.
+    The digest covers files + local dictionary + each file's resolved deps
+    (listed in the stats), not the other derived stats. With reuse_unchanged
+    (incremental rebuild), a shard whose digest matches the previous manifest
+    is not rewritten.
+    Shard files not in the new plan are removed.
+    """
     imports = compact.get("dicts", {}).get("imports", [])
     files = compact.get("files", [])
-    import_nodes_added = set()
-    for f in files:
-        file_id = f"file:{f['path']}"
-        nodes.append({"id": file_id, "type": "file", "label": f["path"], "path": f["path"], "lang": f.get("lang", "")})
-        for cname in f.get("classes", []):
-            cid = f"class:{f['path']}#{cname}"
-            nodes.append({"id": cid, "type": "class", "label": cname, "file": f["path"], "lang": f.get("lang", "")})
-            edges.append({"source": file_id, "target": cid, "type": "FILE_CONTAINS_CLASS"})
-        for gname in f.get("functions", []):
-            gid = f"function:{f['path']}#{gname}"
-            nodes.append({"id": gid, "type": "function", "label": gname, "file": f["path"], "lang": f.get("lang", "")})
-            edges.append({"source": file_id, "target": gid, "type": "FILE_CONTAINS_FUNCTION"})
-        for idx in f.get("imports", []):
-            if 0 <= idx < len(imports):
-                mod = imports[idx]
-                iid = f"import:{mod}"
-                if iid not in import_nodes_added:
-                    nodes.append({"id": iid, "type": "import", "label": mod, "kind": "import"})
-                    import_nodes_added.add(iid)
-                edges.append({"source": file_id, "target": iid, "type": "FILE_IMPORTS"})
-    return {"meta": compact.get("meta", {}), "nodes": nodes, "edges": edges}
+
+    ensure_dir(out_dir)
+    shards_dir = os.path.join(out_dir, "shards")
+    ensure_dir(shards_dir)
+    man_path = os.path.join(out_dir, "manifest.json" + (".gz" if gzip_out else ""))
+
+    prev_digests = {}
+    if reuse_unchanged and os.path.isfile(man_path):
+        try:
+            prev_digests = {s["path"]: s.get("digest") for s in load_json_autoz(man_path).get("shards", [])}
+        except Exception:
+            prev_digests = {}
+
+    meta = compact.get("meta", {})
+    deps_view = CompactGraphView(compact)  # resolved deps reach files in other shards
+    shard_records = []
+    keep_names = set()
+    for plan in plan_balanced_shards(files, budget):
+        # sanitizing can map two plan names to one string ("src/foo", "src_foo"): the hash keeps files apart
+        safe = re.sub(r"[^\w\-\.\+~]+", "_", plan["name"])
+        tag = hashlib.sha1(plan["name"].encode("utf-8")).hexdigest()[:8]
+        name = f"shard__{safe}__{tag}.json" + (".gz" if gzip_out else "")
+        path = os.path.join(shards_dir, name)
+        rel = os.path.relpath(path, out_dir)
+        keep_names.add(name)
+
+        shard_files, shard_imports = compact_import_dict(plan["files"], imports)
+        body = {"dicts": {"imports": shard_imports}, "files": shard_files}
+        # the stats list each file's resolved deps, which change with files elsewhere in the repo
+        deps = [deps_view.dependencies(f["path"]) for f in shard_files]
+        digest = hashlib.sha1(json.dumps([body, deps], ensure_ascii=False,
+                                         separators=(",", ":")).encode("utf-8")).hexdigest()
+        shard_meta = meta | {"shard": plan["name"], "prefixes": plan["prefixes"]}
+        stats = compute_graph_stats(body, shard_meta, deps_view=deps_view)
+        shard_records.append({"topdir": plan["name"], "path": rel, "prefixes": plan["prefixes"],
+                              "files": len(shard_files), "weight": plan["weight"], "digest": digest,
+                              "stats": stats_aggregates(stats)})
+        if prev_digests.get(rel) == digest and os.path.isfile(path):
+            continue
+        shard = {"meta": shard_meta} | body | {"stats": stats}
+        add_import_postings(shard)  # derived from body, so not part of the digest
+        save_json_out(shard, path, gzip_out)
+
+    remove_stale_shards(shards_dir, keep_names, gzip_out)
+
+    manifest = {"meta": meta, "strategy": "balanced", "budget": int(budget), "shards": shard_records,
+                "imports_count": len(imports), "files_total": len(files)}
+    save_json_out(manifest, man_path, gzip_out)
+    record_artifact(man_path, "manifest", meta, extra={"strategy": "balanced", "shards": len(shard_records)})
+    return manifest
 
 # ===================== README collection & integration =====================
 
-READ_ME_REGEX = re.compile(r"(?i)^readme(\.(md|rst|txt))?$")
+def readme_record(rel_path: str, text: Optional[str], **extra) -> Optional[Dict[str, Any]]:
+    if not (text or "").strip():
+        return None
+    return {"path": rel_path, "size": len(text), "content": text} | extra
 
-def collect_readmes_text(root_dir: str, subpath: Optional[str] = None) -> List[Dict[str, Any]]:
+def collect_ancestor_readmes(root_dir, subpath: Optional[str] = None) -> List[Dict[str, Any]]:
     """
-    Scan repo for README-like files and return list of {path, size, content}.
+    READMEs sitting directly in each ancestor directory of subpath (repo root
+    included), flagged with "ancestor": True. Empty for whole-repo builds.
     """
-    base = os.path.join(root_dir, subpath) if subpath else root_dir
+    source = open_repo_source(root_dir)
     readmes = []
-    for dirpath, dirnames, filenames in os.walk(base):
-        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.startswith(".")]
-        for fn in filenames:
-            if READ_ME_REGEX.match(fn):
-                abs_path = os.path.join(dirpath, fn)
-                rel_path = os.path.relpath(abs_path, root_dir).replace("\\", "/")
-                txt = read_text_file(abs_path) or ""
-                if txt.strip():
-                    readmes.append({"path": rel_path, "size": len(txt), "content": txt})
+    sub = (subpath or "").strip("/")
+    if sub:
+        parts = sub.split("/")
+        for depth in range(len(parts)):
+            for locator, rel_path in source.iter_dir_files("/".join(parts[:depth])):
+                if is_readme_path(rel_path):
+                    rec = readme_record(rel_path, source.read_text(locator), ancestor=True)
+                    if rec:
+                        readmes.append(rec)
     return readmes
 
 def save_doc_hints(graph_meta: Dict[str, Any], v2_dir: str, readmes: List[Dict[str, Any]]) -> str:
@@ -523,20 +654,26 @@ def load_doc_hints(graph_id: str, v2_dir: str) -> Optional[Dict[str, Any]]:
     p1 = os.path.join(v2_dir, graph_id, "doc_hints.json.gz")
     p2 = os.path.join(v2_dir, graph_id, "doc_hints.json")
     if os.path.isfile(p1):
-        return load_json_autoz(p1)
+        return load_json_cached(p1)
     if os.path.isfile(p2):
-        return load_json_autoz(p2)
+        return load_json_cached(p2)
     return None
 
 def make_readme_excerpt(doc_hints: Dict[str, Any], max_chars: int = 4000) -> str:
     """
     Select and concatenate README content (prioritizing root README, then docs/, then others) up to max_chars.
+    For subpath graphs "root" means the subpath; ancestor READMEs come after the subtree's own.
     """
     readmes = doc_hints.get("readmes", [])
     if not readmes:
         return ""
+    sub = (doc_hints.get("meta", {}).get("subpath") or "").strip("/").lower()
     def score(r: Dict[str, Any]) -> float:
         p = r["path"].lower()
+        if r.get("ancestor"):
+            return -100.0 + 0.001 * len(p)                # nearest ancestor first
+        if sub and p.startswith(sub + "/"):
+            p = p[len(sub) + 1:]
         s = 0.0
         if "/" not in p: s += 100.0                # root readme
         if p.startswith("readme"): s += 50.0
@@ -560,6 +697,66 @@ def make_readme_excerpt(doc_hints: Dict[str, Any], max_chars: int = 4000) -> str
             break
     return "\n".join(chunks).strip()
 
+# ===================== Embedding units (consumed by build_code_embeddings) =====================
+
+DEFAULT_EMB_DIR = os.path.join(os.getcwd(), ".cache", "embeddings")
+
+def units_output_dir(graph_id: str) -> str:
+    # Same layout as build_code_embeddings.default_output_dir
+    return os.path.join(DEFAULT_EMB_DIR, graph_id)
+
+def load_previous_units(graph_id: str) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+    """
+    Units of the previous build grouped by file path (summaries included), or
+    None if there is no readable units.parquet for this graph.
+    """
+    path = os.path.join(units_output_dir(graph_id), "units.parquet")
+    try:
+        if os.path.isfile(path):
+            import pandas as pd
+            records = pd.read_parquet(path).to_dict("records")
+        elif os.path.isfile(path + ".jsonl.gz"):
+            with gzip.open(path + ".jsonl.gz", "rt", encoding="utf-8") as f:
+                records = [json.loads(line) for line in f if line.strip()]
+        else:
+            return None
+    except Exception:
+        return None
+    by_path = defaultdict(list)
+    for r in records:
+        by_path[r["file_path"]].append(r)
+    return dict(by_path)
+
+def save_units(graph_meta: Dict[str, Any], units: List[Dict[str, Any]]) -> str:
+    """
+    Save embedding units under .cache/embeddings/<graph_id>/units.parquet (+ meta.json),
+    where `build_code_embeddings.py --graph-id` embeds them without re-downloading.
+
+    meta.json is shared with the embeddings bundle: its other keys (index specs,
+    delta and cache stats) are kept, and a bundle already embedded from the
+    previous units is marked "stale" until build_code_embeddings rewrites it.
+    """
+    from build_code_embeddings import save_parquet, units_to_dataframe
+    from code_units import Unit
+
+    out_dir = ensure_dir(units_output_dir(graph_meta["graph_id"]))
+    out_path = os.path.join(out_dir, "units.parquet")
+    meta_path = os.path.join(out_dir, "meta.json")
+    save_parquet(units_to_dataframe([Unit(**u) for u in units]), out_path)
+    bundle_meta = {}
+    if os.path.isfile(meta_path):
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                bundle_meta = json.load(f)
+        except ValueError:
+            bundle_meta = {}
+    bundle_meta.update({"meta": graph_meta, "units_path": out_path})
+    if any(os.path.isfile(os.path.join(out_dir, f"{prefix}_ids.json")) for prefix in ("file", "symbol")):
+        bundle_meta["stale"] = True
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(bundle_meta, f, ensure_ascii=False, indent=2)
+    return out_path
+
 # ===================== Relevance Guard (signals + pruning) =====================
 
 def _norm_title(s: str) -> str:
@@ -825,6 +1022,7 @@ def build_prompt_shard_guarded(
             "classes": f["classes"][:8],
             "functions": f["functions"][:8],
             "imports": f["imports"][:8],
+            "depends_on": f.get("depends_on", [])[:8],
         })
 
     readme_block = ""
@@ -886,6 +1084,7 @@ def build_prompt_shard_guarded(
         [/file_paths]
 
         ## Context details for some files (use as hints; do NOT copy)
+        (depends_on: repo files this file imports; use it to group files that work together)
         {context_files_json}
 
         ## REQUIRED OUTPUT FORMAT (STRICT):
@@ -1179,13 +1378,43 @@ st.title("📚 GitHub → Sharded Knowledge Graph (Compact v2) → 📄 Wiki (QG
 
 with st.sidebar:
     st.header("Input")
-    gh_url = st.text_input(
-        "GitHub URL",
-        help="Examples:\n- https://github.com/pallets/flask\n- https://github.com/pallets/flask/tree/main/src\n- https://github.com/owner/repo/blob/main/path/to/file"
-    )
-    token = st.text_input("GitHub token (optional)", type="password",
-                          help="Improves API rate limits. Create a fine-grained token with minimal permissions.")
+    source_mode = st.radio("Source", ["GitHub URL", "Local path"], horizontal=True,
+                           help="Local path: a git working tree or bare repo (blobs read from the object "
+                                "database, no checkout) or a plain directory.")
+    if source_mode == "Local path":
+        local_path = st.text_input("Repository path", help="Working tree, bare repo (*.git) or plain directory.")
+        local_rev = st.text_input("Commit-ish (optional)", help="Branch, tag or SHA to read; defaults to HEAD.")
+        local_subpath = st.text_input("Subpath (optional)")
+        gh_url, token = "", ""
+    else:
+        gh_url = st.text_input(
+            "GitHub URL",
+            help="Examples:\n- https://github.com/pallets/flask\n- https://github.com/pallets/flask/tree/main/src\n- https://github.com/owner/repo/blob/main/path/to/file"
+        )
+        token = st.text_input("GitHub token (optional)", type="password",
+                              help="Improves API rate limits. Create a fine-grained token with minimal permissions.")
+        local_path = local_rev = local_subpath = ""
     max_files = st.number_input("Max files to scan (0 = no limit)", min_value=0, value=0, step=25)
+    scan_workers = st.number_input("Parse worker processes (0 = all cores)", min_value=0, value=0, step=1,
+                                   help="1 parses in a single worker process (the parse time budget cannot be "
+                                        "enforced from the app thread); results are identical for any value.")
+    shard_strategy = st.radio("Sharding", ["Top-level directory", "Size-balanced"], horizontal=True,
+                              help="Size-balanced splits large directories and packs small ones so every shard "
+                                   "stays within a files + symbols budget.")
+    shard_budget = DEFAULT_SHARD_BUDGET
+    if shard_strategy == "Size-balanced":
+        shard_budget = st.number_input("Shard budget (files + symbols)", min_value=50,
+                                       value=DEFAULT_SHARD_BUDGET, step=100)
+    incremental = st.checkbox("Incremental rebuild", value=True,
+                              help="Re-parse only files whose content changed since the last build of this graph_id "
+                                   "and rewrite only the affected shards.")
+    skip_generated = st.checkbox("Skip generated / minified / vendored files", value=True,
+                                 help="Lockfiles, codegen output, minified bundles, vendor dirs, linguist-generated/"
+                                      "vendored (.gitattributes) and, for a plain local directory, .gitignore'd files keep a file "
+                                      "entry but are neither parsed nor split into embedding units.")
+    emit_units = st.checkbox("Extract embedding units (units.parquet)", value=True,
+                             help="Written under .cache/embeddings/<graph_id>/ from the same file reads; "
+                                  "embed them with `build_code_embeddings.py --graph-id <graph_id>`.")
 
     st.divider()
     st.header("Storage")
@@ -1205,21 +1434,35 @@ if run_btn:
     with tab_build:
         st.subheader("Build Log")
         try:
-            if not gh_url:
-                st.error("Please enter a GitHub URL.")
-                st.stop()
-
-            parts = parse_github_url(gh_url)
-            owner = parts["owner"]
-            repo = parts["repo"]
-            branch = parts["branch"] or get_default_branch(owner, repo, token=token)
-            subpath = parts["subpath"] or None
+            repo_src = None
+            if source_mode == "Local path":
+                if not local_path:
+                    st.error("Please enter a local repository path.")
+                    st.stop()
+                repo_src = open_local_repo_source(local_path, rev=local_rev.strip() or None)
+                info = repo_src.describe()
+                owner, repo, branch = info["owner"], info["repo"], info["branch"]
+                subpath = local_subpath.strip("/") or None
+                source_url, commit_sha = info["source_url"], info["commit_sha"]
+                # local graphs are keyed on the commit SHA (path for plain directories)
+                g_id = fingerprint(owner, repo, commit_sha or branch, subpath, commit_sha or source_url)
+            else:
+                if not gh_url:
+                    st.error("Please enter a GitHub URL.")
+                    st.stop()
+
+                parts = parse_github_url(gh_url)
+                owner = parts["owner"]
+                repo = parts["repo"]
+                branch = parts["branch"] or get_default_branch(owner, repo, token=token)
+                subpath = parts["subpath"] or None
+                source_url, commit_sha = gh_url, ""
+                g_id = fingerprint(owner, repo, branch, subpath, gh_url)
 
             st.write(f"**Repo:** `{owner}/{repo}`  |  **Branch:** `{branch}`  |  **Subpath:** `{subpath or '.'}`")
 
-            g_id = fingerprint(owner, repo, branch, subpath, gh_url)
             meta_common = {
-                "source_url": gh_url,
+                "source_url": source_url,
                 "owner": owner,
                 "repo": repo,
                 "branch": branch,
@@ -1228,31 +1471,75 @@ if run_btn:
                 "graph_id": g_id,
             }
 
-            with st.status("Downloading repository...", expanded=False) as status:
-                zip_bytes = download_repo_zip(owner, repo, branch)
-                status.update(label="Downloaded ZIP ✔️")
+            if repo_src is None:
+                with st.status("Downloading repository...", expanded=False) as status:
+                    archive = fetch_repo_archive(owner, repo, branch, token=token)
+                    if archive["from_cache"]:
+                        status.update(label="Archive unchanged, using cached ZIP ✔️")
+                    else:
+                        status.update(label=f"Downloaded ZIP ({archive['bytes_downloaded'] / 1e6:.1f} MB) ✔️")
 
-            with st.status("Unzipping archive...", expanded=False) as status:
-                repo_root = unzip_to_temp(zip_bytes)
-                status.update(label="Unzipped ✔️")
+                with st.status("Reading archive index...", expanded=False) as status:
+                    repo_src = ZipRepoSource(archive["path"])
+                    commit_sha = archive["sha"] or ""
+                    status.update(label="Archive indexed (streaming, no extraction) ✔️")
+            meta_common["commit_sha"] = commit_sha
 
             st.write("Scanning repository files (polyglot, compact v2)...")
             progress = st.progress(0.0, text="Starting...")
             limit = max_files if max_files and max_files > 0 else None
 
-            compact, totals = build_repo_compact_v2(repo_root, subpath=subpath, progress=progress, max_files=limit)
-            meta = meta_common | {"totals": totals}
+            prev_compact = prev_hashes = prev_units = None
+            if incremental:
+                prev_hashes = load_file_hashes(g_id, v2_dir)
+                prev_compact = load_previous_compact_v2(v2_dir, meta_common) if prev_hashes is not None else None
+                if prev_compact is None:
+                    prev_hashes = None
+                    st.info("No previous build with file hashes found for this graph — doing a full build.")
+                elif emit_units:
+                    prev_units = load_previous_units(g_id)
+
+            # Single pass: every file is read once and fanned out to the graph, README hints and units
+            readmes = collect_ancestor_readmes(repo_src, subpath=subpath)
+            scanned_units = {}
+            parse_report = ParseReport()  # covers the files parsed by this (possibly incremental) build
+
+            def on_scanned(rel_path, scanned):
+                parse_report.add(rel_path, scanned)
+                rec = readme_record(rel_path, scanned.get("readme"))
+                if rec:
+                    readmes.append(rec)
+                if emit_units:
+                    scanned_units[rel_path] = scanned["units"]
+
+            # Unchanged files are still read when a consumer has nothing cached for them
+            always_scan = (lambda p: True) if emit_units and prev_units is None else is_readme_path
+
+            compact, totals, hashes, changes = build_repo_compact_v2_incremental(
+                repo_src, prev_compact=prev_compact, prev_hashes=prev_hashes, subpath=subpath,
+                progress=progress, max_files=limit, workers=int(scan_workers) or None,
+                with_units=emit_units, always_scan=always_scan, on_scanned=on_scanned,
+                skip_generated=skip_generated
+            )
+            meta = meta_common | {"totals": totals, "parse": parse_report.to_meta(), "skip_generated": skip_generated,
+                                  "parser_version": PARSER_VERSION}
             single_path = save_compact_graph_v2(v2_dir, meta, compact, gzip_out=gzip_out)
+            save_file_hashes(meta, v2_dir, hashes)
 
             st.success("Compact v2 graph built and saved!")
             c1, c2, c3, c4 = st.columns(4)
             c1.metric("Files", totals["files"]); c2.metric("Classes", totals["classes"])
             c3.metric("Functions", totals["functions"]); c4.metric("Imports", totals["imports"])
+            show_parse_report(meta["parse"], totals.get("skipped"))
+            if prev_compact is not None:
+                st.write(
+                    f"Incremental: **{len(changes['added'])}** added, **{len(changes['modified'])}** modified, "
+                    f"**{len(changes['deleted'])}** deleted, "
+                    f"**{totals['files'] - len(changes['added']) - len(changes['modified'])}** reused."
+                )
             st.code(single_path, language="bash")
 
-            # Collect README files and save doc hints
-            st.write("Collecting README files...")
-            readmes = collect_readmes_text(repo_root, subpath=subpath)
+            # README doc hints (collected during the scan)
             if readmes:
                 hints_path = save_doc_hints(meta, v2_dir, readmes)
                 st.success(f"README hints saved: {hints_path}")
@@ -1260,18 +1547,46 @@ if run_btn:
                 st.info("No README files detected.")
 
             # Create shards
-            st.write("Creating shards (per top-level directory)...")
             out_dir = os.path.join(v2_dir, meta["graph_id"])
-            manifest = shard_compact_by_top_dir(compact | {"meta": meta}, out_dir=out_dir, gzip_out=gzip_out)
+            if shard_strategy == "Size-balanced":
+                st.write(f"Creating shards (size-balanced, budget {int(shard_budget)} files + symbols)...")
+                manifest = shard_compact_balanced(compact | {"meta": meta}, out_dir=out_dir, gzip_out=gzip_out,
+                                                  budget=int(shard_budget), reuse_unchanged=prev_compact is not None)
+                weights = [s["weight"] for s in manifest["shards"]]
+                if weights:
+                    st.write(f"{len(weights)} shards, weight {min(weights)}–{max(weights)}.")
+            else:
+                st.write("Creating shards (per top-level directory)...")
+                only_tops = None
+                # shards on disk are only reusable if the previous build used the same strategy
+                prev_man = os.path.join(out_dir, "manifest.json" + (".gz" if gzip_out else ""))
+                prev_strategy = load_json_autoz(prev_man).get("strategy", "top_dir") if os.path.isfile(prev_man) else None
+                if prev_compact is not None and prev_strategy == "top_dir":
+                    # an edit elsewhere can change which repo files a file's imports resolve to
+                    only_tops = changes["changed_tops"] | dep_changed_tops(prev_compact, compact)
+                manifest = shard_compact_by_top_dir(compact | {"meta": meta}, out_dir=out_dir, gzip_out=gzip_out,
+                                                    only_tops=only_tops)
+                if only_tops is not None:
+                    st.write(f"Rewrote {len(only_tops & {s['topdir'] for s in manifest['shards']})} of "
+                             f"{len(manifest['shards'])} shards.")
             man_path = os.path.join(out_dir, "manifest.json" + (".gz" if gzip_out else ""))
             st.success(f"Manifest & shards written under: {out_dir}")
             st.code(man_path, language="bash")
 
-            # Cleanup temp
-            try:
-                shutil.rmtree(os.path.dirname(repo_root))
-            except Exception:
-                pass
+            # Embedding units, in file order (reused per file when unchanged)
+            if emit_units:
+                units = []
+                for f in compact["files"]:
+                    if f["path"] in scanned_units:
+                        units.extend(scanned_units[f["path"]])
+                    else:
+                        units.extend((prev_units or {}).get(f["path"], []))
+                units_path = save_units(meta, units)
+                st.success(f"{len(units)} embedding units saved: {units_path}")
+                st.code(f"python build_code_embeddings.py --graph-id {g_id}", language="bash")
+
+            # Release the in-memory archive
+            repo_src.close()
 
             st.info("Next: use **Preview** to explore, or **Generate Wiki** to create the documentation XML.")
 
@@ -1285,20 +1600,14 @@ with tab_preview:
     st.subheader("Explore a sharded graph (per-file view by shard)")
     try:
         ensure_dir(v2_dir)
-        # list manifests under <v2>/<graph_id>/manifest.json[.gz]
-        manifests = []
-        for sub in os.listdir(v2_dir):
-            man1 = os.path.join(v2_dir, sub, "manifest.json")
-            man2 = man1 + ".gz"
-            if os.path.isfile(man1): manifests.append(man1)
-            if os.path.isfile(man2): manifests.append(man2)
-        manifests.sort(reverse=True)
+        # manifests under <v2>/<graph_id>/manifest.json[.gz], from the artifact catalog
+        manifests = {r["path"]: artifact_label(r, v2_dir) for r in list_artifacts("manifest", v2_dir)}
         if not manifests:
             st.info("No manifests found. Build a sharded graph first in the Build tab.")
         else:
-            selected_rel = st.selectbox("Select a manifest", options=[os.path.relpath(p, v2_dir) for p in manifests], key="preview_manifest")
-            manifest_path = os.path.join(v2_dir, selected_rel)
-            manifest = load_json_autoz(manifest_path)
+            manifest_path = st.selectbox("Select a manifest", options=list(manifests), format_func=manifests.get,
+                                         key="preview_manifest")
+            manifest = load_json_cached(manifest_path)
             meta = manifest.get("meta", {})
             st.write(
                 f"**Repo:** `{meta.get('owner','')}/{meta.get('repo','')}`  |  "
@@ -1319,41 +1628,27 @@ with tab_preview:
                         sp = os.path.join(os.path.dirname(manifest_path), sp)
                     shard_paths.append(sp)
                     shard_labels.append(os.path.basename(sp))
-                sel_idx = st.selectbox("Select a shard", options=list(range(len(shard_paths))),
+                find_path = st.text_input("Jump to the shard holding a file (repo path)", value="",
+                                          key="shard_find_path").strip().strip("/")
+                default_idx = 0
+                if find_path:
+                    hit = shard_for_path(manifest, find_path)
+                    if hit is None:
+                        st.warning(f"No shard covers `{find_path}`.")
+                    else:
+                        default_idx = shards.index(hit)
+                sel_idx = st.selectbox("Select a shard", options=list(range(len(shard_paths))), index=default_idx,
                                        format_func=lambda i: shard_labels[i] if 0 <= i < len(shard_labels) else "shard")
-                shard = load_json_autoz(shard_paths[sel_idx])
-                v1 = expand_compact_to_v1(shard)
-                nodes, edges = v1.get("nodes", []), v1.get("edges", [])
-
-                nodes_by_id = {n["id"]: n for n in nodes}
-                files_by_id = {n["id"]: n for n in nodes if n.get("type") == "file"}
-                file_index = {
-                    fid: {"path": fnode.get("path", fnode.get("label", "")), "lang": fnode.get("lang", ""),
-                          "classes": [], "functions": [], "imports": []}
-                    for fid, fnode in files_by_id.items()
-                }
-                for e in edges:
-                    src = e.get("source"); dst = e.get("target"); etype = e.get("type")
-                    if src not in file_index: continue
-                    tnode = nodes_by_id.get(dst)
-                    if not tnode: continue
-                    if etype == "FILE_CONTAINS_CLASS" and tnode.get("type") == "class":
-                        file_index[src]["classes"].append(tnode.get("label", ""))
-                    elif etype == "FILE_CONTAINS_FUNCTION" and tnode.get("type") == "function":
-                        file_index[src]["functions"].append(tnode.get("label", ""))
-                    elif etype == "FILE_IMPORTS" and tnode.get("type") == "import":
-                        file_index[src]["imports"].append(tnode.get("label", ""))
-
-                for rec in file_index.values():
-                    rec["classes"] = sorted(set([x for x in rec["classes"] if x]))
-                    rec["functions"] = sorted(set([x for x in rec["functions"] if x]))
-                    rec["imports"] = sorted(set([x for x in rec["imports"] if x]))
+                shard_view = CompactGraphView(load_json_cached(shard_paths[sel_idx]))
+                file_index = cached_load(shard_paths[sel_idx], lambda _: shard_view.file_index(), kind="file_index")
 
                 st.markdown("### Files (Imports, Classes, Functions) — this shard")
                 colf1, colf2, colf3 = st.columns([2, 1, 1])
                 with colf1:
                     substr = st.text_input("Filter by file path (substring)", value="", key="file_filter")
                     substr_norm = substr.strip().lower()
+                    import_filter = st.text_input("Imported module (exact name, shows its importers)", value="",
+                                                  key="import_filter").strip()
                 with colf2:
                     show_empty = st.checkbox("Show files with no detected symbols", value=False, key="show_empty_files")
                 with colf3:
@@ -1362,13 +1657,19 @@ with tab_preview:
                 sort_by = st.selectbox("Sort by", options=["path", "lang", "imports", "classes", "functions"], index=0, key="sort_by_files")
                 desc = st.checkbox("Sort descending", value=False, key="sort_desc_files")
 
+                importer_ids = None
+                if import_filter:
+                    importer_ids = {f"file:{p}" for p in shard_view.importers(import_filter)}
+                    st.caption(f"{len(importer_ids)} file(s) in this shard import `{import_filter}`")
+
                 rows = []
                 for fid, rec in file_index.items():
-                    path = rec["path"] or files_by_id[fid].get("label", "")
+                    path = rec["path"]
                     lang = rec.get("lang", "")
                     is_empty = not (rec["classes"] or rec["functions"] or rec["imports"])
                     if substr_norm and substr_norm not in path.lower(): continue
                     if not show_empty and is_empty: continue
+                    if importer_ids is not None and fid not in importer_ids: continue
                     rows.append({
                         "id": fid, "path": path, "lang": lang,
                         "imports": rec["imports"], "classes": rec["classes"], "functions": rec["functions"],
@@ -1437,21 +1738,15 @@ with tab_wiki:
     st.subheader("📄 Generate Wiki (Sharded map→reduce using QGenie)")
     try:
         ensure_dir(v2_dir)
-        manifests = []
-        for sub in os.listdir(v2_dir):
-            man1 = os.path.join(v2_dir, sub, "manifest.json")
-            man2 = man1 + ".gz"
-            if os.path.isfile(man1): manifests.append(man1)
-            if os.path.isfile(man2): manifests.append(man2)
-        manifests.sort(reverse=True)
+        manifests = {r["path"]: artifact_label(r, v2_dir) for r in list_artifacts("manifest", v2_dir)}
 
         if not manifests:
             st.info("No manifests found. Build a sharded graph first.")
             st.stop()
 
-        selected_rel = st.selectbox("Select a manifest", options=[os.path.relpath(m, v2_dir) for m in manifests], key="wiki_manifest_select")
-        manifest_path = os.path.join(v2_dir, selected_rel)
-        manifest = load_json_autoz(manifest_path)
+        manifest_path = st.selectbox("Select a manifest", options=list(manifests), format_func=manifests.get,
+                                     key="wiki_manifest_select")
+        manifest = load_json_cached(manifest_path)
         graph_meta = manifest.get("meta", {})
         owner_repo = f"{graph_meta.get('owner','')}/{graph_meta.get('repo','')}".strip("/")
         source_url = graph_meta.get("source_url", "")
@@ -1485,7 +1780,7 @@ with tab_wiki:
                     spath = s.get("path")
                     if spath and not os.path.isabs(spath):
                         spath = os.path.join(os.path.dirname(manifest_path), spath)
-                    shard = load_json_autoz(spath)
+                    shard = load_json_cached(spath)
                     all_paths.extend(_collect_all_paths_from_compact(shard))
                 signals = _derive_repo_signals_from_paths(all_paths)
                 allowed_norm, forbidden_norm = _allowed_forbidden_sections(signals)
@@ -1497,24 +1792,26 @@ with tab_wiki:
                     spath = s.get("path")
                     if spath and not os.path.isabs(spath):
                         spath = os.path.join(os.path.dirname(manifest_path), spath)
-                    shard = load_json_autoz(spath)
+                    shard = load_json_cached(spath)
 
                     shard_name = shard.get("meta", {}).get("shard") or f"shard{idx}"
                     safe_shard_name = shard_name.replace("/", "_")
-                    dict_imports = shard.get("dicts", {}).get("imports", [])
-                    files = shard.get("files", [])
-                    # build shard summary
-                    recs = []
-                    for f in files:
-                        imps = [dict_imports[i] for i in f.get("imports", []) if 0 <= i < len(dict_imports)]
-                        sym = len(f.get("classes", [])) + len(f.get("functions", [])) + len(imps)
-                        recs.append({"path": f["path"], "lang": f.get("lang") or "unknown",
-                                     "classes": f.get("classes", []), "functions": f.get("functions", []),
-                                     "imports": imps, "symbol_count": sym})
-                    recs.sort(key=lambda r: (r["symbol_count"], r["path"].lower()), reverse=True)
-                    shard_summary = {"files": recs[:int(max_files_per_shard)],
-                                     "files_total": len(files),
-                                     "langs": Counter([r["lang"] for r in recs]).most_common()}
+                    # shard summary: stored at build time, rebuilt here only for older shards
+                    shard_summary = summary_from_stats(shard.get("stats"), max_files=int(max_files_per_shard))
+                    if shard_summary is None:
+                        dict_imports = shard.get("dicts", {}).get("imports", [])
+                        files = shard.get("files", [])
+                        recs = []
+                        for f in files:
+                            imps = [dict_imports[i] for i in f.get("imports", []) if 0 <= i < len(dict_imports)]
+                            sym = len(f.get("classes", [])) + len(f.get("functions", [])) + len(imps)
+                            recs.append({"path": f["path"], "lang": f.get("lang") or "unknown",
+                                         "classes": f.get("classes", []), "functions": f.get("functions", []),
+                                         "imports": imps, "symbol_count": sym})
+                        recs.sort(key=lambda r: (r["symbol_count"], r["path"].lower()), reverse=True)
+                        shard_summary = {"files": recs[:int(max_files_per_shard)],
+                                         "files_total": len(files),
+                                         "langs": Counter([r["lang"] for r in recs]).most_common()}
 
                     if strict_relevance:
                         prompt = build_prompt_shard_guarded(
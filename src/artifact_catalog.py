@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite catalog of the artifacts under .cache (.cache/catalog.sqlite), so the
+apps' selectboxes are filled from one query instead of directory scans and
+file opens on every rerun.
+
+Kinds and where they live:
+  - graph_v1    <v1_dir>/<owner>__<repo>__<branch>__<graph_id>.json
+  - graph_v2    <v2_dir>/<owner>__<repo>__<branch>__<graph_id>__v2.json[.gz]
+  - manifest    <v2_dir>/<graph_id>/manifest.json[.gz]
+  - embeddings  <emb_dir>/<graph_id>/ (units.parquet, *.index and/or *_vectors.npy, meta.json)
+
+Every build step calls record_artifact() after writing its output (one
+transaction per row). Artifacts that predate the catalog or were copied in by
+hand are picked up by list_artifacts(): a base directory is re-indexed when its
+mtime differs from the one stored at the last index (adding/removing entries
+bumps it), which costs a listdir; only unknown paths are opened. Rows whose
+path has disappeared are dropped at query time.
+"""
+
+import gzip
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_CATALOG_PATH = os.path.join(os.getcwd(), ".cache", "catalog.sqlite")
+
+KINDS = ("graph_v1", "graph_v2", "manifest", "embeddings")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    path        TEXT PRIMARY KEY,
+    kind        TEXT NOT NULL,
+    base_dir    TEXT NOT NULL,
+    graph_id    TEXT,
+    owner       TEXT,
+    repo        TEXT,
+    branch      TEXT,
+    subpath     TEXT,
+    schema      TEXT,
+    size_bytes  INTEGER,
+    files       INTEGER,
+    classes     INTEGER,
+    functions   INTEGER,
+    imports     INTEGER,
+    created_at  TEXT,
+    mtime       REAL,
+    recorded_at REAL,
+    extra       TEXT
+);
+CREATE INDEX IF NOT EXISTS artifacts_kind_dir ON artifacts(kind, base_dir);
+CREATE INDEX IF NOT EXISTS artifacts_graph_id ON artifacts(graph_id);
+CREATE TABLE IF NOT EXISTS indexed_dirs (
+    kind      TEXT NOT NULL,
+    base_dir  TEXT NOT NULL,
+    dir_mtime INTEGER NOT NULL,
+    PRIMARY KEY (kind, base_dir)
+);
+"""
+
+_COLUMNS = ("path", "kind", "base_dir", "graph_id", "owner", "repo", "branch", "subpath", "schema",
+            "size_bytes", "files", "classes", "functions", "imports", "created_at", "mtime", "recorded_at", "extra")
+
+def _connect(db_path: Optional[str] = None) -> sqlite3.Connection:
+    db_path = db_path or DEFAULT_CATALOG_PATH
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+# ===================== Rows =====================
+
+def _path_size(path: str) -> int:
+    if os.path.isdir(path):
+        with os.scandir(path) as it:
+            return sum(e.stat().st_size for e in it if e.is_file())
+    return os.path.getsize(path)
+
+def _base_dir_of(path: str, kind: str) -> str:
+    # graphs are files in <base>/, bundles are directories <base>/<graph_id>/,
+    # manifests are files one level down in <base>/<graph_id>/
+    parent = os.path.dirname(os.path.abspath(path))
+    return os.path.dirname(parent) if kind == "manifest" else parent
+
+def _row(path: str, kind: str, meta: Dict[str, Any], extra: Optional[Dict[str, Any]] = None) -> Tuple:
+    path = os.path.abspath(path)
+    totals = meta.get("totals", {}) or {}
+    values = {
+        "path": path,
+        "kind": kind,
+        "base_dir": _base_dir_of(path, kind),
+        "graph_id": meta.get("graph_id"),
+        "owner": meta.get("owner"),
+        "repo": meta.get("repo"),
+        "branch": meta.get("branch"),
+        "subpath": meta.get("subpath"),
+        "schema": meta.get("schema"),
+        "size_bytes": _path_size(path),
+        "files": totals.get("files"),
+        "classes": totals.get("classes"),
+        "functions": totals.get("functions"),
+        "imports": totals.get("imports"),
+        "created_at": meta.get("created_at"),
+        "mtime": os.path.getmtime(path),
+        "recorded_at": time.time(),
+        "extra": json.dumps(extra or {}, ensure_ascii=False),
+    }
+    return tuple(values[c] for c in _COLUMNS)
+
+def _upsert(conn: sqlite3.Connection, rows: List[Tuple]):
+    placeholders = ", ".join("?" for _ in _COLUMNS)
+    conn.executemany(f"INSERT OR REPLACE INTO artifacts ({', '.join(_COLUMNS)}) VALUES ({placeholders})", rows)
+
+def record_artifact(path: str, kind: str, meta: Dict[str, Any], extra: Optional[Dict[str, Any]] = None,
+                    db_path: Optional[str] = None):
+    """Insert or replace the catalog row for an artifact that was just written."""
+    if kind not in KINDS:
+        raise ValueError(f"Unknown artifact kind: {kind}")
+    conn = _connect(db_path)
+    try:
+        with conn:
+            _upsert(conn, [_row(path, kind, meta, extra)])
+    finally:
+        conn.close()
+
+# ===================== Discovery (artifacts not recorded by a build) =====================
+
+def _meta_from_filename(name: str) -> Dict[str, Any]:
+    """owner__repo__branch__graph_id[__v2].json[.gz] -> partial meta."""
+    stem = name.split(".json")[0]
+    parts = stem.split("__")
+    meta = {}
+    if len(parts) >= 4:
+        meta = {"owner": parts[0], "repo": parts[1], "branch": parts[2], "graph_id": parts[3]}
+    if stem.endswith("__v2"):
+        meta["schema"] = "v2-compact"
+    return meta
+
+def _read_json_meta(path: str) -> Dict[str, Any]:
+    try:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            return json.load(f).get("meta", {}) or {}
+    except Exception:
+        return {}
+
+def _discover(kind: str, base_dir: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """(path, meta) for each artifact of kind directly under base_dir; only small files are opened."""
+    for name in os.listdir(base_dir):
+        full = os.path.join(base_dir, name)
+        if kind == "graph_v1" and name.endswith(".json") and os.path.isfile(full):
+            yield full, _meta_from_filename(name)
+        elif kind == "graph_v2" and name.endswith((".json", ".json.gz")) and os.path.isfile(full):
+            yield full, _meta_from_filename(name)
+        elif kind == "manifest" and os.path.isdir(full):
+            for man in ("manifest.json", "manifest.json.gz"):
+                if os.path.isfile(os.path.join(full, man)):
+                    yield os.path.join(full, man), _read_json_meta(os.path.join(full, man))
+        elif kind == "embeddings" and (os.path.isfile(os.path.join(full, "file.index"))
+                                       or os.path.isfile(os.path.join(full, "file_vectors.npy"))):
+            meta = _read_json_meta(os.path.join(full, "meta.json"))
+            yield full, {"graph_id": name} | meta
+
+def _reindex_if_changed(conn: sqlite3.Connection, kind: str, base_dir: str):
+    try:
+        dir_mtime = os.stat(base_dir).st_mtime_ns
+    except OSError:
+        return
+    row = conn.execute("SELECT dir_mtime FROM indexed_dirs WHERE kind = ? AND base_dir = ?", (kind, base_dir)).fetchone()
+    if row is not None and row["dir_mtime"] == dir_mtime:
+        return
+    known = {r["path"] for r in conn.execute("SELECT path FROM artifacts WHERE kind = ? AND base_dir = ?", (kind, base_dir))}
+    new_rows = []
+    for path, meta in _discover(kind, base_dir):
+        if os.path.abspath(path) not in known:
+            try:
+                new_rows.append(_row(path, kind, meta))
+            except OSError:
+                continue
+    with conn:
+        _upsert(conn, new_rows)
+        conn.execute("INSERT OR REPLACE INTO indexed_dirs (kind, base_dir, dir_mtime) VALUES (?, ?, ?)",
+                     (kind, base_dir, dir_mtime))
+
+# ===================== Queries =====================
+
+def list_artifacts(kind: str, base_dir: str, db_path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Catalog rows for kind under base_dir, ordered by path descending (the order
+    the selectboxes used with sorted directory listings).
+    """
+    base_dir = os.path.abspath(base_dir)
+    conn = _connect(db_path)
+    try:
+        _reindex_if_changed(conn, kind, base_dir)
+        rows = [dict(r) for r in conn.execute(
+            "SELECT * FROM artifacts WHERE kind = ? AND base_dir = ? ORDER BY path DESC", (kind, base_dir))]
+        gone = {r["path"] for r in rows if not os.path.exists(r["path"])}
+        if gone:
+            with conn:
+                conn.executemany("DELETE FROM artifacts WHERE path = ?", [(p,) for p in gone])
+            rows = [r for r in rows if r["path"] not in gone]
+    finally:
+        conn.close()
+    for r in rows:
+        r["extra"] = json.loads(r["extra"] or "{}")
+    return rows
+
+def artifact_paths(kind: str, base_dir: str, db_path: Optional[str] = None) -> List[str]:
+    return [r["path"] for r in list_artifacts(kind, base_dir, db_path)]
+
+def find_artifacts(kind: Optional[str] = None, graph_id: Optional[str] = None,
+                   db_path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Rows by kind and/or graph_id across all base dirs, most recently recorded first."""
+    clauses, params = [], []
+    if kind:
+        clauses.append("kind = ?"); params.append(kind)
+    if graph_id:
+        clauses.append("graph_id = ?"); params.append(graph_id)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    conn = _connect(db_path)
+    try:
+        rows = [dict(r) for r in conn.execute(f"SELECT * FROM artifacts {where} ORDER BY recorded_at DESC", params)]
+    finally:
+        conn.close()
+    rows = [r for r in rows if os.path.exists(r["path"])]
+    for r in rows:
+        r["extra"] = json.loads(r["extra"] or "{}")
+    return rows
+
+def artifact_label(row: Dict[str, Any], base_dir: Optional[str] = None) -> str:
+    """Selectbox label: relative path plus repo/branch and file count when known."""
+    name = os.path.relpath(row["path"], base_dir) if base_dir else os.path.basename(row["path"])
+    repo_id = "/".join(x for x in (row.get("owner"), row.get("repo")) if x)
+    bits = [f"{repo_id}@{row['branch']}" if repo_id and row.get("branch") else repo_id]
+    if row.get("files") is not None:
+        bits.append(f"{row['files']} files")
+    bits = [b for b in bits if b]
+    return f"{name}  ({', '.join(bits)})" if bits else name
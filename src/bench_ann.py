@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Recall / latency benchmark: the approximate indices vector_index.choose_index
+can build (IVF, IVF-PQ, HNSW) against the exact flat index, over the vectors
+of an embeddings bundle or a synthetic clustered corpus.
+
+For each index type and each nprobe / efSearch in the sweep it reports build
+(train + add) time, mean query latency (one query per search call, as the
+apps issue them), QPS and recall@k: the share of the flat index's top-k uids
+the approximate index also returns.
+
+Usage:
+  # Symbol vectors of a bundle built by build_code_embeddings.py
+  python bench_ann.py --graph-id 1a2b3c4d5e6f --prefix symbol
+
+  # Synthetic corpus: 200k unit-norm vectors of size 384 around 2k centers
+  python bench_ann.py --synthetic 200000 --dim 384
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from vector_index import build_id_index, choose_index, label_map, load_vectors, search_uids
+
+NPROBE_SWEEP = (1, 4, 16, 64)
+EF_SEARCH_SWEEP = (16, 64, 256)
+
+def normalize(x: np.ndarray) -> np.ndarray:
+    return x / np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+
+def synthetic_vectors(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Unit vectors scattered around ~sqrt(n)/10 random centers (embeddings are clustered, not uniform)."""
+    rng = np.random.default_rng(seed)
+    centers = normalize(rng.standard_normal((max(1, int(n ** 0.5 / 10)), dim)).astype(np.float32))
+    x = centers[rng.integers(0, len(centers), n)] + 0.35 * rng.standard_normal((n, dim)).astype(np.float32) / dim ** 0.5
+    return normalize(x).astype(np.float32)
+
+def bundle_vectors(graph_id: str, prefix: str):
+    """(uids, vectors) of a bundle, from <prefix>_vectors.npy (stored whatever index type it uses)."""
+    out_dir = os.path.join(".cache", "embeddings", graph_id)
+    vectors_path = os.path.join(out_dir, f"{prefix}_vectors.npy")
+    if not os.path.isfile(vectors_path):
+        raise SystemExit(f"{vectors_path} not found: rebuild the bundle once to store its vectors")
+    with open(os.path.join(out_dir, f"{prefix}_ids.json"), "r", encoding="utf-8") as f:
+        uids = json.load(f)
+    vecs = np.asarray(load_vectors(vectors_path), dtype=np.float32)
+    if len(vecs) != len(uids):
+        raise SystemExit(f"{vectors_path} has {len(vecs)} rows for {len(uids)} ids: rebuild the bundle")
+    return uids, vecs
+
+def time_search(index, labels, queries: np.ndarray, topk: int, **params):
+    found = []
+    t0 = time.perf_counter()
+    for q in queries:
+        found.append(search_uids(index, labels, q.reshape(1, -1), topk, **params)[1][0])
+    return found, (time.perf_counter() - t0) / len(queries)
+
+def recall(found: List[List[str]], truth: List[List[str]]) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / max(1, sum(len(t) for t in truth))
+
+def run_benchmark(uids: List[str], vecs: np.ndarray, queries: np.ndarray, topk: int,
+                  kinds=("ivf", "ivfpq", "hnsw")) -> List[Dict[str, Any]]:
+    rows = []
+    t0 = time.perf_counter()
+    flat = build_id_index(uids, vecs, choose_index(len(uids), vecs.shape[1], "flat"))
+    flat_build = time.perf_counter() - t0
+    labels = label_map(flat, uids)
+    truth, flat_s = time_search(flat, labels, queries, topk)
+    rows.append({"index": "Flat", "param": "", "build_s": flat_build, "ms": flat_s * 1e3, "recall": 1.0})
+    for kind in kinds:
+        spec = choose_index(len(uids), vecs.shape[1], kind)
+        t0 = time.perf_counter()
+        index = build_id_index(uids, vecs, spec)
+        build_s = time.perf_counter() - t0
+        labels = label_map(index, uids)
+        if kind == "hnsw":
+            sweep = [("ef_search", v) for v in EF_SEARCH_SWEEP]
+        else:
+            sweep = [("nprobe", v) for v in NPROBE_SWEEP if v <= spec["nlist"]]
+        for name, value in sweep:
+            found, sec = time_search(index, labels, queries, topk, **{name: value})
+            rows.append({"index": spec["factory"], "param": f"{name}={value}", "build_s": build_s,
+                         "ms": sec * 1e3, "recall": recall(found, truth)})
+    return rows
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark approximate FAISS indices against the flat index.")
+    src = p.add_mutually_exclusive_group()
+    src.add_argument("--graph-id", help="Embeddings bundle (.cache/embeddings/<graph_id>) to take vectors from")
+    src.add_argument("--synthetic", type=int, default=100_000, help="Number of synthetic vectors (default 100k)")
+    p.add_argument("--prefix", default="symbol", choices=("file", "symbol"), help="Bundle index to read")
+    p.add_argument("--dim", type=int, default=384, help="Synthetic vector size")
+    p.add_argument("--queries", type=int, default=200, help="Queries (perturbed corpus vectors)")
+    p.add_argument("--topk", type=int, default=10)
+    p.add_argument("--kinds", default="ivf,ivfpq,hnsw", help="Comma-separated index types to compare with flat")
+    args = p.parse_args()
+
+    if args.graph_id:
+        uids, vecs = bundle_vectors(args.graph_id, args.prefix)
+    else:
+        vecs = synthetic_vectors(args.synthetic, args.dim)
+        uids = [f"u{i}" for i in range(len(vecs))]
+    rng = np.random.default_rng(1)
+    picks = rng.choice(len(vecs), size=min(args.queries, len(vecs)), replace=False)
+    noise = 0.1 * rng.standard_normal((len(picks), vecs.shape[1])).astype(np.float32) / vecs.shape[1] ** 0.5
+    queries = (vecs[picks] + noise).astype(np.float32)
+
+    print(f"{len(vecs)} vectors of size {vecs.shape[1]}, {len(queries)} queries, recall@{args.topk}")
+    print(f"{'index':<16}{'param':<15}{'build s':>9}{'ms/query':>10}{'QPS':>9}{'recall':>8}")
+    for r in run_benchmark(uids, vecs, queries, args.topk, kinds=tuple(args.kinds.split(","))):
+        print(f"{r['index']:<16}{r['param']:<15}{r['build_s']:>9.2f}{r['ms']:>10.3f}"
+              f"{1e3 / max(r['ms'], 1e-9):>9.0f}{r['recall']:>8.1%}")
+
+if __name__ == "__main__":
+    main()
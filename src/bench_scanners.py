@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Throughput benchmark: lang_scanners (one combined regex pass per file) against
+the previous per-pattern parsers, kept below verbatim as the baseline.
+
+Reports MB/s per language for both, plus how many (kind, name) symbols agree
+(the scanners drop some keyword false positives and fix the C/C++ function
+backtracking, so agreement is high but not exact). The baseline never found
+Java methods, so a set of known snippets (KNOWN_SYMBOLS, e.g. generic Java
+methods) is also checked against the symbols the scanners must report, and
+against a time budget (long enum bodies and initializer tables).
+
+Usage:
+  # Source files of a local directory / git repo, grouped by language
+  python bench_scanners.py --local-path /path/to/repo
+
+  # Synthetic corpus (~4 MB per language)
+  python bench_scanners.py --synthetic-mb 4
+"""
+
+import argparse
+import os
+import random
+import re
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from lang_scanners import SCANNERS, scan_text
+from repo_scan import detect_lang_by_ext, open_repo_source
+
+# ===================== Baseline (previous repo_scan parsers) =====================
+
+_ident = r"[A-Za-z_][A-Za-z0-9_]*"
+_js_ident = r"[A-Za-z_$][A-Za-z0-9_$]*"
+
+def legacy_js_ts(src: str):
+    classes, imports, functions = [], [], []
+    for m in re.finditer(rf"\bclass\s+({_js_ident})\b", src):
+        classes.append(m.group(1))
+    for m in re.finditer(r"""import\s+(?:[\s\S]*?\s+from\s+)?['"]([^'"]+)['"]""", src):
+        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
+    for m in re.finditer(r"""require\(\s*['"]([^'"]+)['"]\s*\)""", src):
+        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
+    for m in re.finditer(rf"\bfunction\s+({_js_ident})\s*\(", src):
+        functions.append(m.group(1))
+    for m in re.finditer(rf"\bexport\s+function\s+({_js_ident})\s*\(", src):
+        functions.append(m.group(1))
+    for m in re.finditer(rf"\b(?:const|let|var)\s+({_js_ident})\s*=\s*function\b", src):
+        functions.append(m.group(1))
+    for m in re.finditer(rf"\b(?:const|let|var)\s+({_js_ident})\s*=\s*\(", src):
+        functions.append(m.group(1))
+    return classes, imports, list(dict.fromkeys(functions))
+
+def legacy_java(src: str):
+    classes, imports, functions = [], [], []
+    for m in re.finditer(rf"\b(class|interface|enum)\s+({_ident})\b", src):
+        classes.append(m.group(2))
+    for m in re.finditer(r"\bimport\s+([a-zA-Z0-9_\.]+)(?:\s*;\s*)", src):
+        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
+    return classes, imports, functions
+
+def legacy_go(src: str):
+    classes, imports, functions = [], [], []
+    for m in re.finditer(r'import\s+"([^"]+)"', src):
+        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
+    block = re.search(r"import\s*\((.*?)\)", src, re.S)
+    if block:
+        for m in re.finditer(r'"([^"]+)"', block.group(1)):
+            imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
+    for m in re.finditer(rf"\btype\s+({_ident})\s+struct\b", src):
+        classes.append(m.group(1))
+    for m in re.finditer(rf"\bfunc\s+(?:\([^)]+\)\s*)?({_ident})\s*\(", src):
+        functions.append(m.group(1))
+    return classes, imports, functions
+
+def legacy_c_cpp(src: str):
+    """
+    Heuristic parsing for C/C++:
+      - #include "..." and #include <...>  -> imports
+      - class/struct <Name>                -> classes
+      - top-level function definitions     -> functions (declarations excluded)
+    """
+    classes, imports, functions = [], [], []
+
+    # Includes: #include <header> or #include "header"
+    include_pattern = r'#\s*include\s*[<"]([^>"]+)[>"]'
+    for m in re.finditer(include_pattern, src):
+        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
+
+    # class/struct names
+    for m in re.finditer(rf"\b(class|struct)\s+({_ident})\b", src):
+        classes.append(m.group(2))
+
+    # Heuristic top-level function definition (requires a body '{', avoids ';' declarations)
+    # Examples matched:
+    #   int foo(int a) { ... }
+    #   static inline MyType ns::Class::method(T x) { ... }
+    #   template<typename T> T bar(T x) { ... }
+    func_pattern = (
+        r"(?m)^[ \t]*"                 # line start
+        r"[A-Za-z_][\w:\s\*\&\<\>]*\s+" # return type / qualifiers
+        r"(" + _ident + r")"           # function name (capture)
+        r"\s*\([^;]*\)"                # args (not containing ';')
+        r"\s*\{"                       # opening brace of body
+    )
+    for m in re.finditer(func_pattern, src):
+        functions.append(m.group(1))
+
+    # De-dup preserve order
+    functions = list(dict.fromkeys(functions))
+    return classes, imports, functions
+
+def legacy_rust(src: str):
+    classes, imports, functions = [], [], []
+    for m in re.finditer(r"\buse\s+([A-Za-z0-9_:\{\}\*,\s]+);", src):
+        mod = re.sub(r"\s+", " ", m.group(1)).strip()
+        imports.append({"type": "import", "module": mod, "names": [], "level": 0})
+    for m in re.finditer(rf"\b(struct|enum)\s+({_ident})\b", src):
+        classes.append(m.group(2))
+    for m in re.finditer(rf"\bfn\s+({_ident})\s*\(", src):
+        functions.append(m.group(1))
+    return classes, imports, functions
+
+def legacy_ruby(src: str):
+    classes, imports, functions = [], [], []
+    for m in re.finditer(rf"\bclass\s+({_ident})\b", src):
+        classes.append(m.group(1))
+    for m in re.finditer(r"""(?:require|require_relative)\s+['"]([^'"]+)['"]""", src):
+        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
+    for m in re.finditer(rf"(?m)^\s*def\s+({_ident})\b", src):
+        functions.append(m.group(1))
+    return classes, imports, functions
+
+def legacy_php(src: str):
+    classes, imports, functions = [], [], []
+    for m in re.finditer(rf"\bclass\s+({_ident})\b", src):
+        classes.append(m.group(1))
+    for m in re.finditer(rf"\bfunction\s+({_ident})\s*\(", src):
+        functions.append(m.group(1))
+    for m in re.finditer(r"\buse\s+([A-Za-z0-9_\\]+)\s*;", src):
+        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
+    return classes, imports, functions
+
+def legacy_kotlin(src: str):
+    classes, imports, functions = [], [], []
+    for m in re.finditer(rf"\b(class|object|interface)\s+({_ident})\b", src):
+        classes.append(m.group(2))
+    for m in re.finditer(r"\bimport\s+([A-Za-z0-9_\.]+)\s*", src):
+        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
+    for m in re.finditer(rf"\bfun\s+({_ident})\s*\(", src):
+        functions.append(m.group(1))
+    return classes, imports, functions
+
+LEGACY_PARSERS = {
+    "javascript": legacy_js_ts, "java": legacy_java, "go": legacy_go, "c": legacy_c_cpp, "cpp": legacy_c_cpp,
+    "rust": legacy_rust, "ruby": legacy_ruby, "php": legacy_php, "kotlin": legacy_kotlin,
+}
+
+# ===================== Corpus =====================
+
+_SYNTHETIC = {
+    "javascript": [
+        "import {{ a{i}, b{i} }} from './mod{i}';\n",
+        "const h{i} = require('lib{i}');\n",
+        "export function f{i}(x, y) {{\n  return x + y; // call g{i}(x)\n}}\n",
+        "class C{i} extends Base {{\n  m{i}() {{ if (this.x) {{ return 1; }} }}\n}}\n",
+        "const arrow{i} = (a) => a * {i};\n",
+    ],
+    "java": [
+        "import com.example.pkg{i}.Type{i};\n",
+        "public class C{i} {{\n  private int x{i};\n",
+        "  public void m{i}(int a, String b) throws IOException {{\n    if (a > {i}) {{ call{i}(b); }}\n  }}\n}}\n",
+        "  public static <T extends Comparable<T>> List<T> sorted{i}(List<T> xs) {{\n    return xs;\n  }}\n",
+    ],
+    "go": [
+        "import (\n\t\"fmt\"\n\t\"github.com/org/repo/pkg{i}\"\n)\n",
+        "type S{i} struct {{\n\tx int\n}}\n",
+        "func (s *S{i}) M{i}(a int) error {{\n\tif a > {i} {{\n\t\treturn nil\n\t}}\n\treturn fmt.Errorf(\"x\")\n}}\n",
+    ],
+    "c": [
+        "#include \"mod{i}.h\"\n#include <stdio.h>\n",
+        "struct s{i} {{ int a; int b; }};\n",
+        "static inline int func{i}(struct s{i} *p, const char *name) {{\n    if (p->a > {i}) {{ return p->b; }}\n    return call{i}(p, name);\n}}\n",
+        "int decl{i}(int a, int b);\n/* int not_a_func{i}(int a, int b) comment ... */\n",
+    ],
+    "rust": [
+        "use std::collections::{{HashMap, HashSet}};\nuse crate::m{i}::T{i};\n",
+        "pub struct S{i} {{ a: u32 }}\nenum E{i} {{ A, B }}\n",
+        "pub fn f{i}(x: u32) -> u32 {{\n    if x > {i} {{ g{i}(x) }} else {{ 0 }}\n}}\n",
+    ],
+    "ruby": [
+        "require 'lib{i}'\nrequire_relative 'mod{i}'\n",
+        "class C{i} < Base\n  def m{i}(a)\n    a + {i}\n  end\nend\n",
+    ],
+    "php": [
+        "use App\\Models\\M{i};\n",
+        "class C{i} {{\n  public function m{i}($a) {{ return $a + {i}; }}\n}}\n",
+    ],
+    "kotlin": [
+        "import com.example.pkg{i}.Type{i}\n",
+        "class C{i}(val x: Int) {{\n  fun m{i}(a: Int): Int {{ return a + {i} }}\n}}\nobject O{i}\n",
+    ],
+}
+
+# (language, snippet, (kind, name) symbols the scanner must report)
+KNOWN_SYMBOLS = [
+    ("java", "public class Box<T> {\n  public <T> List<T> items(Class<T> type) {\n    return null;\n  }\n}\n",
+     {("class", "Box"), ("function", "items")}),
+    ("java", "  static <K, V> Map<K, V> of(K k, V v) {\n    return new HashMap<>();\n  }\n",
+     {("function", "of")}),
+    ("java", "  public static <T extends Comparable<T>> T max(List<? extends T> xs) throws IOException {\n  }\n",
+     {("function", "max")}),
+    ("java", "  @Override\n  public String toString() {\n    if (x) { call(y); }\n  }\n",
+     {("function", "toString")}),
+    ("java", "  private final Map<String, List<Integer>> cache() {\n  }\n",
+     {("function", "cache")}),
+    # long enum bodies / initializer tables: no symbols inside, and no rescan from every line
+    ("java", "public enum Code {\n" + "".join(f"    CODE_{i},\n" for i in range(2000)) + "    LAST;\n}\n",
+     {("class", "Code")}),
+    ("c", "enum code {\n" + "".join(f"    CODE_{i},\n" for i in range(2000)) + "};\n",
+     set()),
+    ("c", "static const char *names[] = {\n" + "".join(f"    NAME_{i}, ALIAS_{i},\n" for i in range(2000)) + "};\n"
+          "static int\nlookup(const char *key) {\n}\n",
+     {("function", "lookup")}),
+]
+KNOWN_SYMBOLS_BUDGET_S = 0.25  # per snippet; the largest ones take a few ms when scanning is linear
+
+def synthetic_corpus(mb: float, seed: int = 0) -> Dict[str, List[str]]:
+    """~mb MB of generated source per language, split in ~20 KB files."""
+    rng = random.Random(seed)
+    corpus = {}
+    for lang, templates in _SYNTHETIC.items():
+        files, size, i = [], 0, 0
+        while size < mb * 1024 * 1024:
+            parts = []
+            while sum(len(p) for p in parts) < 20_000:
+                parts.append(rng.choice(templates).format(i=i))
+                i += 1
+            text = "".join(parts)
+            files.append(text)
+            size += len(text)
+        corpus[lang] = files
+    corpus["cpp"] = corpus["c"]
+    return corpus
+
+def repo_corpus(path: str) -> Dict[str, List[str]]:
+    source = open_repo_source(path)
+    corpus = defaultdict(list)
+    for locator, rel_path in source.iter_files():
+        lang = detect_lang_by_ext(os.path.splitext(rel_path)[1])
+        if lang in SCANNERS:
+            text = source.read_text(locator)
+            if text:
+                corpus[lang].append(text)
+    return dict(corpus)
+
+# ===================== Benchmark =====================
+
+def _symbols(result) -> set:
+    classes, imports, functions = result
+    return ({("class", c) for c in classes} | {("function", f) for f in functions}
+            | {("import", i["module"]) for i in imports})
+
+def _timed(parse, texts: List[str], repeat: int):
+    best, results = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        results = [parse(t) for t in texts]
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+def check_known_symbols() -> Dict[str, List[str]]:
+    """{lang: [missing / unexpected symbols, slow snippets]} over KNOWN_SYMBOLS (empty lists when all pass)."""
+    problems = defaultdict(list)
+    for lang, text, expected in KNOWN_SYMBOLS:
+        t0 = time.perf_counter()
+        found = _symbols(scan_text(lang, text))
+        elapsed = time.perf_counter() - t0
+        if elapsed > KNOWN_SYMBOLS_BUDGET_S:
+            problems[lang].append(f"{len(text) // 1024} KB snippet took {elapsed:.2f}s")
+        problems[lang] += [f"missing {k} {n}" for k, n in sorted(expected - found)]
+        problems[lang] += [f"unexpected {k} {n}" for k, n in sorted(found - expected)]
+    return dict(problems)
+
+def run_benchmark(corpus: Dict[str, List[str]], repeat: int = 3) -> List[Dict[str, float]]:
+    rows = []
+    for lang, texts in sorted(corpus.items()):
+        if not texts:
+            continue
+        mb = sum(len(t.encode("utf-8")) for t in texts) / (1024 * 1024)
+        legacy_s, legacy_res = _timed(LEGACY_PARSERS[lang], texts, repeat)
+        scan_s, scan_res = _timed(lambda t: scan_text(lang, t), texts, repeat)
+        old, new = set(), set()
+        for k, (a, b) in enumerate(zip(legacy_res, scan_res)):
+            old |= {(k,) + s for s in _symbols(a)}
+            new |= {(k,) + s for s in _symbols(b)}
+        rows.append({
+            "lang": lang, "files": len(texts), "mb": mb,
+            "legacy_mb_s": mb / max(legacy_s, 1e-9), "scanner_mb_s": mb / max(scan_s, 1e-9),
+            "agreement": len(old & new) / max(len(old | new), 1),
+        })
+    return rows
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark lang_scanners against the previous per-pattern parsers.")
+    src = p.add_mutually_exclusive_group()
+    src.add_argument("--local-path", help="Directory or local git repo to take source files from")
+    src.add_argument("--synthetic-mb", type=float, default=2.0, help="MB of generated source per language (default 2)")
+    p.add_argument("--repeat", type=int, default=3, help="Timed runs per parser; the best one is reported")
+    args = p.parse_args()
+
+    corpus = repo_corpus(args.local_path) if args.local_path else synthetic_corpus(args.synthetic_mb)
+    print(f"{'lang':<11}{'files':>7}{'MB':>8}{'legacy MB/s':>13}{'scanner MB/s':>14}{'speedup':>9}{'agree':>8}")
+    for r in run_benchmark(corpus, repeat=args.repeat):
+        print(f"{r['lang']:<11}{r['files']:>7}{r['mb']:>8.2f}{r['legacy_mb_s']:>13.1f}{r['scanner_mb_s']:>14.1f}"
+              f"{r['scanner_mb_s'] / max(r['legacy_mb_s'], 1e-9):>8.1f}x{r['agreement']:>8.1%}")
+    for lang, problems in sorted(check_known_symbols().items()):
+        cases = sum(1 for case in KNOWN_SYMBOLS if case[0] == lang)
+        print(f"known {lang} symbols: " + ("; ".join(problems) if problems else f"all {cases} snippets ok"))
+
+if __name__ == "__main__":
+    main()
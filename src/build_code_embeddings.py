@@ -3,11 +3,17 @@
 Build hybrid code embeddings (file-level + function/class-level) for a GitHub repository.
 
 Features:
-- Download GitHub repo as ZIP, parse polyglot code.
+- Download GitHub repo as ZIP (or read a local git repo), parse polyglot code.
 - Extract file-level units and symbol-level (function/class) units.
 - (Optional) Summarize each unit with QGenie for better NL alignment.
-- Embed with sentence-transformers; build FAISS indices.
+- Embed with sentence-transformers; build FAISS indices. The normalized vectors
+  are also saved as <prefix>_vectors.npy: without faiss, queries search them
+  with NumPy, and --reindex rebuilds the indices from them.
+- Byte-identical files are parsed, summarized and embedded once; their units
+  share a content_key in units.parquet and only the first copy is indexed.
 - Save all artifacts under .cache/embeddings/<graph_id>/.
+- Vectors are cached across runs in .cache/embedding_cache/ by embedding
+  model and prepared text, so a rebuild only embeds new or changed units.
 
 Usage:
   # Basic (no summarization)
@@ -23,6 +29,30 @@ Usage:
     --qgenie-model qwen2.5-14b-1m \
     --summarize-max 200
 
+  # Embedding requests are batched (--embed-batch-size, --embed-batch-chars) with
+  # --embed-concurrency requests in flight; EMBEDDINGS_API_BASE=http://127.0.0.1:8000/v1
+  # sends them to an OpenAI-style /embeddings endpoint instead of QGenie
+  # (e.g. a local stand-in server).
+
+  # Local working tree or bare repo (reads committed blobs, no checkout)
+  python build_code_embeddings.py \
+    --local-path /path/to/repo.git \
+    --rev v2.0.0 \
+    --subpath src
+
+  # Re-run on an updated repo: patch the existing indices in place, embedding
+  # only units whose text changed and dropping removed ones
+  python build_code_embeddings.py --github-url https://github.com/pallets/flask --delta
+  # (a --local-path graph_id changes with every commit: start from the previous one)
+  python build_code_embeddings.py --local-path /path/to/repo --delta-from 1a2b3c4d5e6f
+
+  # Rebuild the FAISS indices of an existing bundle from its stored vectors
+  # (e.g. with another --index type), without embedding anything again
+  python build_code_embeddings.py --graph-id 1a2b3c4d5e6f --reindex --index hnsw
+
+  # Units already extracted by the wiki app's ingestion (same graph_id, no re-download)
+  python build_code_embeddings.py --graph-id 1a2b3c4d5e6f
+
   # Query the built indices (hybrid retrieval)
   python build_code_embeddings.py \
     --query "How is request routing implemented?" \
@@ -34,16 +64,12 @@ Usage:
 from __future__ import annotations
 
 import argparse
-import ast
 import gzip
-import io
 import json
 import os
 import re
 import sys
-import tempfile
-import zipfile
-from dataclasses import dataclass, asdict
+from dataclasses import asdict
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional, Tuple
 
@@ -53,19 +79,26 @@ import pandas as pd
 from dotenv import load_dotenv
 load_dotenv()
 
+from artifact_catalog import record_artifact
+from code_units import Unit, extract_units_for_file, rebase_unit_records, unit_content_id
+from file_classifier import FileClassifier
+from repo_fetch import fetch_repo_archive, get_default_branch
+from embed_client import (EMBED_BATCH_CHARS, EMBED_BATCH_SIZE, EMBED_MAX_IN_FLIGHT, BatchEmbedder,
+                          ProgressFn, embedding_model_id)
+from embedding_cache import EmbeddingCache, text_key
+from repo_scan import ZipRepoSource, content_keys, open_local_repo_source
+from vector_index import (INDEX_KINDS, UID_ID_SCHEME, VECTOR_DTYPES, build_id_index, check_bundle_fresh,
+                          choose_index, have_faiss, is_id_mapped, label_map, load_search_index, load_vectors,
+                          merge_vectors, normalize_rows, rebuild_keeping, remove_units, save_vectors, search_uids,
+                          supports_remove, upsert_units)
+
 # Optional heavy deps are imported lazily:
 # - sentence_transformers
 # - faiss
-# - qgenie
+# - qgenie (through embed_client)
 
 # ===================== Repo Download / IO =====================
 
-SKIP_DIRS = {
-    ".git", "__pycache__", "venv", ".venv", "build", "dist", "node_modules",
-    ".mypy_cache", ".pytest_cache", "target", "out", ".gradle", ".idea"
-}
-MAX_FILE_BYTES = 2 * 1024 * 1024  # 2MB per file safety
-
 def now_iso() -> str:
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
 
@@ -82,259 +115,11 @@ def parse_github_url(url: str) -> Dict[str, str]:
     subpath = (subpath or "").lstrip("/")
     return {"owner": owner, "repo": repo, "branch": branch or "", "subpath": subpath}
 
-def http_get_json(url: str, token: Optional[str] = None):
-    from urllib.request import Request, urlopen
-    headers = {"User-Agent": "code-embedder"}
-    if token:
-        headers["Authorization"] = f"Bearer {token}"
-    req = Request(url, headers=headers)
-    with urlopen(req, timeout=30) as resp:
-        import json as _json
-        return _json.load(io.TextIOWrapper(resp, encoding="utf-8"))
-
-def get_default_branch(owner: str, repo: str, token: Optional[str] = None) -> str:
-    try:
-        info = http_get_json(f"https://api.github.com/repos/{owner}/{repo}", token=token)
-        if info.get("default_branch"):
-            return info["default_branch"]
-    except Exception:
-        pass
-    return "main"
-
-def can_download_zip(owner: str, repo: str, branch: str) -> bool:
-    from urllib.request import Request, urlopen
-    url = f"https://codeload.github.com/{owner}/{repo}/zip/refs/heads/{branch}"
-    try:
-        req = Request(url, headers={"User-Agent": "code-embedder"})
-        with urlopen(req, timeout=10) as resp:
-            return resp.status == 200
-    except Exception:
-        return False
-
-def download_repo_zip(owner: str, repo: str, branch: str) -> bytes:
-    from urllib.request import Request, urlopen
-    url = f"https://codeload.github.com/{owner}/{repo}/zip/refs/heads/{branch}"
-    req = Request(url, headers={"User-Agent": "code-embedder"})
-    with urlopen(req, timeout=60) as resp:
-        return resp.read()
-
-def unzip_to_temp(zip_bytes: bytes) -> str:
-    tmpdir = tempfile.mkdtemp(prefix="ghrepo_")
-    with zipfile.ZipFile(io.BytesIO(zip_bytes)) as zf:
-        zf.extractall(tmpdir)
-    # pick biggest dir by file count
-    entries = [os.path.join(tmpdir, d) for d in os.listdir(tmpdir)]
-    dirs = [p for p in entries if os.path.isdir(p)]
-    if not dirs:
-        raise RuntimeError("Unexpected ZIP structure.")
-    return max(dirs, key=lambda p: sum(len(files) for _, _, files in os.walk(p)))
-
-def iter_repo_files(root_dir: str, subpath: Optional[str] = None, max_files: Optional[int] = None):
-    base = os.path.join(root_dir, subpath) if subpath else root_dir
-    count = 0
-    for dirpath, dirnames, filenames in os.walk(base):
-        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.startswith(".")]
-        for fn in filenames:
-            abs_path = os.path.join(dirpath, fn)
-            rel_path = os.path.relpath(abs_path, root_dir).replace("\\", "/")
-            yield abs_path, rel_path
-            # count += 1
-            # if max_files and count >= max_files:
-            #     return
-
-def read_text_file(path: str) -> Optional[str]:
-    try:
-        if os.path.getsize(path) > MAX_FILE_BYTES:
-            return None
-        with open(path, "rb") as f:
-            data = f.read()
-        if b"\x00" in data:
-            return None
-        try:
-            return data.decode("utf-8")
-        except UnicodeDecodeError:
-            return data.decode("utf-8", errors="ignore")
-    except Exception:
-        return None
-
 def fingerprint(owner: str, repo: str, branch: str, subpath: Optional[str], url: str) -> str:
     payload = f"{owner}/{repo}@{branch}:{subpath or ''}|{url}"
     import hashlib
     return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
 
-# ===================== Language Helpers (polyglot) =====================
-
-PY_EXTS   = {".py"}
-JS_TS_EXTS= {".js",".jsx",".ts",".tsx",".mjs",".cjs"}
-JAVA_EXTS = {".java"}
-GO_EXTS   = {".go"}
-C_EXTS    = {".c",".h"}
-CPP_EXTS  = {".cc",".cpp",".cxx",".hpp",".hh",".hxx",".c++",".h++"}
-RUST_EXTS = {".rs"}
-RUBY_EXTS = {".rb"}
-PHP_EXTS  = {".php"}
-KT_EXTS   = {".kt",".kts"}
-
-def detect_lang(path: str) -> str:
-    ext = os.path.splitext(path)[1].lower()
-    if ext in PY_EXTS: return "python"
-    if ext in JS_TS_EXTS: return "javascript"
-    if ext in JAVA_EXTS: return "java"
-    if ext in GO_EXTS: return "go"
-    if ext in C_EXTS or ext in CPP_EXTS: return "cpp" if ext in CPP_EXTS else "c"
-    if ext in RUST_EXTS: return "rust"
-    if ext in RUBY_EXTS: return "ruby"
-    if ext in PHP_EXTS: return "php"
-    if ext in KT_EXTS: return "kotlin"
-    return "text"
-
-# ===================== Unit Extraction =====================
-
-@dataclass
-class Unit:
-    uid: str                 # unique id (we'll create)
-    level: str               # "file" | "symbol"
-    file_path: str
-    lang: str
-    symbol_type: Optional[str] = None  # "function" | "class" | None
-    symbol_name: Optional[str] = None
-    start_line: Optional[int] = None
-    end_line: Optional[int] = None
-    signature: Optional[str] = None
-    docstring: Optional[str] = None
-    code: Optional[str] = None
-    summary: Optional[str] = None      # LLM summary (optional)
-
-def extract_python_units(path: str, text: str) -> List[Unit]:
-    units: List[Unit] = []
-    try:
-        tree = ast.parse(text)
-    except SyntaxError:
-        return units
-    lines = text.splitlines()
-    def get_segment(node):
-        lineno = getattr(node, "lineno", None)
-        end_lineno = getattr(node, "end_lineno", None)
-        if lineno and end_lineno and 1 <= lineno <= len(lines) and 1 <= end_lineno <= len(lines):
-            return "\n".join(lines[lineno-1:end_lineno]), lineno, end_lineno
-        return None, None, None
-
-    # Top-level file unit
-    units.append(Unit(
-        uid=f"file::{path}",
-        level="file",
-        file_path=path,
-        lang="python",
-        code=text,
-        docstring=ast.get_docstring(tree) or None
-    ))
-
-    for node in ast.walk(tree):
-        if isinstance(node, ast.FunctionDef) or isinstance(node, ast.AsyncFunctionDef):
-            code, sl, el = get_segment(node)
-            doc = ast.get_docstring(node)
-            sig = f"{node.name}({', '.join(a.arg for a in node.args.args)})"
-            units.append(Unit(
-                uid=f"symbol::{path}::function::{node.name}::{sl or 0}",
-                level="symbol",
-                file_path=path, lang="python",
-                symbol_type="function", symbol_name=node.name,
-                start_line=sl, end_line=el,
-                signature=sig, docstring=doc, code=code
-            ))
-        elif isinstance(node, ast.ClassDef):
-            code, sl, el = get_segment(node)
-            doc = ast.get_docstring(node)
-            units.append(Unit(
-                uid=f"symbol::{path}::class::{node.name}::{sl or 0}",
-                level="symbol",
-                file_path=path, lang="python",
-                symbol_type="class", symbol_name=node.name,
-                start_line=sl, end_line=el,
-                signature=node.name, docstring=doc, code=code
-            ))
-    return units
-
-# For other languages, we use heuristics to find function/class headers and capture a block window
-_ident = r"[A-Za-z_][A-Za-z0-9_]*"
-_js_ident = r"[A-Za-z_$][A-Za-z0-9_$]*"
-
-def extract_js_ts_units(path: str, text: str) -> List[Unit]:
-    units: List[Unit] = [Unit(uid=f"file::{path}", level="file", file_path=path, lang="javascript", code=text)]
-    # classes
-    for m in re.finditer(rf"\bclass\s+({_js_ident})\b", text):
-        name = m.group(1)
-        snippet = text[m.start(): m.start() + 2000]
-        units.append(Unit(uid=f"symbol::{path}::class::{name}::{m.start()}",
-                          level="symbol", file_path=path, lang="javascript",
-                          symbol_type="class", symbol_name=name, start_line=None, end_line=None,
-                          signature=name, code=snippet))
-    # functions (common patterns)
-    patterns = [
-        rf"\bfunction\s+({_js_ident})\s*\(",
-        rf"\bexport\s+function\s+({_js_ident})\s*\(",
-        rf"\b(?:const|let|var)\s+({_js_ident})\s*=\s*function\b",
-        rf"\b(?:const|let|var)\s+({_js_ident})\s*=\s*\(",
-    ]
-    for pat in patterns:
-        for m in re.finditer(pat, text):
-            name = m.group(1)
-            snippet = text[m.start(): m.start() + 2000]
-            units.append(Unit(uid=f"symbol::{path}::function::{name}::{m.start()}",
-                              level="symbol", file_path=path, lang="javascript",
-                              symbol_type="function", symbol_name=name, code=snippet))
-    return units
-
-def extract_simple_block_units(path: str, text: str, lang: str, func_re: str, class_re: Optional[str] = None) -> List[Unit]:
-    units: List[Unit] = [Unit(uid=f"file::{path}", level="file", file_path=path, lang=lang, code=text)]
-    # classes
-    if class_re:
-        for m in re.finditer(class_re, text):
-            name = m.group(1)
-            snippet = text[m.start(): m.start()+2000]
-            units.append(Unit(uid=f"symbol::{path}::class::{name}::{m.start()}",
-                              level="symbol", file_path=path, lang=lang,
-                              symbol_type="class", symbol_name=name, code=snippet))
-    # functions
-    for m in re.finditer(func_re, text):
-        name = m.group(1)
-        snippet = text[m.start(): m.start()+2000]
-        units.append(Unit(uid=f"symbol::{path}::function::{name}::{m.start()}",
-                          level="symbol", file_path=path, lang=lang,
-                          symbol_type="function", symbol_name=name, code=snippet))
-    return units
-
-def extract_units_for_file(path: str, text: str) -> List[Unit]:
-    lang = detect_lang(path)
-    if lang == "python":
-        return extract_python_units(path, text)
-    if lang == "javascript":
-        return extract_js_ts_units(path, text)
-    if lang == "java":
-        return extract_simple_block_units(path, text, "java",
-            func_re=rf"\b({_ident})\s*\([^;]*\)\s*\{{", class_re=rf"\bclass\s+({_ident})\b")
-    if lang == "go":
-        return extract_simple_block_units(path, text, "go",
-            func_re=rf"\bfunc\s+(?:\([^)]+\)\s*)?({_ident})\s*\(", class_re=rf"\btype\s+({_ident})\s+struct\b")
-    if lang in ("c","cpp"):
-        return extract_simple_block_units(path, text, lang,
-            func_re=rf"(?m)^[ \t]*(?:[_A-Za-z]\w*[\s\*\&\<\>:]+)+({_ident})\s*\([^;{{\)]*\)\s*\{{",
-            class_re=rf"\b(class|struct)\s+({_ident})\b")  # note: group(2) would be name; we use simple capture
-    if lang == "rust":
-        return extract_simple_block_units(path, text, "rust",
-            func_re=rf"\bfn\s+({_ident})\s*\(", class_re=rf"\b(struct|enum)\s+({_ident})\b")
-    if lang == "ruby":
-        return extract_simple_block_units(path, text, "ruby",
-            func_re=rf"(?m)^\s*def\s+({_ident})\b", class_re=rf"\bclass\s+({_ident})\b")
-    if lang == "php":
-        return extract_simple_block_units(path, text, "php",
-            func_re=rf"\bfunction\s+({_ident})\s*\(", class_re=rf"\bclass\s+({_ident})\b")
-    if lang == "kotlin":
-        return extract_simple_block_units(path, text, "kotlin",
-            func_re=rf"\bfun\s+({_ident})\s*\(", class_re=rf"\b(class|object|interface)\s+({_ident})\b")
-    # fallback file-only
-    return [Unit(uid=f"file::{path}", level="file", file_path=path, lang=lang, code=text)]
-
 # ===================== Summarization (QGenie) =====================
 
 def summarize_units_with_qgenie(units: List[Unit], max_items: Optional[int] = None):
@@ -345,7 +130,12 @@ def summarize_units_with_qgenie(units: List[Unit], max_items: Optional[int] = No
         return
     client = QGenieClient()
     count = 0
+    done: Dict[str, str] = {}  # unit_content_id -> summary, so identical files are summarized once
     for u in units:
+        content_id = unit_content_id(u.uid, u.file_path, u.content_key)
+        if content_id in done:
+            u.summary = done[content_id]
+            continue
         if max_items and count >= max_items:
             break
         # Skip empty code
@@ -373,43 +163,170 @@ Code (excerpt):
         try:
             resp = client.chat(messages=[ChatMessage(role="user", content=prompt)])
             u.summary = getattr(resp, "first_content", None) or str(resp)
+            done[content_id] = u.summary
             count += 1
         except Exception as e:
             print(f"[WARN] QGenie summarization failed for {u.uid}: {e}", file=sys.stderr)
 
 # ===================== Embedding + FAISS =====================
 
-from qgenie import QGenieClient
-
-def embed_texts(texts: List[str], device: Optional[str] = None) -> np.ndarray:
+def embed_texts(texts: List[str], device: Optional[str] = None,
+                batch_size: int = EMBED_BATCH_SIZE, batch_chars: int = EMBED_BATCH_CHARS,
+                max_in_flight: int = EMBED_MAX_IN_FLIGHT, progress: Optional[ProgressFn] = None,
+                cache: Optional[EmbeddingCache] = None) -> np.ndarray:
     """
-    Embeds a list of texts using QGenie embedding API.
+    Embeds a list of texts using the QGenie embedding API (or EMBEDDINGS_API_BASE),
+    in batches of at most batch_size texts / batch_chars characters with up to
+    max_in_flight requests running at once. Rows follow the order of texts.
+    With a cache, only texts it does not hold yet are sent.
     """
-    client = QGenieClient()
-    embedding_response = client.embeddings(texts)
-
-    # Extract embeddings from response
-    embeddings = [item.embedding for item in embedding_response.data]
+    embedder = BatchEmbedder(batch_size=batch_size, batch_chars=batch_chars,
+                             max_in_flight=max_in_flight, progress=progress)
+    if cache is not None:
+        return cache.get_or_embed(texts, embedder.embed)
+    return embedder.embed(texts)
+
+def embed_progress(label: str) -> ProgressFn:
+    def report(done: int, total: int, texts_done: int):
+        print(f"[INFO] {label}: batch {done}/{total} ({texts_done} texts)")
+    return report
+
+def build_faiss_index(embeddings: np.ndarray, uids: List[str], kind: str = "auto") -> Tuple[Any, Dict[str, Any]]:
+    """
+    Builds a FAISS index using inner product (cosine similarity), each vector
+    stored under the id of its unit uid (vector_index.uid_to_id). kind "auto"
+    picks exact / IVF / IVF-PQ by unit count and dimension (vector_index.choose_index).
+    Returns (index, spec).
+    """
+    spec = choose_index(len(uids), embeddings.shape[1], kind)
+    return build_id_index(uids, embeddings, spec), spec
 
-    return np.asarray(embeddings, dtype=np.float32)
+def text_hash(text: str) -> str:
+    return text_key(text).hex()[:16]
 
-def build_faiss_index(embeddings: np.ndarray):
+def load_index_state(out_dir: str, prefix: str) -> Optional[Dict[str, Any]]:
     """
-    Builds a FAISS index using inner product (cosine similarity).
+    What --delta starts from: {"texts": {uid: text_hash of its embedded text},
+    "ids": [...], "index": ID-mapped faiss index or None, "vectors": memmap of
+    <prefix>_vectors.npy or None}. None if the bundle has neither an index
+    nor vectors to patch.
     """
-    try:
+    index_path = os.path.join(out_dir, f"{prefix}.index")
+    ids_path = os.path.join(out_dir, f"{prefix}_ids.json")
+    texts_path = os.path.join(out_dir, f"{prefix}_texts.json")
+    vectors_path = os.path.join(out_dir, f"{prefix}_vectors.npy")
+    if not (os.path.isfile(texts_path) and os.path.isfile(ids_path)):
+        return None
+    with open(texts_path, "r", encoding="utf-8") as f:
+        indexed = json.load(f)
+    with open(ids_path, "r", encoding="utf-8") as f:
+        ids = json.load(f)
+    index = None
+    if os.path.isfile(index_path) and have_faiss():
         import faiss
-    except ImportError:
-        raise RuntimeError("Please install: pip install faiss-cpu")
+        index = faiss.read_index(index_path)
+        if not is_id_mapped(index) or index.ntotal != len(indexed):
+            index = None
+    vectors = load_vectors(vectors_path) if os.path.isfile(vectors_path) else None
+    if vectors is not None and len(vectors) != len(ids):
+        vectors = None
+    if index is None and vectors is None:
+        return None
+    return {"texts": indexed, "ids": ids, "index": index, "vectors": vectors}
 
-    dim = embeddings.shape[1]
-    index = faiss.IndexFlatIP(dim)  # inner product (cosine since we normalize)
-    index.add(embeddings)
+def load_index_specs(out_dir: str) -> Dict[str, Any]:
+    """{"file": spec, "symbol": spec} recorded in a bundle's meta.json (empty if none)."""
+    try:
+        with open(os.path.join(out_dir, "meta.json"), "r", encoding="utf-8") as f:
+            index_meta = json.load(f).get("index") or {}
+    except (OSError, ValueError):
+        return {}
+    return {k: v for k, v in index_meta.items() if isinstance(v, dict)}
+
+def diff_units(indexed: Dict[str, str], uids: List[str], texts: List[str]) -> Tuple[List[int], List[str], Dict[str, int]]:
+    """(positions in uids to embed, uids to drop, counts) going from the units in indexed to uids/texts."""
+    wanted = set(uids)
+    removed = [uid for uid in indexed if uid not in wanted]
+    todo = [i for i, (uid, text) in enumerate(zip(uids, texts)) if indexed.get(uid) != text_hash(text)]
+    changed = sum(1 for i in todo if uids[i] in indexed)
+    return todo, removed, {"added": len(todo) - changed, "changed": changed, "removed": len(removed),
+                           "unchanged": len(uids) - len(todo)}
+
+def patch_index(index, indexed: Dict[str, str], uids: List[str], todo_uids: List[str], todo_vecs: np.ndarray,
+                removed: List[str], spec: Dict[str, Any]):
+    """
+    Brings an ID-mapped index from the units in indexed to uids: drops removed,
+    (re)adds todo_uids with their new vectors. An index without removal (HNSW)
+    is rebuilt from its stored vectors when units go away or change.
+    """
+    todo_set = set(todo_uids)
+    if supports_remove(index):
+        remove_units(index, removed)
+    elif removed or any(uid in indexed for uid in todo_set):
+        wanted = set(uids)
+        index = rebuild_keeping(index, [uid for uid in indexed if uid in wanted and uid not in todo_set], spec)
+    if todo_uids:
+        upsert_units(index, todo_uids, todo_vecs)
     return index
 
+def reindex_bundle(out_dir: str, kind: str = "auto") -> Dict[str, Any]:
+    """Rebuild the FAISS indices of a bundle from its <prefix>_vectors.npy (nothing is embedded); returns the specs."""
+    if not have_faiss():
+        raise RuntimeError("Re-indexing builds FAISS indices: pip install faiss-cpu "
+                           "(without it, queries already search the stored vectors with NumPy)")
+    import faiss
+    specs = {}
+    for prefix in ("file", "symbol"):
+        vectors_path = os.path.join(out_dir, f"{prefix}_vectors.npy")
+        if not os.path.isfile(vectors_path):
+            raise RuntimeError(f"{vectors_path} not found: rebuild the bundle once to store its vectors")
+        with open(os.path.join(out_dir, f"{prefix}_ids.json"), "r", encoding="utf-8") as f:
+            ids = json.load(f)
+        vecs = np.asarray(load_vectors(vectors_path), dtype=np.float32)
+        index, specs[prefix] = build_faiss_index(vecs, ids, kind)
+        faiss.write_index(index, os.path.join(out_dir, f"{prefix}.index"))
+        print(f"[INFO] {prefix} index: {specs[prefix]['factory']} over {len(ids)} vectors")
+    meta_path = os.path.join(out_dir, "meta.json")
+    with open(meta_path, "r", encoding="utf-8") as f:
+        bundle_meta = json.load(f)
+    bundle_meta["index"] = (bundle_meta.get("index") or {}) | specs
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(bundle_meta, f, ensure_ascii=False, indent=2)
+    return specs
+
 
 # ===================== Packing + Saving =====================
 
+# Embedding texts
+# - For files: prefer summary (if any) + path; else first 1500 chars code
+# - For symbols: prefer summary + signature + name + short code
+def _field(row, key: str) -> str:
+    # all-None columns come back as NaN (float) from pandas; treat any non-str as missing
+    value = row.get(key)
+    return value if isinstance(value, str) else ""
+
+def prep_file_text(row):
+    base = _field(row, "summary")
+    if not base:
+        code = _field(row, "code")[:1500]
+        base = f"{_field(row, 'file_path')}\n{code}"
+    else:
+        base = f"{_field(row, 'file_path')}\n{base}"
+    return base
+
+def prep_symbol_text(row):
+    parts = []
+    if _field(row, "summary"):
+        parts.append(_field(row, "summary"))
+    sig = _field(row, "signature") or _field(row, "symbol_name")
+    if sig:
+        parts.append(sig)
+    parts.append(_field(row, "file_path"))
+    code = _field(row, "code")[:1500]
+    if code:
+        parts.append(code)
+    return "\n".join([p for p in parts if p])
+
 def units_to_dataframe(units: List[Unit]) -> pd.DataFrame:
     recs = []
     for u in units:
@@ -418,10 +335,31 @@ def units_to_dataframe(units: List[Unit]) -> pd.DataFrame:
             "symbol_type": u.symbol_type, "symbol_name": u.symbol_name,
             "start_line": u.start_line, "end_line": u.end_line,
             "signature": u.signature, "docstring": u.docstring,
-            "summary": u.summary, "code": u.code
+            "summary": u.summary, "code": u.code, "content_key": u.content_key
         })
     return pd.DataFrame.from_records(recs)
 
+def first_copies(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, List[str]]]:
+    """
+    Rows to embed: the first unit of every unit_content_id (units of byte-identical
+    files share one), plus {embedded uid: uids of its other copies}.
+    """
+    if df.empty:
+        return df, {}
+    content_ids = [unit_content_id(uid, path, key if isinstance(key, str) else None)
+                   for uid, path, key in zip(df["uid"], df["file_path"], df.get("content_key", [None] * len(df)))]
+    first_uid: Dict[str, str] = {}
+    copies: Dict[str, List[str]] = {}
+    keep = []
+    for uid, cid in zip(df["uid"], content_ids):
+        if cid in first_uid:
+            copies.setdefault(first_uid[cid], []).append(uid)
+            keep.append(False)
+        else:
+            first_uid[cid] = uid
+            keep.append(True)
+    return df[keep], copies
+
 def default_output_dir(graph_id: str) -> str:
     return ensure_dir(os.path.join(".cache", "embeddings", graph_id))
 
@@ -434,27 +372,39 @@ def save_parquet(df: pd.DataFrame, path: str):
             for _, row in df.iterrows():
                 f.write(json.dumps(row.to_dict(), ensure_ascii=False) + "\n")
 
-def save_index(index, ids: List[str], out_dir: str, prefix: str):
-    # Save FAISS and ids
+def save_index(index, ids: List[str], out_dir: str, prefix: str, texts: Optional[List[str]] = None,
+               vectors: Optional[np.ndarray] = None, vectors_dtype: str = "float32"):
+    # Save FAISS and ids (+ {uid: text_hash} so --delta can patch the index later,
+    # + the normalized vectors in ids order for the NumPy backend and re-indexing)
     index_path = os.path.join(out_dir, f"{prefix}.index")
     ids_path = os.path.join(out_dir, f"{prefix}_ids.json")
-    try:
-        import faiss
-        faiss.write_index(index, index_path)
-    except Exception as e:
-        print(f"[WARN] Failed to save FAISS index: {e}", file=sys.stderr)
+    texts_path = os.path.join(out_dir, f"{prefix}_texts.json")
+    vectors_path = os.path.join(out_dir, f"{prefix}_vectors.npy")
+    if vectors is not None:
+        save_vectors(vectors_path, vectors, vectors_dtype)
+    elif os.path.isfile(vectors_path):
+        os.remove(vectors_path)  # would no longer line up with ids
+    if index is not None:
+        try:
+            import faiss
+            faiss.write_index(index, index_path)
+        except Exception as e:
+            print(f"[WARN] Failed to save FAISS index: {e}", file=sys.stderr)
+    elif os.path.isfile(index_path):
+        os.remove(index_path)  # stale: searches fall back to the vectors
     with open(ids_path, "w", encoding="utf-8") as f:
         json.dump(ids, f, ensure_ascii=False, indent=2)
+    if texts is not None:
+        with open(texts_path, "w", encoding="utf-8") as f:
+            json.dump({uid: text_hash(t) for uid, t in zip(ids, texts)}, f, ensure_ascii=False)
     return index_path, ids_path
 
 # ===================== Query (hybrid) =====================
 
-def hybrid_query(query: str, out_dir: str, topk: int = 5) -> List[Dict[str, Any]]:
-    try:
-        import faiss
-    except ImportError:
-        raise RuntimeError("pip install faiss-cpu")
-
+def hybrid_query(query: str, out_dir: str, topk: int = 5,
+                 nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> List[Dict[str, Any]]:
+    # nprobe (IVF) / ef_search (HNSW) override the defaults saved with the indices;
+    # without faiss the stored vectors are searched with NumPy
     # Load ids
     file_ids_path = os.path.join(out_dir, "file_ids.json")
     symbol_ids_path = os.path.join(out_dir, "symbol_ids.json")
@@ -464,82 +414,201 @@ def hybrid_query(query: str, out_dir: str, topk: int = 5) -> List[Dict[str, Any]
         symbol_ids = json.load(f)
 
     # Load indices
-    file_index = faiss.read_index(os.path.join(out_dir, "file.index"))
-    symbol_index = faiss.read_index(os.path.join(out_dir, "symbol.index"))
+    check_bundle_fresh(out_dir)
+    file_index = load_search_index(out_dir, "file")
+    symbol_index = load_search_index(out_dir, "symbol")
 
     qvec = embed_texts([query])[0].reshape(1, -1)
 
-    Df, If = file_index.search(qvec, topk)
-    Ds, Is = symbol_index.search(qvec, topk)
+    Df, Uf = search_uids(file_index, label_map(file_index, file_ids), qvec, topk, nprobe, ef_search)
+    Ds, Us = search_uids(symbol_index, label_map(symbol_index, symbol_ids), qvec, topk, nprobe, ef_search)
 
     hits = []
-    for score, idx in zip(Df[0].tolist(), If[0].tolist()):
-        hits.append({"source": "file", "uid": file_ids[idx], "score": float(score)})
-    for score, idx in zip(Ds[0].tolist(), Is[0].tolist()):
-        hits.append({"source": "symbol", "uid": symbol_ids[idx], "score": float(score)})
+    for score, uid in zip(Df[0], Uf[0]):
+        hits.append({"source": "file", "uid": uid, "score": float(score)})
+    for score, uid in zip(Ds[0], Us[0]):
+        hits.append({"source": "symbol", "uid": uid, "score": float(score)})
 
     hits.sort(key=lambda x: x["score"], reverse=True)
     return hits[:topk]
 
 # ===================== Main Pipeline =====================
 
-def build_units_for_repo(github_url: str, token: Optional[str]) -> Tuple[str, Dict[str, Any], List[Unit]]:
+def extract_units_from_source(repo_src, subpath: Optional[str],
+                              skip_generated: bool = True) -> Tuple[List[Unit], Dict[str, Any]]:
+    """
+    Units of every readable file, plus totals {files_scanned, units, skipped}.
+    With skip_generated, generated / minified / vendored files (file_classifier)
+    are left out and counted under skipped by reason.
+    """
+    all_units: List[Unit] = []
+    totals = {"files_scanned": 0, "units": 0, "skipped": {}, "duplicates": 0}
+    file_list = list(repo_src.iter_files(subpath=subpath))
+    classifier = FileClassifier.from_source(repo_src, file_list, subpath) if skip_generated else None
+    skipped = totals["skipped"]
+    shared: Dict[str, Tuple[str, List[Unit]]] = {}  # content key -> (first path, its units)
+    for (locator, rel_path), key in zip(file_list, content_keys(file_list, repo_src)):
+        if key in shared:  # byte-identical to a file already extracted (and not skipped by path)
+            src_path, src_units = shared[key]
+            if classifier is None or not classifier.classify_path(rel_path):
+                records = rebase_unit_records([asdict(u) for u in src_units], src_path, rel_path, key)
+                all_units.extend(Unit(**r) for r in records)
+                totals["files_scanned"] += 1
+                totals["duplicates"] += 1
+                continue
+        # path rules first, so skipped files are not even read
+        reason = classifier.classify_path(rel_path) if classifier is not None else None
+        text = None if reason else repo_src.read_text(locator)
+        if text and classifier is not None:
+            reason = classifier.classify_text(rel_path, text)
+        if reason:
+            skipped[reason] = skipped.get(reason, 0) + 1
+            continue
+        if text is None:
+            continue
+        units = extract_units_for_file(rel_path, text)
+        if key:
+            for u in units:
+                u.content_key = key
+            shared[key] = (rel_path, units)
+        all_units.extend(units)
+        totals["files_scanned"] += 1
+    totals["units"] = len(all_units)
+    return all_units, totals
+
+def build_units_for_repo(github_url: str, token: Optional[str],
+                         skip_generated: bool = True) -> Tuple[str, Dict[str, Any], List[Unit]]:
     parts = parse_github_url(github_url)
     owner = parts["owner"]; repo = parts["repo"]
     branch = parts["branch"] or get_default_branch(owner, repo, token=token)
     subpath = parts["subpath"] or None
     gid = fingerprint(owner, repo, branch, subpath, github_url)
 
-    # Download/unzip
-    zip_bytes = download_repo_zip(owner, repo, branch)
-    repo_root = unzip_to_temp(zip_bytes)
+    # Download (cached per commit); members are read straight from the archive (no extraction)
+    archive = fetch_repo_archive(owner, repo, branch, token=token)
+    if archive["from_cache"]:
+        print(f"[INFO] Using cached archive {archive['path']}", file=sys.stderr)
+    repo_src = ZipRepoSource(archive["path"])
 
     # Extract units
-    all_units: List[Unit] = []
-    file_count = 0
-    for abs_path, rel_path in iter_repo_files(repo_root, subpath=subpath):
-        text = read_text_file(abs_path)
-        if text is None:
-            continue
-        units = extract_units_for_file(rel_path, text)
-        all_units.extend(units)
-        file_count += 1
+    all_units, totals = extract_units_from_source(repo_src, subpath, skip_generated=skip_generated)
 
     meta = {
         "source_url": github_url,
-        "owner": owner, "repo": repo, "branch": branch,
+        "owner": owner, "repo": repo, "branch": branch, "commit_sha": archive["sha"] or "",
         "subpath": subpath or "", "created_at": now_iso(),
-        "graph_id": gid, "totals": {"files_scanned": file_count, "units": len(all_units)}
+        "graph_id": gid, "totals": totals
     }
 
-    # Cleanup tmp
-    try:
-        import shutil
-        shutil.rmtree(os.path.dirname(repo_root))
-    except Exception:
-        pass
+    repo_src.close()
+
+    return gid, meta, all_units
+
+def build_units_for_local_repo(local_path: str, rev: Optional[str] = None, subpath: Optional[str] = None,
+                               skip_generated: bool = True) -> Tuple[str, Dict[str, Any], List[Unit]]:
+    # Working tree / bare repo: blobs come from the object database at rev (HEAD by default)
+    repo_src = open_local_repo_source(local_path, rev=rev)
+    info = repo_src.describe()
+    subpath = (subpath or "").strip("/") or None
+    commit_sha = info["commit_sha"]
+    gid = fingerprint(info["owner"], info["repo"], commit_sha or info["branch"], subpath,
+                      commit_sha or info["source_url"])
+
+    all_units, totals = extract_units_from_source(repo_src, subpath, skip_generated=skip_generated)
+
+    meta = {
+        "source_url": info["source_url"],
+        "owner": info["owner"], "repo": info["repo"], "branch": info["branch"], "commit_sha": commit_sha,
+        "subpath": subpath or "", "created_at": now_iso(),
+        "graph_id": gid, "totals": totals
+    }
+
+    repo_src.close()
 
     return gid, meta, all_units
 
+def load_units_for_graph(graph_id: str) -> Tuple[str, Dict[str, Any], List[Unit]]:
+    # units.parquet + meta.json written by the wiki app's single-pass ingestion (no download / re-parse)
+    out_dir = default_output_dir(graph_id)
+    with open(os.path.join(out_dir, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)["meta"]
+    path = os.path.join(out_dir, "units.parquet")
+    if os.path.isfile(path):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_json(path + ".jsonl.gz", lines=True)
+    df = df.astype(object).where(df.notna(), None)
+    units = []
+    for rec in df.to_dict("records"):
+        for k in ("start_line", "end_line"):
+            if rec.get(k) is not None:
+                rec[k] = int(rec[k])
+        units.append(Unit(**rec))
+    return graph_id, meta, units
+
 def main():
     p = argparse.ArgumentParser(description="Build hybrid code embeddings (file + symbol) for a GitHub repository.")
-    p.add_argument("--github-url", required=True, help="Repo URL: https://github.com/<owner>/<repo>[/tree/<branch>/<subpath>]")
+    src = p.add_mutually_exclusive_group(required=True)
+    src.add_argument("--github-url", help="Repo URL: https://github.com/<owner>/<repo>[/tree/<branch>/<subpath>]")
+    src.add_argument("--local-path", help="Local git working tree, bare repo or plain directory")
+    src.add_argument("--graph-id", help="Embed the units.parquet already written for this graph_id by the wiki app")
     p.add_argument("--token", default=None, help="GitHub token (optional) for better rate-limits")
+    p.add_argument("--rev", default=None, help="Commit-ish to read with --local-path (default: HEAD)")
+    p.add_argument("--subpath", default=None, help="Subdirectory to index with --local-path")
+    p.add_argument("--keep-generated", action="store_true",
+                   help="Also embed generated / minified / vendored / .gitignore'd files (skipped by default)")
 
     # Summarization
     p.add_argument("--summarize", action="store_true", help="Summarize units with QGenie (recommended)")
     p.add_argument("--summarize-max", type=int, default=400, help="Cap the number of units to summarize (cost/speed)")
 
     p.add_argument("--device", default=None, help="Embedding device (e.g., 'cpu' or 'cuda')")
+    p.add_argument("--embed-batch-size", type=int, default=EMBED_BATCH_SIZE, help="Max texts per embedding request")
+    p.add_argument("--embed-batch-chars", type=int, default=EMBED_BATCH_CHARS,
+                   help="Max total characters per embedding request")
+    p.add_argument("--embed-concurrency", type=int, default=EMBED_MAX_IN_FLIGHT,
+                   help="Max embedding requests in flight")
+    p.add_argument("--no-embed-cache", action="store_true",
+                   help="Embed every text again instead of reusing .cache/embedding_cache")
+    p.add_argument("--delta", action="store_true",
+                   help="Patch the existing indices of this graph_id (only new / changed / removed units) "
+                        "instead of rebuilding them")
+    p.add_argument("--index", choices=INDEX_KINDS, default="auto",
+                   help="FAISS index type: exact 'flat' below 50k units, IVF / IVF-PQ above (auto), or HNSW "
+                        "(a delta keeps the type of the index it patches)")
+    p.add_argument("--vectors-dtype", choices=VECTOR_DTYPES, default="float32",
+                   help="Storage type of <prefix>_vectors.npy (float16 halves it; searched as float32)")
+    p.add_argument("--reindex", action="store_true",
+                   help="With --graph-id: rebuild the FAISS indices (--index) from the stored vectors, no embedding")
+    p.add_argument("--delta-from", default=None, metavar="GRAPH_ID",
+                   help="Like --delta, starting from another graph_id's indices (e.g. the previous commit "
+                        "of a --local-path repo)")
 
     # Query
     p.add_argument("--query", default=None, help="Run a hybrid query against the built indices")
     p.add_argument("--topk", type=int, default=5)
+    p.add_argument("--nprobe", type=int, default=None, help="IVF lists probed per query (default: saved with the index)")
+    p.add_argument("--ef-search", type=int, default=None, help="HNSW efSearch per query (default: saved with the index)")
 
     args = p.parse_args()
 
+    if args.reindex:
+        if not args.graph_id:
+            p.error("--reindex needs --graph-id")
+        out_dir = default_output_dir(args.graph_id)
+        reindex_bundle(out_dir, kind=args.index)
+        print(f"[OK] Re-indexed: {out_dir}")
+        return
+
     # Build units
-    gid, meta, units = build_units_for_repo(args.github_url, token=args.token)
+    if args.graph_id:
+        gid, meta, units = load_units_for_graph(args.graph_id)
+    elif args.local_path:
+        gid, meta, units = build_units_for_local_repo(args.local_path, rev=args.rev, subpath=args.subpath,
+                                                      skip_generated=not args.keep_generated)
+    else:
+        gid, meta, units = build_units_for_repo(args.github_url, token=args.token,
+                                                skip_generated=not args.keep_generated)
     out_dir = default_output_dir(gid)
     ensure_dir(out_dir)
 
@@ -556,77 +625,97 @@ def main():
     save_parquet(df, df_path)
 
     # Prepare embedding texts
-    # - For files: prefer summary (if any) + path; else first 1500 chars code
-    # - For symbols: prefer summary + signature + name + short code
     file_mask = (df["level"] == "file")
     sym_mask = (df["level"] == "symbol")
 
-    file_df = df[file_mask].copy()
-    sym_df = df[sym_mask].copy()
-
-    def prep_file_text(row):
-        base = row.get("summary") or ""
-        if not base:
-            code = (row.get("code") or "")[:1500]
-            base = f"{row.get('file_path')}\n{code}"
-        else:
-            base = f"{row.get('file_path')}\n{base}"
-        return base
-
-    def prep_symbol_text(row):
-        parts = []
-        if row.get("summary"):
-            parts.append(row["summary"])
-        sig = row.get("signature") or row.get("symbol_name") or ""
-        if sig:
-            parts.append(sig)
-        parts.append(row.get("file_path") or "")
-        code = (row.get("code") or "")[:1500]
-        if code:
-            parts.append(code)
-        return "\n".join([p for p in parts if p])
+    # one row per distinct content: copies of identical files reuse its vector through units.parquet
+    file_df, file_copies = first_copies(df[file_mask].copy())
+    sym_df, sym_copies = first_copies(df[sym_mask].copy())
+    n_copies = sum(map(len, file_copies.values())) + sum(map(len, sym_copies.values()))
+    if n_copies:
+        print(f"[INFO] {n_copies} units are copies from identical files; embedding {len(file_df) + len(sym_df)} units")
 
     file_texts = [prep_file_text(r) for _, r in file_df.iterrows()]
     sym_texts = [prep_symbol_text(r) for _, r in sym_df.iterrows()]
 
     # Embeddings
-    print("[INFO] Embedding file-level texts...")
-    file_vecs = embed_texts(file_texts,  device=args.device)
-    print("[INFO] Embedding symbol-level texts...")
-    sym_vecs = embed_texts(sym_texts,  device=args.device)
-
-    # FAISS indices
-    print("[INFO] Building FAISS indices...")
-    file_index = build_faiss_index(file_vecs)
-    sym_index = build_faiss_index(sym_vecs)
-
-    # Save indices + ids
+    cache = None if args.no_embed_cache else EmbeddingCache(embedding_model_id())
+    batching = dict(batch_size=args.embed_batch_size, batch_chars=args.embed_batch_chars,
+                    max_in_flight=args.embed_concurrency, cache=cache)
     file_ids = file_df["uid"].tolist()
     symbol_ids = sym_df["uid"].tolist()
-    file_index_path, file_ids_path = save_index(file_index, file_ids, out_dir, "file")
-    symbol_index_path, symbol_ids_path = save_index(sym_index, symbol_ids, out_dir, "symbol")
+    delta = {}
+    base_dir = os.path.join(".cache", "embeddings", args.delta_from) if args.delta_from else out_dir
+    specs = load_index_specs(base_dir) if args.delta or args.delta_from else {}
+    use_faiss = have_faiss()
+    if not use_faiss:
+        print("[WARN] faiss not installed: saving vectors only; queries will search them with NumPy", file=sys.stderr)
+    for prefix, label, ids, texts in (("file", "file-level", file_ids, file_texts),
+                                      ("symbol", "symbol-level", symbol_ids, sym_texts)):
+        # vectors are L2-normalized, so inner product is cosine
+        embed = lambda batch, prefix=prefix: normalize_rows(embed_texts(batch, device=args.device,
+                                                                        progress=embed_progress(f"{prefix} texts"),
+                                                                        **batching))
+        state = load_index_state(base_dir, prefix) if args.delta or args.delta_from else None
+        index = None
+        if state is None:
+            if args.delta or args.delta_from:
+                print(f"[INFO] No patchable {prefix} index in {base_dir}; building it from scratch")
+            print(f"[INFO] Embedding {label} texts...")
+            vecs = embed(texts)
+        else:
+            todo, removed, delta[prefix] = diff_units(state["texts"], ids, texts)
+            todo_uids = [ids[i] for i in todo]
+            todo_vecs = embed([texts[i] for i in todo]) if todo else np.zeros((0, 0), dtype=np.float32)
+            vecs = None
+            if state["vectors"] is not None:
+                vecs = merge_vectors(ids, state["ids"], state["vectors"], todo_uids, todo_vecs)
+            else:
+                print(f"[WARN] {base_dir} has no {prefix}_vectors.npy; a full rebuild stores them again", file=sys.stderr)
+            if state["index"] is not None:
+                index = state["index"]
+                spec = specs.get(prefix) or choose_index(len(ids), index.d, "flat" if supports_remove(index) else "hnsw")
+                index = patch_index(index, state["texts"], ids, todo_uids, todo_vecs, removed, spec)
+                specs[prefix] = spec
+            print(f"[INFO] Patched {prefix} index: " + ", ".join(f"{n} {k}" for k, n in delta[prefix].items()))
+        if index is None and use_faiss and vecs is not None:
+            print(f"[INFO] Building {prefix} FAISS index...")
+            index, specs[prefix] = build_faiss_index(vecs, ids, kind=args.index)
+            print(f"[INFO] {prefix} index: {specs[prefix]['factory']} over {len(ids)} vectors")
+        elif index is None:
+            specs.pop(prefix, None)
+        # Save index + ids + vectors
+        save_index(index, ids, out_dir, prefix, texts, vecs, args.vectors_dtype)
 
     # Save meta
     meta_path = os.path.join(out_dir, "meta.json")
     with open(meta_path, "w", encoding="utf-8") as f:
-        json.dump({"meta": meta, "units_path": df_path}, f, ensure_ascii=False, indent=2)
+        json.dump({"meta": meta, "units_path": df_path, "delta": delta or None,
+                   "index": {"ids": UID_ID_SCHEME, "vectors": args.vectors_dtype, "normalized": True} | specs,
+                   "embedding_cache": cache.stats() if cache else None}, f, ensure_ascii=False, indent=2)
+    record_artifact(out_dir, "embeddings", {"graph_id": gid} | meta,
+                    extra={"files": len(file_ids), "symbols": len(symbol_ids)})
 
     print(f"[OK] Saved to: {out_dir}")
     print(f" - units: {df_path}")
-    print(f" - file.index / file_ids.json")
-    print(f" - symbol.index / symbol_ids.json")
+    print(" - file.index / file_ids.json")
+    print(" - symbol.index / symbol_ids.json")
     print(f" - meta: {meta_path}")
 
     # Optional query
     if args.query:
         print(f"\n[QUERY] {args.query}")
-        hits = hybrid_query(args.query, out_dir, topk=args.topk)
+        hits = hybrid_query(args.query, out_dir, topk=args.topk, nprobe=args.nprobe, ef_search=args.ef_search)
         # Join with dataframe for pretty print
         df_idx = df.set_index("uid")
+        copies = file_copies | sym_copies
         for h in hits:
             row = df_idx.loc[h["uid"]]
             print(f"[{h['source']}] score={h['score']:.3f} | {row['file_path']} | "
-                  f"{row.get('symbol_type') or 'file'}::{row.get('symbol_name') or ''}")
+                  f"{_field(row, 'symbol_type') or 'file'}::{_field(row, 'symbol_name')}")
+            if h["uid"] in copies:
+                paths = [df_idx.loc[uid]["file_path"] for uid in copies[h["uid"]]]
+                print(f"  identical in: {', '.join(paths[:5])}" + (f" (+{len(paths) - 5} more)" if len(paths) > 5 else ""))
             # brief preview
             if row.get("summary"):
                 print("  summary:", (row["summary"][:220] + "...") if len(row["summary"]) > 220 else row["summary"])
@@ -634,5 +723,11 @@ def main():
                 code = row.get("code") or ""
                 print("  code:", (code[:220] + "...") if len(code) > 220 else code)
 
+    if cache is not None:
+        st = cache.stats()
+        print(f"[INFO] Embedding cache: {st['hits']}/{st['hits'] + st['misses']} texts reused "
+              f"({st['hit_rate']:.1%} hit rate), {st['misses']} embedded")
+        cache.close()
+
 if __name__ == "__main__":
     main()
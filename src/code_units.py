@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Embedding units (file-level + function/class-level) extracted from source text.
+
+Shared by build_code_embeddings and the single-pass ingestion in the wiki app;
+kept free of heavy dependencies so repo_scan workers can extract units from the
+same read that feeds the graph parsers.
+"""
+
+import ast
+import os
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+from lang_scanners import SCANNERS, iter_symbols
+
+# ===================== Language Helpers (polyglot) =====================
+
+PY_EXTS   = {".py"}
+JS_TS_EXTS= {".js",".jsx",".ts",".tsx",".mjs",".cjs"}
+JAVA_EXTS = {".java"}
+GO_EXTS   = {".go"}
+C_EXTS    = {".c",".h"}
+CPP_EXTS  = {".cc",".cpp",".cxx",".hpp",".hh",".hxx",".c++",".h++"}
+RUST_EXTS = {".rs"}
+RUBY_EXTS = {".rb"}
+PHP_EXTS  = {".php"}
+KT_EXTS   = {".kt",".kts"}
+
+def detect_lang(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in PY_EXTS: return "python"
+    if ext in JS_TS_EXTS: return "javascript"
+    if ext in JAVA_EXTS: return "java"
+    if ext in GO_EXTS: return "go"
+    if ext in C_EXTS or ext in CPP_EXTS: return "cpp" if ext in CPP_EXTS else "c"
+    if ext in RUST_EXTS: return "rust"
+    if ext in RUBY_EXTS: return "ruby"
+    if ext in PHP_EXTS: return "php"
+    if ext in KT_EXTS: return "kotlin"
+    return "text"
+
+# ===================== Unit Extraction =====================
+
+@dataclass
+class Unit:
+    uid: str                 # unique id (we'll create)
+    level: str               # "file" | "symbol"
+    file_path: str
+    lang: str
+    symbol_type: Optional[str] = None  # "function" | "class" | None
+    symbol_name: Optional[str] = None
+    start_line: Optional[int] = None
+    end_line: Optional[int] = None
+    signature: Optional[str] = None
+    docstring: Optional[str] = None
+    code: Optional[str] = None
+    summary: Optional[str] = None      # LLM summary (optional)
+    content_key: Optional[str] = None  # shared by the units of byte-identical files (repo_scan.content_keys)
+
+def extract_python_units(path: str, text: str) -> List[Unit]:
+    units: List[Unit] = []
+    try:
+        tree = ast.parse(text)
+    except SyntaxError:
+        return units
+    lines = text.splitlines()
+    def get_segment(node):
+        lineno = getattr(node, "lineno", None)
+        end_lineno = getattr(node, "end_lineno", None)
+        if lineno and end_lineno and 1 <= lineno <= len(lines) and 1 <= end_lineno <= len(lines):
+            return "\n".join(lines[lineno-1:end_lineno]), lineno, end_lineno
+        return None, None, None
+
+    # Top-level file unit
+    units.append(Unit(
+        uid=f"file::{path}",
+        level="file",
+        file_path=path,
+        lang="python",
+        code=text,
+        docstring=ast.get_docstring(tree) or None
+    ))
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.FunctionDef) or isinstance(node, ast.AsyncFunctionDef):
+            code, sl, el = get_segment(node)
+            doc = ast.get_docstring(node)
+            sig = f"{node.name}({', '.join(a.arg for a in node.args.args)})"
+            units.append(Unit(
+                uid=f"symbol::{path}::function::{node.name}::{sl or 0}",
+                level="symbol",
+                file_path=path, lang="python",
+                symbol_type="function", symbol_name=node.name,
+                start_line=sl, end_line=el,
+                signature=sig, docstring=doc, code=code
+            ))
+        elif isinstance(node, ast.ClassDef):
+            code, sl, el = get_segment(node)
+            doc = ast.get_docstring(node)
+            units.append(Unit(
+                uid=f"symbol::{path}::class::{node.name}::{sl or 0}",
+                level="symbol",
+                file_path=path, lang="python",
+                symbol_type="class", symbol_name=node.name,
+                start_line=sl, end_line=el,
+                signature=node.name, docstring=doc, code=code
+            ))
+    return units
+
+# For other languages, the lang_scanners single pass finds function/class headers and we capture a block window
+def extract_scanned_units(path: str, text: str, lang: str, by_line: bool = False) -> List[Unit]:
+    units: List[Unit] = [Unit(uid=f"file::{path}", level="file", file_path=path, lang=lang, code=text)]
+    for kind, name, start in iter_symbols(lang, text, by_line=by_line):
+        if kind == "import":
+            continue
+        snippet = text[start: start + 2000]
+        units.append(Unit(uid=f"symbol::{path}::{kind}::{name}::{start}",
+                          level="symbol", file_path=path, lang=lang,
+                          symbol_type=kind, symbol_name=name,
+                          signature=name if kind == "class" else None, code=snippet))
+    return units
+
+def extract_units_for_file(path: str, text: str, by_line: bool = False) -> List[Unit]:
+    """by_line: the cheap line-by-line scan (repo_scan's fallback for files over the parse budget)."""
+    lang = detect_lang(path)
+    if lang == "python" and not by_line:
+        return extract_python_units(path, text)
+    if lang in SCANNERS:
+        return extract_scanned_units(path, text, lang, by_line=by_line)
+    # fallback file-only
+    return [Unit(uid=f"file::{path}", level="file", file_path=path, lang=lang, code=text)]
+
+def extract_unit_records(path: str, text: str, by_line: bool = False) -> List[Dict[str, Any]]:
+    """extract_units_for_file as plain dicts (picklable across worker processes)."""
+    return [asdict(u) for u in extract_units_for_file(path, text, by_line=by_line)]
+
+# ===================== Identical files =====================
+
+def rebase_unit_records(units: List[Dict[str, Any]], src_path: str, path: str,
+                        content_key: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Unit records extracted from src_path, re-keyed for a byte-identical file at path."""
+    out = []
+    for u in units:
+        u = dict(u, file_path=path, uid=u["uid"].replace(f"::{src_path}", f"::{path}", 1))
+        if content_key:
+            u["content_key"] = content_key
+        out.append(u)
+    return out
+
+def unit_content_id(uid: str, file_path: str, content_key: Optional[str]) -> str:
+    """
+    Same id for the corresponding units of byte-identical files (the uid with
+    its path swapped for the content key), the uid itself for other units.
+    """
+    if not content_key:
+        return uid
+    return uid.replace(f"::{file_path}", f"::{content_key}", 1)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Batched embedding client used by build_code_embeddings.embed_texts.
+
+BatchEmbedder splits the texts into contiguous batches bounded by count
+(EMBED_BATCH_SIZE) and by total characters (EMBED_BATCH_CHARS; a single longer
+text gets a batch of its own), keeps at most EMBED_MAX_IN_FLIGHT requests
+running at once, retries a failed batch with exponential backoff, and
+reassembles the vectors in input order into one float32 matrix. A progress
+callback is told about every finished batch.
+
+Requests go to QGenieClient.embeddings by default. When EMBEDDINGS_API_BASE is
+set they are POSTed instead to <base>/embeddings as an OpenAI-style
+{"model", "input"} body answered with {"data": [{"index", "embedding"}]}, so
+the client can be exercised against a local stand-in server. Any callable
+taking a list of texts and returning one vector per text can also be passed
+as embed_fn.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import Callable, List, Optional, Sequence, Tuple
+from urllib.request import Request, urlopen
+
+import numpy as np
+
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "64"))
+EMBED_BATCH_CHARS = int(os.environ.get("EMBED_BATCH_CHARS", "200000"))
+EMBED_MAX_IN_FLIGHT = int(os.environ.get("EMBED_MAX_IN_FLIGHT", "4"))
+EMBED_MAX_RETRIES = int(os.environ.get("EMBED_MAX_RETRIES", "5"))
+EMBED_BACKOFF_S = 1.0          # first retry delay, doubled per attempt (with jitter)
+EMBED_BACKOFF_MAX_S = 30.0
+
+EMBEDDINGS_API_BASE = os.environ.get("EMBEDDINGS_API_BASE", "").rstrip("/")
+EMBEDDINGS_API_KEY = os.environ.get("EMBEDDINGS_API_KEY", "")
+EMBEDDINGS_MODEL = os.environ.get("EMBEDDINGS_MODEL", "")
+EMBED_HTTP_TIMEOUT_S = 120
+
+# (batches_done, batches_total, texts_done)
+ProgressFn = Callable[[int, int, int], None]
+
+def plan_batches(texts: Sequence[str], max_count: int = EMBED_BATCH_SIZE,
+                 max_chars: int = EMBED_BATCH_CHARS) -> List[Tuple[int, int]]:
+    """Contiguous [start, end) ranges of texts within both limits."""
+    max_count = max(1, int(max_count))
+    batches = []
+    start, chars = 0, 0
+    for i, text in enumerate(texts):
+        n = len(text or "")
+        if i > start and (i - start >= max_count or chars + n > max_chars):
+            batches.append((start, i))
+            start, chars = i, 0
+        chars += n
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+# ===================== Backends =====================
+
+_local = threading.local()
+
+def qgenie_embed(texts: List[str]) -> List[List[float]]:
+    """One QGenieClient.embeddings call (one client per thread)."""
+    client = getattr(_local, "qgenie", None)
+    if client is None:
+        try:
+            from qgenie import QGenieClient
+        except ImportError:
+            raise RuntimeError("Install qgenie, or set EMBEDDINGS_API_BASE to an OpenAI-style embeddings endpoint.")
+        client = _local.qgenie = QGenieClient()
+    response = client.embeddings(texts)
+    return [item.embedding for item in response.data]
+
+def http_embed(texts: List[str], base: Optional[str] = None, model: Optional[str] = None,
+               api_key: Optional[str] = None, timeout: float = EMBED_HTTP_TIMEOUT_S) -> List[List[float]]:
+    """One POST <base>/embeddings; HTTP errors (429, 5xx, ...) raise and are retried by the caller."""
+    body = {"input": texts}
+    if model or EMBEDDINGS_MODEL:
+        body["model"] = model or EMBEDDINGS_MODEL
+    headers = {"Content-Type": "application/json"}
+    key = api_key if api_key is not None else EMBEDDINGS_API_KEY
+    if key:
+        headers["Authorization"] = f"Bearer {key}"
+    req = Request(f"{(base or EMBEDDINGS_API_BASE).rstrip('/')}/embeddings",
+                  data=json.dumps(body).encode("utf-8"), headers=headers, method="POST")
+    with urlopen(req, timeout=timeout) as resp:
+        data = json.load(resp)["data"]
+    if all("index" in item for item in data):
+        data = sorted(data, key=lambda item: item["index"])
+    return [item["embedding"] for item in data]
+
+def default_embed_fn() -> Callable[[List[str]], List[List[float]]]:
+    return http_embed if EMBEDDINGS_API_BASE else qgenie_embed
+
+def embedding_model_id() -> str:
+    """Identifies the backend default_embed_fn talks to (embedding cache key)."""
+    if EMBEDDINGS_API_BASE:
+        return f"{EMBEDDINGS_API_BASE}/embeddings|{EMBEDDINGS_MODEL}"
+    return f"qgenie|{EMBEDDINGS_MODEL}"
+
+# ===================== Batching =====================
+
+class BatchEmbedder:
+    def __init__(self, embed_fn: Optional[Callable[[List[str]], List[List[float]]]] = None,
+                 batch_size: int = EMBED_BATCH_SIZE, batch_chars: int = EMBED_BATCH_CHARS,
+                 max_in_flight: int = EMBED_MAX_IN_FLIGHT, max_retries: int = EMBED_MAX_RETRIES,
+                 backoff_s: float = EMBED_BACKOFF_S, backoff_max_s: float = EMBED_BACKOFF_MAX_S,
+                 progress: Optional[ProgressFn] = None):
+        self.embed_fn = embed_fn or default_embed_fn()
+        self.batch_size = batch_size
+        self.batch_chars = batch_chars
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_s = backoff_s
+        self.backoff_max_s = backoff_max_s
+        self.progress = progress
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        attempt = 0
+        while True:
+            try:
+                vecs = np.asarray(self.embed_fn(texts), dtype=np.float32)
+                if vecs.ndim != 2 or vecs.shape[0] != len(texts):
+                    raise ValueError(f"embedding backend returned {vecs.shape[0] if vecs.ndim else 0} "
+                                     f"vectors for {len(texts)} texts")
+                return vecs
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise RuntimeError(f"Embedding batch of {len(texts)} texts failed after "
+                                       f"{attempt + 1} attempts: {e}") from e
+                delay = min(self.backoff_max_s, self.backoff_s * (2 ** attempt))
+                time.sleep(delay * random.uniform(0.5, 1.0))
+                attempt += 1
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """(len(texts), dim) float32 matrix, rows in input order."""
+        texts = list(texts)
+        batches = plan_batches(texts, self.batch_size, self.batch_chars)
+        if not batches:
+            return np.zeros((0, 0), dtype=np.float32)
+        results: List[Optional[np.ndarray]] = [None] * len(batches)
+        done = texts_done = 0
+        with ThreadPoolExecutor(max_workers=min(self.max_in_flight, len(batches))) as ex:
+            futures = {ex.submit(self._embed_batch, texts[s:e]): k for k, (s, e) in enumerate(batches)}
+            pending = set(futures)
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_EXCEPTION)
+                for fut in finished:
+                    if fut.exception() is not None:
+                        for other in pending:
+                            other.cancel()
+                        raise fut.exception()
+                    k = futures[fut]
+                    results[k] = fut.result()
+                    done += 1
+                    texts_done += batches[k][1] - batches[k][0]
+                    if self.progress:
+                        self.progress(done, len(batches), texts_done)
+        dims = {r.shape[1] for r in results}
+        if len(dims) != 1:
+            raise ValueError(f"embedding backend returned vectors of different sizes: {sorted(dims)}")
+        return np.vstack(results)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+On-disk embedding cache shared by every build_code_embeddings run, so a
+rebuild only sends new or changed texts to the embedding service.
+
+Vectors are keyed by (embedding model id, sha1 of the exact text embedded).
+One directory per model id under .cache/embedding_cache/<sha1(model id)[:16]>/:
+
+  vectors.f32    float32 rows, read through np.memmap
+  index.sqlite   meta(model_id, dim) and vectors(key BLOB PRIMARY KEY, row)
+
+Rows are only ever appended. A batch is written to vectors.f32 inside a
+SQLite write transaction that then records its keys, so concurrent writers
+are serialized and a crash leaves at most unreferenced tail rows, which the
+next append overwrites. A different vector size for the same model id (the
+backend changed models behind the same name) resets the directory.
+"""
+
+import hashlib
+import os
+import sqlite3
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_EMBED_CACHE_DIR = os.path.join(os.getcwd(), ".cache", "embedding_cache")
+
+# SQLite host-parameter limit is 999 on older builds
+_LOOKUP_CHUNK = 900
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    model_id TEXT NOT NULL,
+    dim      INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS vectors (
+    key BLOB PRIMARY KEY,
+    row INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+def text_key(text: str) -> bytes:
+    return hashlib.sha1((text or "").encode("utf-8")).digest()
+
+class EmbeddingCache:
+    def __init__(self, model_id: str, root: str = DEFAULT_EMBED_CACHE_DIR):
+        self.model_id = model_id
+        self.dir = os.path.join(root, hashlib.sha1(model_id.encode("utf-8")).hexdigest()[:16])
+        os.makedirs(self.dir, exist_ok=True)
+        self.vectors_path = os.path.join(self.dir, "vectors.f32")
+        if not os.path.exists(self.vectors_path):
+            open(self.vectors_path, "ab").close()
+        self._conn = sqlite3.connect(os.path.join(self.dir, "index.sqlite"), timeout=60,
+                                     isolation_level=None)
+        self._conn.executescript(_SCHEMA)
+        self._mmap: Optional[np.memmap] = None
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        self._mmap = None
+        self._conn.close()
+
+    def _dim(self) -> Optional[int]:
+        row = self._conn.execute("SELECT dim FROM meta LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def _rows(self, keys: List[bytes]) -> Dict[bytes, int]:
+        found = {}
+        for i in range(0, len(keys), _LOOKUP_CHUNK):
+            chunk = keys[i:i + _LOOKUP_CHUNK]
+            q = f"SELECT key, row FROM vectors WHERE key IN ({','.join('?' * len(chunk))})"
+            found.update(self._conn.execute(q, chunk).fetchall())
+        return found
+
+    def _read(self, rows: Sequence[int], dim: int) -> np.ndarray:
+        n = max(rows) + 1
+        if self._mmap is None or self._mmap.shape[1] != dim or self._mmap.shape[0] < n:
+            count = os.path.getsize(self.vectors_path) // (4 * dim)
+            self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(count, dim))
+        return np.array(self._mmap[np.asarray(rows, dtype=np.int64)])
+
+    def lookup(self, texts: Sequence[str]):
+        """(vectors or None per text, indices of the texts not cached)."""
+        keys = [text_key(t) for t in texts]
+        dim = self._dim()
+        found = self._rows(list(set(keys))) if dim is not None else {}
+        out: List[Optional[np.ndarray]] = [None] * len(texts)
+        hit_idx = [i for i, k in enumerate(keys) if k in found]
+        if hit_idx:
+            vecs = self._read([found[keys[i]] for i in hit_idx], dim)
+            for j, i in enumerate(hit_idx):
+                out[i] = vecs[j]
+        missing = [i for i, k in enumerate(keys) if k not in found]
+        return out, missing
+
+    def store(self, texts: Sequence[str], vecs: np.ndarray):
+        """Append the vectors of texts not cached yet (rows of vecs follow texts)."""
+        vecs = np.ascontiguousarray(vecs, dtype=np.float32)
+        if not len(texts):
+            return
+        dim = vecs.shape[1]
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            stored_dim = self._dim()
+            if stored_dim is not None and stored_dim != dim:
+                conn.execute("DELETE FROM vectors")
+                conn.execute("DELETE FROM meta")
+                stored_dim = None
+            if stored_dim is None:
+                conn.execute("INSERT INTO meta (model_id, dim) VALUES (?, ?)", (self.model_id, dim))
+                with open(self.vectors_path, "wb"):
+                    pass
+                self._mmap = None
+            new: Dict[bytes, int] = {}
+            keys = [text_key(t) for t in texts]
+            known = self._rows(list(set(keys)))
+            for i, k in enumerate(keys):
+                if k not in known and k not in new:
+                    new[k] = i
+            if new:
+                start = conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM vectors").fetchone()[0]
+                with open(self.vectors_path, "r+b") as f:
+                    f.seek(start * dim * 4)
+                    f.write(vecs[list(new.values())].tobytes())
+                conn.executemany("INSERT INTO vectors (key, row) VALUES (?, ?)",
+                                 [(k, start + j) for j, k in enumerate(new)])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get_or_embed(self, texts: Sequence[str], embed: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Vectors for texts, embedding (and caching) only the ones not cached; rows follow texts."""
+        texts = list(texts)
+        cached, missing = self.lookup(texts)
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            # identical texts in one call are embedded once
+            todo = list(dict.fromkeys(texts[i] for i in missing))
+            vecs = np.asarray(embed(todo), dtype=np.float32)
+            if len(missing) < len(texts) and vecs.shape[1] != self._dim():
+                # the backend's vector size changed: cached hits are stale too
+                self.hits -= len(texts) - len(missing)
+                self.misses += len(texts) - len(missing)
+                missing = list(range(len(texts)))
+                seen = set(todo)
+                rest = [t for t in dict.fromkeys(texts) if t not in seen]
+                vecs = np.vstack([vecs, np.asarray(embed(rest), dtype=np.float32)]) if rest else vecs
+                todo += rest
+            self.store(todo, vecs)
+            by_text = dict(zip(todo, vecs))
+            for i in missing:
+                cached[i] = by_text[texts[i]]
+        if not cached:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.vstack(cached).astype(np.float32, copy=False)
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0}
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Detection of generated, minified, vendored and git-ignored files, so the
+builders can skip them before parsing (repo_scan.scan_file) and before unit
+extraction for embeddings. Such files cost parse time and flood the graph and
+the vector index with symbols nobody wrote by hand.
+
+FileClassifier.classify_path() decides from the path alone, before the file is
+read; classify_text() looks at the text once it is. Both return the skip
+reason ("generated", "minified", "vendored" or "ignored") or None:
+
+  - .gitattributes  linguist-generated / linguist-vendored (an explicit
+                    "=false" or "-attr" also overrides the heuristics below)
+  - .gitignore      ignored files in a plain directory on disk (build output in
+                    a working tree; only DirRepoSource -- archives and git
+                    revisions hold committed files, which .gitignore does not
+                    apply to)
+  - path            vendor dirs (VENDOR_DIRS), lockfiles, protobuf / codegen
+                    names, *.min.js and friends
+  - text            a generator's marker on a comment line near the top ("Code
+                    generated ... DO NOT EDIT", "@generated", ...) or an average
+                    line length typical of minified code
+
+.gitattributes / .gitignore files are read from the source with
+FileClassifier.from_source(); patterns follow git's rules (basename patterns
+match at any depth, patterns with a slash are anchored to the file's directory,
+"**", "!" negation, trailing "/" for directories, last match wins), without
+git's special cases for re-including files under an excluded directory.
+"""
+
+import posixpath
+import re
+from typing import Iterable, List, Optional, Tuple
+
+VENDOR_DIRS = {"vendor", "vendors", "third_party", "third-party", "thirdparty", "bower_components", "Pods"}
+
+LOCKFILE_NAMES = {
+    "package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml", "bun.lockb",
+    "Cargo.lock", "poetry.lock", "Pipfile.lock", "uv.lock", "composer.lock", "Gemfile.lock",
+    "go.sum", "gradle.lockfile", "packages.lock.json",
+}
+
+# File name endings of codegen output / minified bundles (str.endswith, no regex per path)
+GENERATED_SUFFIXES = (
+    "_pb2.py", "_pb2.pyi", "_pb2_grpc.py", ".pb.go", ".pb.cc", ".pb.h", ".pb.gw.go", "_pb.js", "_pb.d.ts",
+    ".g.dart", ".freezed.dart", ".designer.cs", ".js.map", ".css.map",
+)
+GENERATED_NAME_RE = re.compile(r"[._]generated\.\w+\Z")   # only tried on names containing "generated."
+MINIFIED_SUFFIXES = (".min.js", "-min.js", ".min.mjs", ".min.css", "-min.css", ".bundle.js", "-bundle.js")
+
+# Generator markers (the ones GitHub linguist trusts) on a comment line within
+# the first GENERATED_HEADER_CHARS characters; prose such as "do not edit this
+# by hand" or "auto-generated ids" in ordinary code does not count
+GENERATED_HEADER_RE = re.compile(
+    r"(?m)^[ \t]*(?://|/\*|\*|#|--|;|%|<!--|\(\*)[^\n]*?"
+    r"(?:Code generated [^\n]*DO NOT EDIT|@generated\b|Generated by the protocol buffer compiler"
+    r"|<auto-generated|Autogenerated by Thrift Compiler|Generated by Cython\b)"
+)
+GENERATED_HEADER_CHARS = 1024
+
+# Minified: at least MINIFIED_MIN_CHARS of text averaging more than
+# MINIFIED_AVG_LINE_CHARS per line (measured on the first MINIFIED_SAMPLE_CHARS)
+MINIFIED_AVG_LINE_CHARS = 250
+MINIFIED_MIN_CHARS = 2048
+MINIFIED_SAMPLE_CHARS = 64 * 1024
+
+# Prose is never classified by its text (long unwrapped paragraphs, READMEs
+# that say they are generated still feed the wiki prompts)
+PROSE_EXTS = {".md", ".markdown", ".rst", ".txt", ".adoc"}
+
+SKIP_REASONS = ("generated", "minified", "vendored", "ignored")
+
+# Files the repo-specific rules are read from
+RULE_FILE_NAMES = (".gitignore", ".gitattributes")
+
+_GLOB_CHARS = set("*?[\\")
+
+def _union(globs: List[str], tail: str):
+    """One regex matching any of the glob regexes (followed by tail), or None."""
+    globs = list(dict.fromkeys(globs))
+    return re.compile("(?:" + "|".join(f"(?:{g})" for g in globs) + ")" + tail) if globs else None
+
+def _glob_regex(pattern: str) -> str:
+    """git wildmatch pattern (already stripped of "!", leading and trailing "/") -> regex."""
+    out, i, n = [], 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append(r"(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == n:
+            out.append(r"/.*")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(r".*")
+            i += 2
+        elif c == "*":
+            out.append(r"[^/]*")
+            i += 1
+        elif c == "?":
+            out.append(r"[^/]")
+            i += 1
+        elif c == "[" and "]" in pattern[i + 2:]:
+            j = pattern.index("]", i + 2)
+            body = pattern[i + 1:j]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            out.append("[" + body.replace("\\", "\\\\") + "]")
+            i = j + 1
+        elif c == "\\" and i + 1 < n:
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+class PatternRules:
+    """
+    Ordered (pattern, value) rules from one .gitignore / .gitattributes, relative
+    to its directory base. value(path) is the value of the last rule matching the
+    path or one of its parent directories, or None.
+
+    Most paths match no rule, so they are rejected up front: plain names and
+    "*<suffix>" patterns (most .gitignore lines) by a set lookup / str.endswith
+    per path component, other basename patterns by one alternation per
+    component, and anchored patterns by one alternation over the whole path
+    (a glob matching a parent directory matches a prefix ending at "/").
+    """
+    def __init__(self, base: str, rules: List[Tuple[str, object]]):
+        self.base = base.strip("/")
+        self.rules = []   # (compiled regex, anchored, dir_only, value)
+        names, suffixes, name_globs, path_globs = set(), [], [], []
+        for pattern, value in rules:
+            dir_only = pattern.endswith("/")
+            pattern = pattern.rstrip("/")
+            if not pattern:
+                continue
+            # basename patterns are matched against each path component,
+            # anchored ones against the path (from base) of each component
+            anchored = "/" in pattern
+            glob = _glob_regex(pattern.lstrip("/"))
+            self.rules.append((re.compile(glob + r"\Z"), anchored, dir_only, value))
+            if anchored:
+                path_globs.append(glob)
+            elif not _GLOB_CHARS & set(pattern):
+                names.add(pattern)
+            elif pattern[0] == "*" and not _GLOB_CHARS & set(pattern[1:]):
+                suffixes.append(pattern[1:])
+            else:
+                name_globs.append(glob)
+        self._names = names
+        self._suffixes = tuple(suffixes)
+        self._any_name = _union(name_globs, r"\Z")
+        self._any_path = _union(path_globs, r"(?:/|\Z)")
+
+    def _may_match(self, rel_path: str, parts: List[str]) -> bool:
+        names, suffixes, any_name = self._names, self._suffixes, self._any_name
+        for name in parts:
+            if name in names or (suffixes and name.endswith(suffixes)) or (any_name and any_name.match(name)):
+                return True
+        return self._any_path is not None and self._any_path.match(rel_path) is not None
+
+    def value(self, rel_path: str):
+        if not self.rules:
+            return None
+        if self.base:
+            if not rel_path.startswith(self.base + "/"):
+                return None
+            rel_path = rel_path[len(self.base) + 1:]
+        parts = rel_path.split("/")
+        if not self._may_match(rel_path, parts):
+            return None
+        # candidates: every parent directory, then the file itself
+        paths = ["/".join(parts[:k]) for k in range(1, len(parts) + 1)]
+        last = len(parts) - 1
+        result = None
+        for rx, anchored, dir_only, value in self.rules:
+            for k in range(last if dir_only else last + 1):
+                if rx.match(paths[k] if anchored else parts[k]):
+                    result = value
+                    break
+        return result
+
+def parse_gitignore(text: str) -> List[Tuple[str, bool]]:
+    """(pattern, ignored) rules; "!" lines re-include (ignored=False)."""
+    rules = []
+    for line in text.splitlines():
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("\\"):  # escaped leading "#" / "!"
+            rules.append((line[1:], True))
+        elif line.startswith("!"):
+            rules.append((line[1:], False))
+        else:
+            rules.append((line, True))
+    return rules
+
+def parse_gitattributes(text: str, attr: str) -> List[Tuple[str, bool]]:
+    """(pattern, set) rules for one boolean attribute (e.g. "linguist-generated")."""
+    rules = []
+    for line in text.splitlines():
+        fields = line.split()
+        if not fields or fields[0].startswith("#"):
+            continue
+        for field in fields[1:]:
+            if field in (attr, f"{attr}=true"):
+                rules.append((fields[0], True))
+            elif field in (f"-{attr}", f"!{attr}", f"{attr}=false"):
+                rules.append((fields[0], False))
+    return rules
+
+class FileClassifier:
+    """
+    Skip rules for one repository (picklable, handed to scan workers once).
+    Rule sets are applied root first, so deeper .gitignore / .gitattributes
+    files override their parents.
+    """
+    def __init__(self, gitignores: Iterable[PatternRules] = (),
+                 generated: Iterable[PatternRules] = (), vendored: Iterable[PatternRules] = ()):
+        def by_depth(rule_sets):
+            return sorted(rule_sets, key=lambda r: r.base.count("/") + bool(r.base))
+        self.gitignores = by_depth(gitignores)
+        self.generated = by_depth(generated)
+        self.vendored = by_depth(vendored)
+
+    @classmethod
+    def from_source(cls, source, file_list: List[Tuple[str, str]], subpath: Optional[str] = None) -> "FileClassifier":
+        """
+        Rules from every .gitignore / .gitattributes in file_list, plus those
+        of the directories above subpath (which a subpath listing does not include).
+        .gitignore files are only read for a directory source (kind "dir").
+        """
+        names = RULE_FILE_NAMES if getattr(source, "kind", None) == "dir" else (".gitattributes",)
+        found = [(loc, rel) for loc, rel in file_list if posixpath.basename(rel) in names]
+        sub = (subpath or "").strip("/")
+        if sub:
+            parts = sub.split("/")
+            for k in range(len(parts)):
+                for loc, rel in source.iter_dir_files("/".join(parts[:k])):
+                    if posixpath.basename(rel) in names:
+                        found.append((loc, rel))
+        gitignores, generated, vendored = [], [], []
+        for loc, rel in found:
+            text = source.read_text(loc)
+            if not text:
+                continue
+            base = posixpath.dirname(rel)
+            if rel.endswith(".gitignore"):
+                gitignores.append(PatternRules(base, parse_gitignore(text)))
+            else:
+                generated.append(PatternRules(base, parse_gitattributes(text, "linguist-generated")))
+                vendored.append(PatternRules(base, parse_gitattributes(text, "linguist-vendored")))
+        return cls(gitignores, generated, vendored)
+
+    @staticmethod
+    def _value(rule_sets: List[PatternRules], rel_path: str):
+        result = None
+        for rules in rule_sets:
+            value = rules.value(rel_path)
+            if value is not None:
+                result = value
+        return result
+
+    def classify_path(self, rel_path: str) -> Optional[str]:
+        """Skip reason decided by the path alone, or None."""
+        vendored = self._value(self.vendored, rel_path)
+        if vendored:
+            return "vendored"
+        generated = self._value(self.generated, rel_path)
+        if generated:
+            return "generated"
+        if self._value(self.gitignores, rel_path):
+            return "ignored"
+        parts = rel_path.split("/")
+        name = parts[-1]
+        if vendored is None and not VENDOR_DIRS.isdisjoint(parts[:-1]):
+            return "vendored"
+        if generated is None:
+            if (name in LOCKFILE_NAMES or name.endswith(GENERATED_SUFFIXES)
+                    or ("generated." in name and GENERATED_NAME_RE.search(name))):
+                return "generated"
+            if name.endswith(MINIFIED_SUFFIXES):
+                return "minified"
+        return None
+
+    def classify_text(self, rel_path: str, text: str) -> Optional[str]:
+        """Skip reason decided by the file's text (header marker, line length), or None."""
+        if posixpath.splitext(rel_path)[1].lower() in PROSE_EXTS:
+            return None
+        if self._value(self.generated, rel_path) is False:
+            return None
+        if GENERATED_HEADER_RE.search(text, 0, GENERATED_HEADER_CHARS):
+            return "generated"
+        sample = text[:MINIFIED_SAMPLE_CHARS]
+        if len(sample) >= MINIFIED_MIN_CHARS and len(sample) / (sample.count("\n") + 1) > MINIFIED_AVG_LINE_CHARS:
+            return "minified"
+        return None
+
+    def classify(self, rel_path: str, text: Optional[str] = None) -> Optional[str]:
+        reason = self.classify_path(rel_path)
+        if reason is None and text:
+            reason = self.classify_text(rel_path, text)
+        return reason
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Columnar on-disk graph written next to the JSON graphs (v1 verbose / compact v2).
+
+Tables are uncompressed Arrow IPC files, opened with a memory map: selecting
+columns or slicing one file's rows touches only those buffers, so viewers can
+start without parsing the whole graph.
+
+Layout of <graph>.columnar/ (rows of symbols/edges are grouped by file, in file order):
+  - meta.json
+  - files.arrow    path, lang, n_classes, n_functions, n_imports, sym_start, edge_start
+  - symbols.arrow  file (row in files), kind ("class" | "function"), name
+  - imports.arrow  module, kind
+  - edges.arrow    file (row in files), import (row in imports), detail
+"""
+
+import json
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Optional: pyarrow (columnar format is skipped when missing)
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc
+    PYARROW_AVAILABLE = True
+except Exception:
+    PYARROW_AVAILABLE = False
+
+# ===================== Paths =====================
+
+def columnar_path_for(graph_path: str) -> str:
+    """<dir>/<name>.json[.gz] -> <dir>/<name>.columnar"""
+    return re.sub(r"\.json(\.gz)?$", "", graph_path) + ".columnar"
+
+def has_columnar(graph_path: str) -> bool:
+    return PYARROW_AVAILABLE and os.path.isfile(os.path.join(columnar_path_for(graph_path), "files.arrow"))
+
+# ===================== Writing =====================
+
+def _write_table(table, path: str):
+    tmp = path + ".tmp"
+    with pa.OSFile(tmp, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp, path)
+
+def write_columnar_graph(out_dir: str, meta: Dict[str, Any],
+                         file_records: Iterable[Tuple[str, str, List[str], List[str], List[Tuple[int, str]]]],
+                         import_modules: List[str], import_kinds: Optional[List[str]] = None) -> str:
+    """
+    file_records yields (path, lang, classes, functions, [(import_idx, detail)]) in file order;
+    import_idx points into import_modules. Returns out_dir.
+    """
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("pyarrow is not installed. Run: pip install pyarrow")
+    os.makedirs(out_dir, exist_ok=True)
+
+    f_path, f_lang, f_nc, f_nf, f_ni, f_sym, f_edge = [], [], [], [], [], [], []
+    s_file, s_kind, s_name = [], [], []
+    e_file, e_imp, e_detail = [], [], []
+    for row, (path, lang, classes, functions, imports) in enumerate(file_records):
+        f_path.append(path); f_lang.append(lang or "")
+        f_nc.append(len(classes)); f_nf.append(len(functions)); f_ni.append(len(imports))
+        f_sym.append(len(s_name)); f_edge.append(len(e_imp))
+        for kind, names in (("class", classes), ("function", functions)):
+            s_file.extend([row] * len(names)); s_kind.extend([kind] * len(names)); s_name.extend(names)
+        for idx, detail in imports:
+            e_file.append(row); e_imp.append(idx); e_detail.append(detail or "")
+
+    tables = {
+        "files": pa.table({
+            "path": pa.array(f_path, pa.string()),
+            "lang": pa.array(f_lang, pa.string()).dictionary_encode(),
+            "n_classes": pa.array(f_nc, pa.int32()),
+            "n_functions": pa.array(f_nf, pa.int32()),
+            "n_imports": pa.array(f_ni, pa.int32()),
+            "sym_start": pa.array(f_sym, pa.int64()),
+            "edge_start": pa.array(f_edge, pa.int64()),
+        }),
+        "symbols": pa.table({
+            "file": pa.array(s_file, pa.int32()),
+            "kind": pa.array(s_kind, pa.string()).dictionary_encode(),
+            "name": pa.array(s_name, pa.string()),
+        }),
+        "imports": pa.table({
+            "module": pa.array(import_modules, pa.string()),
+            "kind": pa.array(import_kinds or [""] * len(import_modules), pa.string()).dictionary_encode(),
+        }),
+        "edges": pa.table({
+            "file": pa.array(e_file, pa.int32()),
+            "import": pa.array(e_imp, pa.int32()),
+            "detail": pa.array(e_detail, pa.string()).dictionary_encode(),
+        }),
+    }
+    for name, table in tables.items():
+        _write_table(table, os.path.join(out_dir, f"{name}.arrow"))
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return out_dir
+
+def save_columnar_from_v1(graph_path: str, meta: Dict[str, Any], graph: Dict[str, Any]) -> str:
+    """Columnar copy of a v1 (nodes/edges) graph saved at graph_path."""
+    nodes_by_id = {n["id"]: n for n in graph.get("nodes", [])}
+    per_file = {n["id"]: ([], [], {}) for n in graph.get("nodes", []) if n.get("type") == "file"}
+    modules, kinds, module_idx = [], [], {}
+    for e in graph.get("edges", []):
+        rec = per_file.get(e.get("source"))
+        t = nodes_by_id.get(e.get("target"))
+        if rec is None or t is None:
+            continue
+        etype = e.get("type")
+        if etype == "FILE_CONTAINS_CLASS" and t.get("type") == "class":
+            rec[0].append(t.get("label", ""))
+        elif etype == "FILE_CONTAINS_FUNCTION" and t.get("type") == "function":
+            rec[1].append(t.get("label", ""))
+        elif etype == "FILE_IMPORTS" and t.get("type") == "import":
+            module = t.get("label", "")
+            if module not in module_idx:
+                module_idx[module] = len(modules)
+                modules.append(module)
+                kinds.append(t.get("kind") or "")
+            rec[2].setdefault(module_idx[module], e.get("detail") or "")
+
+    def records():
+        for fid, (classes, functions, imports) in per_file.items():
+            fnode = nodes_by_id[fid]
+            yield (fnode.get("path", fnode.get("label", "")), fnode.get("lang", ""),
+                   sorted(set(c for c in classes if c)), sorted(set(f for f in functions if f)),
+                   sorted(imports.items(), key=lambda kv: modules[kv[0]]))
+
+    return write_columnar_graph(columnar_path_for(graph_path), meta, records(), modules, kinds)
+
+def save_columnar_from_compact(graph_path: str, meta: Dict[str, Any], compact: Dict[str, Any]) -> str:
+    """Columnar copy of a compact v2 graph saved at graph_path (import indices are kept)."""
+    modules = compact.get("dicts", {}).get("imports", [])
+    records = ((f["path"], f.get("lang", ""), f.get("classes", []), f.get("functions", []),
+                [(idx, "") for idx in f.get("imports", [])]) for f in compact.get("files", []))
+    return write_columnar_graph(columnar_path_for(graph_path), meta, records, modules)
+
+# ===================== Reading =====================
+
+class ColumnarGraph:
+    """
+    Lazy reader: each table is memory-mapped on first use; column selection
+    and per-file slices are zero-copy views over the mapped file.
+    """
+
+    def __init__(self, path: str):
+        if not PYARROW_AVAILABLE:
+            raise RuntimeError("pyarrow is not installed. Run: pip install pyarrow")
+        self.path = path if path.endswith(".columnar") else columnar_path_for(path)
+        self._tables = {}
+        self._meta = None
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        if self._meta is None:
+            with open(os.path.join(self.path, "meta.json"), "r", encoding="utf-8") as f:
+                self._meta = json.load(f)
+        return self._meta
+
+    def table(self, name: str, columns: Optional[List[str]] = None):
+        if name not in self._tables:
+            source = pa.memory_map(os.path.join(self.path, f"{name}.arrow"), "r")
+            self._tables[name] = pa.ipc.open_file(source).read_all()
+        t = self._tables[name]
+        return t.select(columns) if columns else t
+
+    def column(self, name: str, column: str) -> List[Any]:
+        return self.table(name, [column]).column(0).to_pylist()
+
+    @property
+    def num_files(self) -> int:
+        return self.table("files").num_rows
+
+    def file_details(self, row: int) -> Dict[str, List[str]]:
+        """classes / functions / imports of one file (reads only that file's slices)."""
+        files = self.table("files")
+        n_c = files["n_classes"][row].as_py()
+        n_f = files["n_functions"][row].as_py()
+        n_i = files["n_imports"][row].as_py()
+        names = self.table("symbols", ["name"]).column(0).slice(files["sym_start"][row].as_py(), n_c + n_f).to_pylist()
+        idx = self.table("edges", ["import"]).column(0).slice(files["edge_start"][row].as_py(), n_i)
+        imports = pc.take(self.table("imports", ["module"]).column(0), idx).to_pylist() if n_i else []
+        return {"classes": names[:n_c], "functions": names[n_c:], "imports": sorted(imports)}
+
+    def file_index(self) -> Dict[str, Dict[str, Any]]:
+        """Same shape as the Preview tab's file_index ({file_id: {path, lang, classes, functions, imports}})."""
+        files = self.table("files")
+        paths = files["path"].to_pylist()
+        langs = files["lang"].to_pylist()
+        n_c = files["n_classes"].to_pylist()
+        n_f = files["n_functions"].to_pylist()
+        n_i = files["n_imports"].to_pylist()
+        names = self.column("symbols", "name")
+        modules = self.column("imports", "module")
+        edge_imp = self.column("edges", "import")
+        out = {}
+        s = e = 0
+        for row, path in enumerate(paths):
+            out[f"file:{path}"] = {
+                "path": path, "lang": langs[row] or "",
+                "classes": names[s:s + n_c[row]],
+                "functions": names[s + n_c[row]:s + n_c[row] + n_f[row]],
+                "imports": sorted(modules[i] for i in edge_imp[e:e + n_i[row]]),
+            }
+            s += n_c[row] + n_f[row]
+            e += n_i[row]
+        return out
+
+    def langs(self) -> List[str]:
+        return sorted(v for v in pc.unique(self.table("files", ["lang"]).column(0).combine_chunks().dictionary_decode()).to_pylist() if v)
+
+    def match_files(self, lang: Optional[str] = None, path_contains: Optional[str] = None) -> List[int]:
+        """Row numbers of files matching lang / case-insensitive path substring (evaluated on columns)."""
+        files = self.table("files", ["path", "lang"])
+        mask = None
+        if lang:
+            mask = pc.equal(files["lang"].cast(pa.string()), lang)
+        if path_contains:
+            m = pc.match_substring(pc.utf8_lower(files["path"]), path_contains.lower())
+            mask = m if mask is None else pc.and_(mask, m)
+        if mask is None:
+            return list(range(files.num_rows))
+        return pc.indices_nonzero(mask).to_pylist()
+
+    def to_v1(self, rows: Optional[Iterable[int]] = None, max_nodes: Optional[int] = None,
+              include_types: Optional[set] = None) -> Dict[str, Any]:
+        """
+        Materialize a v1-like {meta, nodes, edges} graph for the given file rows
+        (all files by default), stopping once max_nodes nodes (of include_types,
+        if given) have been produced.
+        """
+        files = self.table("files")
+        paths = files["path"]
+        langs = files["lang"]
+        kinds = self.table("imports", ["kind"]).column(0)
+        modules = self.table("imports", ["module"]).column(0)
+        details = self.table("edges", ["detail"]).column(0)
+        nodes, edges, seen_imports = [], [], set()
+        counted = 0
+        for row in (range(self.num_files) if rows is None else rows):
+            if max_nodes and counted >= max_nodes:
+                break
+            n_before = len(nodes)
+            path = paths[row].as_py()
+            lang = langs[row].as_py() or ""
+            fid = f"file:{path}"
+            nodes.append({"id": fid, "type": "file", "label": path, "path": path, "lang": lang})
+            d = self.file_details(row)
+            for kind, etype in (("class", "FILE_CONTAINS_CLASS"), ("function", "FILE_CONTAINS_FUNCTION")):
+                for name in d["classes" if kind == "class" else "functions"]:
+                    nid = f"{kind}:{path}#{name}"
+                    nodes.append({"id": nid, "type": kind, "label": name, "file": path, "lang": lang})
+                    edges.append({"source": fid, "target": nid, "type": etype})
+            start = files["edge_start"][row].as_py()
+            idx = self.table("edges", ["import"]).column(0).slice(start, files["n_imports"][row].as_py()).to_pylist()
+            for k, i in enumerate(idx):
+                module = modules[i].as_py()
+                nid = f"import:{module}"
+                if nid not in seen_imports:
+                    seen_imports.add(nid)
+                    nodes.append({"id": nid, "type": "import", "label": module, "kind": kinds[i].as_py() or None})
+                edges.append({"source": fid, "target": nid, "type": "FILE_IMPORTS",
+                              "detail": details[start + k].as_py() or None})
+            counted += sum(1 for n in nodes[n_before:] if include_types is None or n["type"] in include_types)
+        return {"meta": self.meta, "nodes": nodes, "edges": edges}
+
+    def importers(self, module: str) -> List[str]:
+        """Paths of the files importing module (vectorized filter on the edge columns)."""
+        hits = pc.indices_nonzero(pc.equal(self.table("imports", ["module"]).column(0), module)).to_pylist()
+        if not hits:
+            return []
+        edges = self.table("edges", ["file", "import"])
+        rows = pc.unique(pc.filter(edges["file"], pc.equal(edges["import"], hits[0]))).to_pylist()
+        return pc.take(self.table("files", ["path"]).column(0), sorted(rows)).to_pylist()
+
+    def import_counts(self) -> Counter:
+        """Number of files importing each module (edges are unique per file)."""
+        counts = pc.value_counts(self.table("edges", ["import"]).column(0).combine_chunks()).to_pylist()
+        modules = self.table("imports", ["module"]).column(0)
+        return Counter({modules[c["values"]].as_py(): c["counts"] for c in counts})
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Repo statistics computed once when a graph is built, so the wiki prompt
+builders and viewers do not have to walk the graph to get them.
+
+Stored as <graph>.stats (JSON, named so graph listings skip it) next to
+<graph>.json[.gz]; shards carry the same block under "stats" and the manifest
+keeps the aggregate part for every shard.
+
+  {
+    "version": 1,
+    "meta":          graph meta,
+    "files_total":   int,
+    "imports_total": distinct import modules,
+    "langs":         [[lang, files]],            all, most common first ("unknown" for no lang)
+    "areas":         [[area, files]],            guess_area_from_path buckets
+    "top_dirs":      [[dir, files]],             up to STATS_TOP_DIRS
+    "top_imports":   [[module, files]],          up to STATS_TOP_IMPORTS
+    "top_files":     [{path, lang, classes, functions, imports, depends_on, symbol_count}],
+                     ranked by (symbol_count, path) desc, up to STATS_TOP_FILES;
+                     depends_on: up to STATS_FILE_DEPS repo files the file imports
+                     (resolved "deps", empty for graphs without them)
+    "paths":         every file path, in graph order
+  }
+"""
+
+import json
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from graph_view import graph_view
+
+STATS_VERSION = 1
+STATS_TOP_FILES = 1000     # highest "Max files in prompt" the apps offer
+STATS_TOP_IMPORTS = 200    # highest "Top-K imports" the apps offer
+STATS_TOP_DIRS = 50
+STATS_FILE_DEPS = 10
+
+# Keys that are cheap enough for a manifest entry (no per-file lists)
+AGGREGATE_KEYS = ("files_total", "imports_total", "langs", "areas", "top_dirs", "top_imports")
+
+def guess_area_from_path(path: str) -> str:
+    p = path.lower()
+    if any(x in p for x in ["infra", "deploy", "k8s", "helm", "terraform", "ansible", "docker", ".github/workflows", "ci", "cd"]):
+        return "Deployment/Infrastructure"
+    if any(x in p for x in ["frontend", "ui", "client", "web", "components", "pages", "src/app", "src/components"]):
+        return "Frontend Components"
+    if any(x in p for x in ["backend", "server", "api", "controllers", "routes", "services"]):
+        return "Backend Systems"
+    if any(x in p for x in ["model", "ml", "nn", "inference", "training", "weights"]):
+        return "Model Integration"
+    if any(x in p for x in ["data", "dataset", "etl", "pipeline", "db", "sql", "repository", "storage"]):
+        return "Data Management/Flow"
+    if any(x in p for x in ["docs", "readme", "readme.md"]):
+        return "Overview"
+    return "Other"
+
+# ===================== Build time =====================
+
+def compute_graph_stats(graph, meta: Optional[Dict[str, Any]] = None, deps_view=None) -> Dict[str, Any]:
+    """
+    Stats block for a v1 / compact v2 graph dict or a graph_view. deps_view
+    (default: the graph's own view) answers dependencies(path); shards pass a
+    view of the whole graph, whose deps also reach files in other shards.
+    """
+    view = graph_view(graph)
+    deps_view = deps_view or view
+    files = []
+    langs, areas, top_dirs = Counter(), Counter(), Counter()
+    for rec in view.iter_files():
+        path = rec["path"]
+        lang = rec.get("lang") or "unknown"
+        langs[lang] += 1
+        areas[guess_area_from_path(path)] += 1
+        files.append({"path": path, "lang": lang, "classes": rec["classes"], "functions": rec["functions"],
+                      "imports": rec["imports"], "depends_on": deps_view.dependencies(path)[:STATS_FILE_DEPS],
+                      "symbol_count": len(rec["classes"]) + len(rec["functions"]) + len(rec["imports"])})
+
+    imports_counter = view.import_counts()
+    ranked = sorted(files, key=lambda r: (r["symbol_count"], r["path"].lower()), reverse=True)
+    for f in ranked:  # counted in rank order so ties list like the summarize_* functions
+        if "/" in f["path"]:
+            top_dirs[f["path"].split("/", 1)[0]] += 1
+    return {
+        "version": STATS_VERSION,
+        "meta": view.meta if meta is None else meta,
+        "files_total": len(files),
+        "imports_total": len(imports_counter),
+        "langs": langs.most_common(),
+        "areas": areas.most_common(),
+        "top_dirs": top_dirs.most_common(STATS_TOP_DIRS),
+        "top_imports": imports_counter.most_common(STATS_TOP_IMPORTS),
+        "top_files": ranked[:STATS_TOP_FILES],
+        "paths": [f["path"] for f in files],
+    }
+
+def stats_aggregates(stats: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: stats[k] for k in AGGREGATE_KEYS if k in stats}
+
+def stats_path_for(graph_path: str) -> str:
+    """<dir>/<name>.json[.gz] -> <dir>/<name>.stats"""
+    return re.sub(r"\.json(\.gz)?$", "", graph_path) + ".stats"
+
+def save_graph_stats(graph_path: str, stats: Dict[str, Any]) -> str:
+    path = stats_path_for(graph_path)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(stats, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+    return path
+
+# ===================== Read time =====================
+
+def load_graph_stats(graph_path: str) -> Optional[Dict[str, Any]]:
+    """Stats saved for graph_path, or None when missing / stale format / older than the graph."""
+    path = stats_path_for(graph_path)
+    try:
+        if os.path.getmtime(path) < os.path.getmtime(graph_path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            stats = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return stats if stats.get("version") == STATS_VERSION else None
+
+def summary_from_stats(stats: Optional[Dict[str, Any]], max_files: int = 200,
+                       top_imports_k: int = 50) -> Optional[Dict[str, Any]]:
+    """
+    Prompt summary ({meta, langs, areas, top_dirs, top_imports, files, files_total})
+    straight from a stats block; None when the stored lists are too short for the
+    requested sizes and the caller has to summarize the graph itself.
+    """
+    if not stats or stats.get("version") != STATS_VERSION:
+        return None
+    top_files = stats.get("top_files", [])
+    top_imports = stats.get("top_imports", [])
+    if max_files > len(top_files) and len(top_files) < stats.get("files_total", 0):
+        return None
+    if top_imports_k > len(top_imports) and len(top_imports) < stats.get("imports_total", 0):
+        return None
+    return {
+        "meta": stats.get("meta", {}),
+        "langs": stats.get("langs", []),
+        "areas": stats.get("areas", []),
+        "top_dirs": stats.get("top_dirs", [])[:20],
+        "top_imports": top_imports[:top_imports_k],
+        "files": top_files[:max_files],
+        "files_total": stats.get("files_total", 0),
+    }
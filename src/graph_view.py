@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Read-only graph views shared by the KG apps.
+
+CompactGraphView answers the questions Preview, the wiki summary and the PyVis
+viewer ask of a compact v2 graph ({meta, dicts:{imports}, files:[...]}) straight
+from the compact lists: per-file classes/functions/imports, plus node and edge
+iteration yielding the same dicts expand_compact_to_v1 would build, one at a
+time. Nothing v1-shaped is materialized. When the graph carries an import
+posting list (import_postings), reverse lookups and import counts use it
+instead of walking the file records; its resolved file -> file "deps"
+(import_resolution) back dependencies() / dependents() (the reverse adjacency
+is built on the first dependents() call). V1 graphs have no resolved deps.
+
+V1GraphView offers the same interface over a verbose v1 graph, so callers can
+take either format through graph_view().
+"""
+
+from collections import Counter
+from typing import Any, Dict, Iterator, List
+
+from import_postings import decode_postings, valid_postings
+
+
+def _sorted_names(names) -> List[str]:
+    return sorted(set(x for x in names if x))
+
+
+class CompactGraphView:
+    def __init__(self, compact: Dict[str, Any]):
+        self.meta = compact.get("meta", {})
+        self._files = compact.get("files", [])
+        self._imports = compact.get("dicts", {}).get("imports", [])
+        self._postings = valid_postings(compact)
+        self._import_idx = None
+        deps = compact.get("deps")
+        self._deps = deps if isinstance(deps, list) and len(deps) == len(self._files) else None
+        self._rows = None
+        self._rdeps = None
+
+    @property
+    def num_files(self) -> int:
+        return len(self._files)
+
+    def _file_imports(self, f: Dict[str, Any]) -> List[str]:
+        n = len(self._imports)
+        return [self._imports[i] for i in f.get("imports", []) if 0 <= i < n]
+
+    def iter_files(self) -> Iterator[Dict[str, Any]]:
+        """{path, lang, classes, functions, imports} per file, names de-duplicated and sorted."""
+        for f in self._files:
+            yield {"path": f["path"], "lang": f.get("lang", ""),
+                   "classes": _sorted_names(f.get("classes", [])),
+                   "functions": _sorted_names(f.get("functions", [])),
+                   "imports": _sorted_names(self._file_imports(f))}
+
+    def file_index(self) -> Dict[str, Dict[str, Any]]:
+        """{file_id: file record}, keyed like the v1 file nodes."""
+        return {f"file:{rec['path']}": rec for rec in self.iter_files()}
+
+    def iter_nodes(self) -> Iterator[Dict[str, Any]]:
+        """v1 node dicts in expand_compact_to_v1 order; each import node is emitted once."""
+        seen_imports = set()
+        for f in self._files:
+            path, lang = f["path"], f.get("lang", "")
+            yield {"id": f"file:{path}", "type": "file", "label": path, "path": path, "lang": lang}
+            for cname in f.get("classes", []):
+                yield {"id": f"class:{path}#{cname}", "type": "class", "label": cname, "file": path, "lang": lang}
+            for gname in f.get("functions", []):
+                yield {"id": f"function:{path}#{gname}", "type": "function", "label": gname, "file": path, "lang": lang}
+            for mod in self._file_imports(f):
+                if mod not in seen_imports:
+                    seen_imports.add(mod)
+                    yield {"id": f"import:{mod}", "type": "import", "label": mod, "kind": "import"}
+
+    def iter_edges(self) -> Iterator[Dict[str, str]]:
+        for f in self._files:
+            path = f["path"]
+            file_id = f"file:{path}"
+            for cname in f.get("classes", []):
+                yield {"source": file_id, "target": f"class:{path}#{cname}", "type": "FILE_CONTAINS_CLASS"}
+            for gname in f.get("functions", []):
+                yield {"source": file_id, "target": f"function:{path}#{gname}", "type": "FILE_CONTAINS_FUNCTION"}
+            for mod in self._file_imports(f):
+                yield {"source": file_id, "target": f"import:{mod}", "type": "FILE_IMPORTS"}
+
+    def importers(self, module: str) -> List[str]:
+        """Paths of the files importing module, in file order."""
+        if self._import_idx is None:
+            self._import_idx = {mod: i for i, mod in enumerate(self._imports)}
+        idx = self._import_idx.get(module)
+        if idx is None:
+            return []
+        if self._postings is not None:
+            return [self._files[row]["path"] for row in decode_postings(self._postings["imports"][idx])]
+        return [f["path"] for f in self._files if idx in f.get("imports", [])]
+
+    def _row_of(self, path: str):
+        if self._rows is None:
+            self._rows = {f["path"]: i for i, f in enumerate(self._files)}
+        return self._rows.get(path)
+
+    def dependencies(self, path: str) -> List[str]:
+        """Repo files path imports (resolved "deps"; empty when the graph has none)."""
+        row = self._row_of(path)
+        if self._deps is None or row is None:
+            return []
+        return [self._files[r]["path"] for r in self._deps[row]]
+
+    def dependents(self, path: str) -> List[str]:
+        """Repo files importing path, in file order."""
+        row = self._row_of(path)
+        if self._deps is None or row is None:
+            return []
+        if self._rdeps is None:
+            self._rdeps = [[] for _ in self._files]
+            for r, targets in enumerate(self._deps):
+                for t in targets:
+                    self._rdeps[t].append(r)
+        return [self._files[r]["path"] for r in self._rdeps[row]]
+
+    def import_counts(self) -> Counter:
+        """Number of files importing each module; ties keep import dictionary order."""
+        if self._postings is not None:
+            per_idx = self._postings["counts"]
+        else:
+            per_idx = [0] * len(self._imports)
+            for f in self._files:
+                for i in set(f.get("imports", [])):
+                    if 0 <= i < len(per_idx):
+                        per_idx[i] += 1
+        return Counter({self._imports[i]: n for i, n in enumerate(per_idx) if n})
+
+
+class V1GraphView:
+    def __init__(self, graph_v1: Dict[str, Any]):
+        self.meta = graph_v1.get("meta", {})
+        self._nodes = graph_v1.get("nodes", [])
+        self._edges = graph_v1.get("edges", [])
+        self._index = None
+
+    @property
+    def num_files(self) -> int:
+        return sum(1 for n in self._nodes if n.get("type") == "file")
+
+    def file_index(self) -> Dict[str, Dict[str, Any]]:
+        if self._index is not None:
+            return self._index
+        nodes_by_id = {n["id"]: n for n in self._nodes}
+        index = {
+            n["id"]: {"path": n.get("path", n.get("label", "")), "lang": n.get("lang", ""),
+                      "classes": [], "functions": [], "imports": []}
+            for n in self._nodes if n.get("type") == "file"
+        }
+        wanted = {"FILE_CONTAINS_CLASS": ("class", "classes"),
+                  "FILE_CONTAINS_FUNCTION": ("function", "functions"),
+                  "FILE_IMPORTS": ("import", "imports")}
+        for e in self._edges:
+            rec = index.get(e.get("source"))
+            target = nodes_by_id.get(e.get("target"))
+            kind = wanted.get(e.get("type"))
+            if rec is None or target is None or kind is None or target.get("type") != kind[0]:
+                continue
+            rec[kind[1]].append(target.get("label", ""))
+        for rec in index.values():
+            rec["classes"] = _sorted_names(rec["classes"])
+            rec["functions"] = _sorted_names(rec["functions"])
+            rec["imports"] = _sorted_names(rec["imports"])
+        self._index = index
+        return index
+
+    def iter_files(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.file_index().values())
+
+    def iter_nodes(self) -> Iterator[Dict[str, Any]]:
+        return iter(self._nodes)
+
+    def iter_edges(self) -> Iterator[Dict[str, str]]:
+        return iter(self._edges)
+
+    def importers(self, module: str) -> List[str]:
+        return [rec["path"] for rec in self.iter_files() if module in rec["imports"]]
+
+    def import_counts(self) -> Counter:
+        counts = Counter()
+        for rec in self.iter_files():
+            counts.update(rec["imports"])
+        return counts
+
+    def dependencies(self, path: str) -> List[str]:
+        return []
+
+    def dependents(self, path: str) -> List[str]:
+        return []
+
+
+def graph_view(data):
+    """View over a loaded graph dict (compact v2 or verbose v1); views are returned as-is."""
+    if isinstance(data, (CompactGraphView, V1GraphView)):
+        return data
+    if "files" in data and "nodes" not in data:
+        return CompactGraphView(data)
+    return V1GraphView(data)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Inverted import index for compact v2 graphs and shards: for every entry of
+dicts.imports, the sorted row numbers (in "files") of the files importing it.
+
+Stored next to "dicts" as
+
+  "postings": {
+    "encoding": "delta-varint-b64",
+    "counts":   [n_files per import index],
+    "imports":  [base64(varint(delta-encoded file rows)) per import index]
+  }
+
+Rows are gap-encoded (first row, then differences) as LEB128 varints, so a
+posting list costs about one byte per file for common modules. Counts are kept
+unencoded so top-import rankings never decode a list.
+"""
+
+import base64
+from typing import Any, Dict, List, Optional
+
+POSTINGS_ENCODING = "delta-varint-b64"
+
+def encode_postings(rows: List[int]) -> str:
+    """Sorted, distinct row numbers -> base64 of their varint-encoded gaps."""
+    out = bytearray()
+    prev = 0
+    for row in rows:
+        gap = row - prev
+        prev = row
+        while gap >= 0x80:
+            out.append((gap & 0x7F) | 0x80)
+            gap >>= 7
+        out.append(gap)
+    return base64.b64encode(bytes(out)).decode("ascii")
+
+def decode_postings(encoded: str) -> List[int]:
+    rows = []
+    prev = gap = shift = 0
+    for byte in base64.b64decode(encoded):
+        gap |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        prev += gap
+        rows.append(prev)
+        gap = shift = 0
+    return rows
+
+def build_import_postings(files: List[Dict[str, Any]], n_imports: int) -> Dict[str, Any]:
+    """postings block for compact files whose "imports" are indices into a dictionary of n_imports."""
+    lists = [[] for _ in range(n_imports)]
+    for row, f in enumerate(files):
+        for idx in set(f.get("imports", [])):
+            if 0 <= idx < n_imports:
+                lists[idx].append(row)
+    return {
+        "encoding": POSTINGS_ENCODING,
+        "counts": [len(rows) for rows in lists],
+        "imports": [encode_postings(rows) for rows in lists],
+    }
+
+def add_import_postings(compact: Dict[str, Any]) -> Dict[str, Any]:
+    """Attach a postings block to a compact graph / shard in place; returns it."""
+    imports = compact.get("dicts", {}).get("imports", [])
+    compact["postings"] = build_import_postings(compact.get("files", []), len(imports))
+    return compact
+
+def valid_postings(compact: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The postings block if present and consistent with the import dictionary, else None."""
+    postings = compact.get("postings")
+    n_imports = len(compact.get("dicts", {}).get("imports", []))
+    if (not postings or postings.get("encoding") != POSTINGS_ENCODING
+            or len(postings.get("imports", [])) != n_imports or len(postings.get("counts", [])) != n_imports):
+        return None
+    return postings
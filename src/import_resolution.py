@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Resolution of import strings to repo files, run over a compact v2 graph once
+its file list is complete.
+
+The result is a file -> file adjacency list aligned with "files":
+
+  "deps": [[row of each repo file that files[i] imports, sorted], ...]
+
+ModuleIndex is built in one pass over the file paths (dotted Python modules,
+extension-less JS/TS paths, path and directory suffixes for C/C++ headers and
+Go packages), so resolving an import is a few dict lookups; nothing touches
+the filesystem. What is resolved, by importer language:
+
+  - python      dotted modules and relative imports, recorded by
+                import_module_names as ".mod" / "..pkg.mod". Absolute modules
+                are only named from package roots: the repo root, a src/-style
+                directory (PY_SOURCE_ROOTS), or the parent of the outermost
+                directory of an __init__.py package chain. So "import json" does
+                not land on tests/fixtures/json.py, and a module that does not
+                resolve as a whole ("logging.handlers") is not pinned on a parent.
+  - javascript  "./x" / "../x" paths, with the usual extensions and index files
+  - c / cpp     #include paths, relative to the including file, then by path suffix
+  - go          package import paths whose trailing segments name a repo
+                directory (every non-test .go file in it); stdlib paths are skipped
+
+Anything else (third-party packages, system headers that the repo does not
+vendor) stays unresolved.
+"""
+
+import posixpath
+from typing import Any, Dict, List, Optional
+
+JS_RESOLVE_EXTS = ("", ".ts", ".tsx", ".js", ".jsx", ".mjs", ".cjs", ".d.ts")
+JS_INDEX_FILES = ("index.ts", "index.tsx", "index.js", "index.jsx", "index.mjs")
+PY_SOURCE_ROOTS = ("src", "lib", "python")
+
+def import_module_names(imp: Dict[str, Any]) -> List[str]:
+    """
+    Dictionary names for one parsed import. Python relative imports keep their
+    level as leading dots; "from . import a, b" yields ".a" and ".b".
+    """
+    module = (imp.get("module") or "").strip()
+    level = imp.get("level") or 0
+    if not level:
+        return [module] if module else []
+    dots = "." * level
+    if module:
+        return [dots + module]
+    return [dots + name for name in imp.get("names", []) if name and name != "*"] or [dots]
+
+def _suffixes(parts: List[str]):
+    for k in range(len(parts)):
+        yield "/".join(parts[k:])
+
+def _py_roots(dirs: List[str], packages: set) -> List[int]:
+    """
+    Positions k in a .py file's directory parts where module names may start:
+    0 (repo root), just below a PY_SOURCE_ROOTS directory, and the outermost
+    directory of the __init__.py package chain that holds the file.
+    """
+    roots = {0}
+    roots.update(k + 1 for k, name in enumerate(dirs) if name in PY_SOURCE_ROOTS)
+    k = len(dirs)
+    while k > 0 and "/".join(dirs[:k]) in packages:
+        k -= 1
+    if k < len(dirs):
+        roots.add(k)
+    return sorted(roots)
+
+class ModuleIndex:
+    def __init__(self, paths: List[str]):
+        self.rows: Dict[str, int] = {}            # path -> row
+        self.py_modules: Dict[str, int] = {}      # dotted module, named from a package root -> row
+        self.path_suffixes: Dict[str, int] = {}   # trailing path segments -> row (headers)
+        self.go_dirs: Dict[str, List[int]] = {}   # trailing dir segments -> rows of the package
+        packages = {posixpath.dirname(p) for p in paths if posixpath.basename(p) == "__init__.py"}
+        # shallowest path wins a contested key: sort rows by depth once
+        for row in sorted(range(len(paths)), key=lambda r: (paths[r].count("/"), r)):
+            path = paths[row]
+            self.rows[path] = row
+            parts = path.split("/")
+            for suffix in _suffixes(parts):
+                self.path_suffixes.setdefault(suffix, row)
+            if path.endswith(".py"):
+                mod_parts = parts[:-1] if parts[-1] == "__init__.py" else parts[:-1] + [parts[-1][:-3]]
+                for k in _py_roots(parts[:-1], packages):
+                    if k < len(mod_parts):
+                        self.py_modules.setdefault(".".join(mod_parts[k:]), row)
+            elif path.endswith(".go") and not path.endswith("_test.go") and len(parts) > 1:
+                for suffix in _suffixes(parts[:-1]):
+                    self.go_dirs.setdefault(suffix, []).append(row)
+
+    # ----- per language -----
+
+    def _python(self, importer: str, module: str) -> List[int]:
+        if module.startswith("."):
+            level = len(module) - len(module.lstrip("."))
+            base = posixpath.dirname(importer).split("/") if "/" in importer else []
+            if level - 1 > len(base):
+                return []
+            base = base[:len(base) - (level - 1)]
+            rest = module[level:]
+            parts = base + (rest.split(".") if rest else [])
+            if not parts:
+                return []
+            row = self.rows.get("/".join(parts) + ".py")
+            if row is None:
+                row = self.rows.get("/".join(parts + ["__init__.py"]))
+            if row is None and rest:  # "from . import name" where name is not a module
+                row = self.rows.get("/".join(base + ["__init__.py"]))
+            return [row] if row is not None else []
+        row = self.py_modules.get(module)
+        return [row] if row is not None else []
+
+    def _js(self, importer: str, module: str) -> List[int]:
+        if not module.startswith("."):
+            return []
+        target = posixpath.normpath(posixpath.join(posixpath.dirname(importer), module))
+        for ext in JS_RESOLVE_EXTS:
+            row = self.rows.get(target + ext)
+            if row is not None:
+                return [row]
+        for name in JS_INDEX_FILES:
+            row = self.rows.get(posixpath.join(target, name))
+            if row is not None:
+                return [row]
+        return []
+
+    def _c(self, importer: str, module: str) -> List[int]:
+        local = posixpath.normpath(posixpath.join(posixpath.dirname(importer), module))
+        row = self.rows.get(local)
+        if row is None:
+            row = self.path_suffixes.get(posixpath.normpath(module))
+        return [row] if row is not None else []
+
+    def _go(self, importer: str, module: str) -> List[int]:
+        parts = module.split("/")
+        # a lone trailing segment only counts under a module path ("github.com/..."),
+        # so stdlib imports like "net/http" do not land on a repo dir named "http"
+        min_len = 1 if "." in parts[0] else 2
+        for k in range(len(parts) - min_len + 1):
+            rows = self.go_dirs.get("/".join(parts[k:]))
+            if rows is not None:
+                return rows
+        return []
+
+    def resolve(self, importer: str, lang: str, module: str) -> List[int]:
+        """Rows of the repo files module refers to from importer (empty if external)."""
+        if lang == "python":
+            return self._python(importer, module)
+        if lang == "javascript":
+            return self._js(importer, module)
+        if lang in ("c", "cpp"):
+            return self._c(importer, module)
+        if lang == "go":
+            return self._go(importer, module)
+        return []
+
+def resolve_file_deps(compact: Dict[str, Any], index: Optional[ModuleIndex] = None) -> List[List[int]]:
+    """file -> file adjacency (rows into compact["files"]) for a compact v2 graph."""
+    files = compact.get("files", [])
+    imports = compact.get("dicts", {}).get("imports", [])
+    index = index or ModuleIndex([f["path"] for f in files])
+    deps = []
+    for row, f in enumerate(files):
+        path, lang = f["path"], f.get("lang", "")
+        targets = set()
+        for idx in f.get("imports", []):
+            if 0 <= idx < len(imports):
+                targets.update(index.resolve(path, lang, imports[idx]))
+        targets.discard(row)
+        deps.append(sorted(targets))
+    return deps
+
+def add_file_deps(compact: Dict[str, Any]) -> Dict[str, Any]:
+    """Attach the "deps" adjacency list to a compact graph in place; returns it."""
+    compact["deps"] = resolve_file_deps(compact)
+    return compact
@@ -1,20 +1,26 @@
-import ast
 import hashlib
-import io
 import json
 import os
 import re
-import shutil
 import sys
 import tempfile
 import time
 import traceback
-import zipfile
 from datetime import datetime, timezone
-from urllib.request import Request, urlopen
+from itertools import islice
 import streamlit as st
 import streamlit.components.v1 as components
 
+from graph_columnar import PYARROW_AVAILABLE, ColumnarGraph, has_columnar, save_columnar_from_v1
+from graph_stats import compute_graph_stats, save_graph_stats
+from graph_view import V1GraphView, graph_view
+from artifact_catalog import artifact_label, list_artifacts, record_artifact
+from load_cache import cached_load
+from repo_fetch import fetch_repo_archive, get_default_branch
+from file_classifier import FileClassifier
+from repo_scan import (ParseReport, ZipRepoSource, content_keys, count_skipped, open_local_repo_source,
+                       open_repo_source, scan_repo_files)
+
 # Optional: PyVis (for interactive graph)
 try:
     from pyvis.network import Network
@@ -26,29 +32,29 @@ except Exception:
 DEFAULT_CACHE_DIR = os.path.join(os.getcwd(), ".cache", "graphs")
 os.makedirs(DEFAULT_CACHE_DIR, exist_ok=True)
 
-SKIP_DIRS = {
-    ".git", "__pycache__", "venv", ".venv", "build", "dist", "node_modules",
-    ".mypy_cache", ".pytest_cache", "target", "out", ".gradle", ".idea"
-}
-MAX_FILE_BYTES = 2 * 1024 * 1024  # 2MB per file safety limit
-
-# Language sets by extension (lowercase, without dot)
-PY_EXTS   = {"py"}
-JS_TS_EXTS= {"js", "jsx", "ts", "tsx", "mjs", "cjs"}
-JAVA_EXTS = {"java"}
-GO_EXTS   = {"go"}
-C_EXTS    = {"c", "h"}
-CPP_EXTS  = {"cc", "cpp", "cxx", "hpp", "hh", "hxx", "h++", "c++"}
-RUST_EXTS = {"rs"}
-RUBY_EXTS = {"rb"}
-PHP_EXTS  = {"php"}
-KT_EXTS   = {"kt", "kts"}
-
 # ===================== Utilities =====================
 
 def now_iso():
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
 
+def show_parse_report(parse: dict, skipped: dict | None = None):
+    """
+    Parse budget fallbacks and slowest files of a build (meta["parse"], see
+    repo_scan.ParseReport, which also counts copies of already parsed files), plus
+    the generated/vendored files it skipped (totals["skipped"]).
+    """
+    if skipped:
+        st.caption("Skipped without parsing: " + ", ".join(f"{n} {reason}" for reason, n in sorted(skipped.items())))
+    if parse.get("duplicates"):
+        st.caption(f"{parse['duplicates']} file(s) were byte-identical copies and reused an earlier parse.")
+    fallbacks = set(parse.get("fallbacks", []))
+    if fallbacks:
+        st.warning(f"{len(fallbacks)} file(s) exceeded the {parse['budget_s']:g}s parse budget "
+                   f"and were scanned line by line: {', '.join(sorted(fallbacks)[:10])}")
+    if parse.get("slowest"):
+        with st.expander(f"Slowest files to parse ({parse['files']} parsed, {parse['total_ms'] / 1000:.1f}s total)"):
+            st.table([{"File": p, "Parse (ms)": ms, "Line fallback": p in fallbacks} for p, ms in parse["slowest"]])
+
 def sanitize_repo_name(name: str) -> str:
     return re.sub(r"[^\w\-\.]+", "-", name).strip("-")
 
@@ -71,258 +77,6 @@ def parse_github_url(url: str):
     subpath = (subpath or "").lstrip("/")
     return {"owner": owner, "repo": repo, "branch": branch, "subpath": subpath, "kind": kind or "repo"}
 
-def http_get_json(url: str, token: str | None = None):
-    headers = {"User-Agent": "streamlit-kg-app"}
-    if token:
-        headers["Authorization"] = f"Bearer {token}"
-    req = Request(url, headers=headers)
-    with urlopen(req, timeout=30) as resp:
-        return json.loads(resp.read().decode("utf-8"))
-
-def get_default_branch(owner: str, repo: str, token: str | None = None) -> str:
-    try:
-        info = http_get_json(f"https://api.github.com/repos/{owner}/{repo}", token=token)
-        if info.get("default_branch"):
-            return info["default_branch"]
-    except Exception:
-        pass
-    for candidate in ("main", "master"):
-        if can_download_zip(owner, repo, candidate):
-            return candidate
-    return "main"
-
-def can_download_zip(owner: str, repo: str, branch: str) -> bool:
-    url = f"https://codeload.github.com/{owner}/{repo}/zip/refs/heads/{branch}"
-    try:
-        req = Request(url, headers={"User-Agent": "streamlit-kg-app"})
-        with urlopen(req, timeout=10) as resp:
-            return resp.status == 200
-    except Exception:
-        return False
-
-def download_repo_zip(owner: str, repo: str, branch: str) -> bytes:
-    url = f"https://codeload.github.com/{owner}/{repo}/zip/refs/heads/{branch}"
-    req = Request(url, headers={"User-Agent": "streamlit-kg-app"})
-    with urlopen(req, timeout=60) as resp:
-        return resp.read()
-
-def unzip_to_temp(zip_bytes: bytes) -> str:
-    tmpdir = tempfile.mkdtemp(prefix="ghrepo_")
-    with zipfile.ZipFile(io.BytesIO(zip_bytes)) as zf:
-        zf.extractall(tmpdir)
-    entries = [os.path.join(tmpdir, d) for d in os.listdir(tmpdir)]
-    dirs = [p for p in entries if os.path.isdir(p)]
-    if not dirs:
-        raise RuntimeError("Unexpected ZIP structure.")
-    # pick largest
-    return max(dirs, key=lambda p: sum(len(files) for _, _, files in os.walk(p)))
-
-def detect_lang_by_ext(ext: str) -> str:
-    e = ext.lower().lstrip(".")
-    if e in PY_EXTS: return "python"
-    if e in JS_TS_EXTS: return "javascript"
-    if e in JAVA_EXTS: return "java"
-    if e in GO_EXTS: return "go"
-    if e in CPP_EXTS or e in C_EXTS: return "cpp" if e in CPP_EXTS else "c"
-    if e in RUST_EXTS: return "rust"
-    if e in RUBY_EXTS: return "ruby"
-    if e in PHP_EXTS: return "php"
-    if e in KT_EXTS: return "kotlin"
-    return "text"
-
-def iter_repo_files(root_dir: str, subpath: str | None = None, max_files: int | None = None):
-    base = os.path.join(root_dir, subpath) if subpath else root_dir
-    count = 0
-    for dirpath, dirnames, filenames in os.walk(base):
-        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.startswith(".")]
-        for fn in filenames:
-            abs_path = os.path.join(dirpath, fn)
-            rel_path = os.path.relpath(abs_path, root_dir).replace("\\", "/")
-            yield abs_path, rel_path
-            count += 1
-            if max_files and count >= max_files:
-                return
-
-def read_text_file(path: str) -> str | None:
-    try:
-        if os.path.getsize(path) > MAX_FILE_BYTES:
-            return None
-        with open(path, "rb") as f:
-            data = f.read()
-        if b"\x00" in data:
-            return None
-        try:
-            return data.decode("utf-8")
-        except UnicodeDecodeError:
-            return data.decode("utf-8", errors="ignore")
-    except Exception:
-        return None
-
-# ===================== Language Parsers =====================
-
-def parse_python_text(py_src: str):
-    classes, imports, functions = [], [], []
-    try:
-        tree = ast.parse(py_src)
-    except SyntaxError:
-        return classes, imports, functions
-    if hasattr(tree, "body"):
-        for n in tree.body:
-            if isinstance(n, ast.FunctionDef) or isinstance(n, ast.AsyncFunctionDef):
-                functions.append(n.name)
-    for node in ast.walk(tree):
-        if isinstance(node, ast.ClassDef):
-            classes.append(node.name)
-        elif isinstance(node, ast.Import):
-            for alias in node.names:
-                imports.append({"type": "import", "module": alias.name, "names": [], "level": 0})
-        elif isinstance(node, ast.ImportFrom):
-            mod = node.module or ""
-            names = [alias.name for alias in node.names]
-            imports.append({"type": "from", "module": mod, "names": names, "level": node.level or 0})
-    return classes, imports, functions
-
-_ident = r"[A-Za-z_][A-Za-z0-9_]*"
-_js_ident = r"[A-Za-z_$][A-Za-z0-9_$]*"
-
-def parse_js_ts_text(src: str):
-    classes, imports, functions = [], [], []
-    for m in re.finditer(rf"\bclass\s+({_js_ident})\b", src):
-        classes.append(m.group(1))
-    for m in re.finditer(r"""import\s+(?:[\s\S]*?\s+from\s+)?['"'"]""", src):
-        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
-    for m in re.finditer(r"""require\(\s*'"['"]\s*\)""", src):
-        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
-    for m in re.finditer(rf"\bfunction\s+({_js_ident})\s*\(", src):
-        functions.append(m.group(1))
-    for m in re.finditer(rf"\bexport\s+function\s+({_js_ident})\s*\(", src):
-        functions.append(m.group(1))
-    for m in re.finditer(rf"\b(?:const|let|var)\s+({_js_ident})\s*=\s*function\b", src):
-        functions.append(m.group(1))
-    for m in re.finditer(rf"\b(?:const|let|var)\s+({_js_ident})\s*=\s*\(", src):
-        functions.append(m.group(1))
-    return classes, imports, list(dict.fromkeys(functions))
-
-def parse_java_text(src: str):
-    classes, imports, functions = [], [], []
-    for m in re.finditer(rf"\b(class|interface|enum)\s+({_ident})\b", src):
-        classes.append(m.group(2))
-    for m in re.finditer(r"\bimport\s+([a-zA-Z0-9_\.]+)(?:\s*;\s*)", src):
-        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
-    return classes, imports, functions
-
-def parse_go_text(src: str):
-    classes, imports, functions = [], [], []
-    for m in re.finditer(r'import\s+"([^"]+)"', src):
-        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
-    block = re.search(r"import\s*\((.*?)\)", src, re.S)
-    if block:
-        for m in re.finditer(r'"([^"]+)"', block.group(1)):
-            imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
-    for m in re.finditer(rf"\btype\s+({_ident})\s+struct\b", src):
-        classes.append(m.group(1))
-    for m in re.finditer(rf"\bfunc\s+(?:\([^)]+\)\s*)?({_ident})\s*\(", src):
-        functions.append(m.group(1))
-    return classes, imports, functions
-
-def parse_c_cpp_text(src: str):
-    """
-    Heuristic parsing for C/C++:
-      - #include "..." and #include <...>  -> imports
-      - class/struct <Name>                -> classes
-      - top-level function definitions     -> functions (declarations excluded)
-    """
-    import re
-
-    classes, imports, functions = [], [], []
-
-    # Includes: #include <header> or #include "header"
-    include_pattern = r'#\s*include\s*<"[>"]'
-    for m in re.finditer(include_pattern, src):
-        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
-
-    # Identifier pattern
-    _ident = r"[A-Za-z_][A-Za-z0-9_]*"
-
-    # class/struct names
-    for m in re.finditer(rf"\b(class|struct)\s+({_ident})\b", src):
-        classes.append(m.group(2))
-
-    # Heuristic top-level function definition (requires a body '{', avoids ';' declarations)
-    # Examples matched:
-    #   int foo(int a) { ... }
-    #   static inline MyType ns::Class::method(T x) { ... }
-    #   template<typename T> T bar(T x) { ... }
-    func_pattern = (
-        r"(?m)^[ \t]*"                 # line start
-        r"[A-Za-z_][\w:\s\*\&\<\>]*\s+" # return type / qualifiers
-        r"(" + _ident + r")"           # function name (capture)
-        r"\s*\([^;]*\)"                # args (not containing ';')
-        r"\s*\{"                       # opening brace of body
-    )
-    for m in re.finditer(func_pattern, src):
-        functions.append(m.group(1))
-
-    # De-dup preserve order
-    functions = list(dict.fromkeys(functions))
-    return classes, imports, functions
-
-
-
-def parse_rust_text(src: str):
-    classes, imports, functions = [], [], []
-    for m in re.finditer(r"\buse\s+([A-Za-z0-9_:\{\}\*,\s]+);", src):
-        mod = re.sub(r"\s+", " ", m.group(1)).strip()
-        imports.append({"type": "import", "module": mod, "names": [], "level": 0})
-    for m in re.finditer(rf"\b(struct|enum)\s+({_ident})\b", src):
-        classes.append(m.group(2))
-    for m in re.finditer(rf"\bfn\s+({_ident})\s*\(", src):
-        functions.append(m.group(1))
-    return classes, imports, functions
-
-def parse_ruby_text(src: str):
-    classes, imports, functions = [], [], []
-    for m in re.finditer(rf"\bclass\s+({_ident})\b", src):
-        classes.append(m.group(1))
-    for m in re.finditer(r"""(?:require|require_relative)\s+'"['"]""", src):
-        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
-    for m in re.finditer(rf"(?m)^\s*def\s+({_ident})\b", src):
-        functions.append(m.group(1))
-    return classes, imports, functions
-
-def parse_php_text(src: str):
-    classes, imports, functions = [], [], []
-    for m in re.finditer(rf"\bclass\s+({_ident})\b", src):
-        classes.append(m.group(1))
-    for m in re.finditer(rf"\bfunction\s+({_ident})\s*\(", src):
-        functions.append(m.group(1))
-    for m in re.finditer(rf"\buse\s+([A-Za-z0-9_\\]+)\s*;", src):
-        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
-    return classes, imports, functions
-
-def parse_kotlin_text(src: str):
-    classes, imports, functions = [], [], []
-    for m in re.finditer(rf"\b(class|object|interface)\s+({_ident})\b", src):
-        classes.append(m.group(2))
-    for m in re.finditer(rf"\bimport\s+([A-Za-z0-9_\.]+)\s*", src):
-        imports.append({"type": "import", "module": m.group(1), "names": [], "level": 0})
-    for m in re.finditer(rf"\bfun\s+({_ident})\s*\(", src):
-        functions.append(m.group(1))
-    return classes, imports, functions
-
-def parse_any_text_by_ext(ext: str, text: str):
-    e = ext.lower().lstrip(".")
-    if e in PY_EXTS: return parse_python_text(text)
-    if e in JS_TS_EXTS: return parse_js_ts_text(text)
-    if e in JAVA_EXTS: return parse_java_text(text)
-    if e in GO_EXTS: return parse_go_text(text)
-    if e in C_EXTS or e in CPP_EXTS: return parse_c_cpp_text(text)
-    if e in RUST_EXTS: return parse_rust_text(text)
-    if e in RUBY_EXTS: return parse_ruby_text(text)
-    if e in PHP_EXTS: return parse_php_text(text)
-    if e in KT_EXTS: return parse_kotlin_text(text)
-    return [], [], []
-
 # ===================== Graph Build =====================
 
 def build_graph_struct():
@@ -341,37 +95,55 @@ def add_edge(graph, source, target, edge_type, **props):
     edge.update(props)
     graph["edges"].append(edge)
 
-def build_repo_kg(root_dir: str, subpath: str | None = None, progress=None, max_files: int | None = None):
+def build_repo_kg(root_dir, subpath: str | None = None, progress=None, max_files: int | None = None,
+                  workers: int | None = None, parse_report: ParseReport | None = None,
+                  skip_generated: bool = True):
     """
     Build knowledge graph across ALL files:
       - file nodes (with language guess from extension)
       - class nodes and FILE_CONTAINS_CLASS edges
       - function nodes and FILE_CONTAINS_FUNCTION edges
       - import nodes (module/header string) and FILE_IMPORTS edges
+
+    root_dir is an extracted directory or a repo source (e.g. repo_scan.ZipRepoSource).
+    Files are read/parsed by `workers` processes (None = all cores, 1 = serial);
+    results are merged in file order, so the graph is identical either way.
+    Byte-identical files are parsed once and share the result (repo_scan.content_keys).
+    Per-file parse timings go to parse_report when given.
+
+    With skip_generated, generated / minified / vendored / git-ignored files
+    (file_classifier) keep their file node, tagged "skipped", but are not
+    parsed; totals["skipped"] counts them by reason.
     """
     graph = build_graph_struct()
     nodes_index = {}
-    totals = {"files": 0, "classes": 0, "imports": 0, "functions": 0}
+    totals = {"files": 0, "classes": 0, "imports": 0, "functions": 0, "skipped": {}}
 
-    file_list = list(iter_repo_files(root_dir, subpath, max_files=max_files))
+    source = open_repo_source(root_dir)
+    file_list = list(source.iter_files(subpath, max_files=max_files))
     n = len(file_list)
+    classifier = FileClassifier.from_source(source, file_list, subpath) if skip_generated else None
 
-    for i, (abs_path, rel_path) in enumerate(file_list, start=1):
+    scans = scan_repo_files(file_list, workers=workers, source=source, classifier=classifier,
+                            dedup_keys=content_keys(file_list, source))
+    for i, (rel_path, scanned) in enumerate(scans, start=1):
         if progress:
             progress.progress(min(i / max(n, 1), 1.0), text=f"Scanning {rel_path} ({i}/{n})")
+        if parse_report:
+            parse_report.add(rel_path, scanned)
 
-        ext = os.path.splitext(rel_path)[1]
-        lang = detect_lang_by_ext(ext)
-        file_text = read_text_file(abs_path)
+        lang = scanned["lang"]
 
         file_node_id = f"file:{rel_path}"
-        add_node(nodes_index, graph, file_node_id, "file", rel_path, path=rel_path, lang=lang)
+        reason = count_skipped(totals, scanned)
+        tags = {"skipped": reason} if reason else {}
+        add_node(nodes_index, graph, file_node_id, "file", rel_path, path=rel_path, lang=lang, **tags)
         totals["files"] += 1
 
-        if not file_text:
+        if not scanned["has_text"]:
             continue
 
-        classes, imports, functions = parse_any_text_by_ext(ext, file_text)
+        classes, imports, functions = scanned["classes"], scanned["imports"], scanned["functions"]
 
         for cls in classes:
             class_node_id = f"class:{rel_path}#{cls}"
@@ -404,6 +176,10 @@ def fingerprint(owner: str, repo: str, branch: str, subpath: str | None, url: st
     payload = f"{owner}/{repo}@{branch}:{subpath or ''}|{url}"
     return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
 
+def load_graph_json(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
 def save_graph(cache_dir: str, meta: dict, graph: dict) -> str:
     ensure_dir(cache_dir)
     graph_id = meta["graph_id"]
@@ -412,6 +188,12 @@ def save_graph(cache_dir: str, meta: dict, graph: dict) -> str:
     out_path = os.path.join(cache_dir, filename)
     with open(out_path, "w", encoding="utf-8") as f:
         json.dump({"meta": meta, **graph}, f, ensure_ascii=False, indent=2)
+    if PYARROW_AVAILABLE:
+        # Columnar copy (<name>.columnar/) read lazily by the Preview / Viewer tabs
+        save_columnar_from_v1(out_path, meta, graph)
+    # Aggregates for wiki_from_graph (<name>.stats)
+    save_graph_stats(out_path, compute_graph_stats(graph, meta))
+    record_artifact(out_path, "graph_v1", meta)
     return out_path
 
 # ===================== Streamlit UI =====================
@@ -421,14 +203,31 @@ st.title("📚 GitHub → Knowledge Graph (Polyglot: files, classes, imports, fu
 
 with st.sidebar:
     st.header("Input")
-    gh_url = st.text_input(
-        "GitHub URL",
-        help="Examples:\n- https://github.com/pallets/flask\n- https://github.com/pallets/flask/tree/main/src\n- https://github.com/owner/repo/blob/main/path/to/file.js"
-    )
-    token = st.text_input("GitHub token (optional)", type="password",
-                          help="Improves API rate limits. Create a fine-grained token with minimal permissions.")
+    source_mode = st.radio("Source", ["GitHub URL", "Local path"], horizontal=True,
+                           help="Local path: a git working tree or bare repo (blobs read from the object "
+                                "database, no checkout) or a plain directory.")
+    if source_mode == "Local path":
+        local_path = st.text_input("Repository path", help="Working tree, bare repo (*.git) or plain directory.")
+        local_rev = st.text_input("Commit-ish (optional)", help="Branch, tag or SHA to read; defaults to HEAD.")
+        local_subpath = st.text_input("Subpath (optional)")
+        gh_url, token = "", ""
+    else:
+        gh_url = st.text_input(
+            "GitHub URL",
+            help="Examples:\n- https://github.com/pallets/flask\n- https://github.com/pallets/flask/tree/main/src\n- https://github.com/owner/repo/blob/main/path/to/file.js"
+        )
+        token = st.text_input("GitHub token (optional)", type="password",
+                              help="Improves API rate limits. Create a fine-grained token with minimal permissions.")
+        local_path = local_rev = local_subpath = ""
     cache_dir = st.text_input("Cache directory", value=DEFAULT_CACHE_DIR)
     max_files = st.number_input("Max files to scan (0 = no limit)", min_value=0, value=0, step=25)
+    scan_workers = st.number_input("Parse worker processes (0 = all cores)", min_value=0, value=0, step=1,
+                                   help="1 parses in a single worker process (the parse time budget cannot be "
+                                        "enforced from the app thread); results are identical for any value.")
+    skip_generated = st.checkbox("Skip generated / minified / vendored files", value=True,
+                                 help="Lockfiles, codegen output, minified bundles, vendor dirs, linguist-generated/"
+                                      "vendored (.gitattributes) and, for a plain local directory, .gitignore'd files keep a file "
+                                      "node but are not parsed.")
     run_btn = st.button("Build Knowledge Graph", type="primary", use_container_width=True)
 
 tab_build, tab_preview, tab_viewer = st.tabs(["🔨 Build", "👀 Preview / Explore", "🕸️ Graph Viewer (PyVis)"])
@@ -438,34 +237,56 @@ if run_btn:
     with tab_build:
         st.subheader("Build Log")
         try:
-            if not gh_url:
-                st.error("Please enter a GitHub URL.")
-                st.stop()
-
-            parts = parse_github_url(gh_url)
-            owner = parts["owner"]
-            repo = parts["repo"]
-            branch = parts["branch"] or get_default_branch(owner, repo, token=token)
-            subpath = parts["subpath"] or None
+            repo_src = None
+            if source_mode == "Local path":
+                if not local_path:
+                    st.error("Please enter a local repository path.")
+                    st.stop()
+                repo_src = open_local_repo_source(local_path, rev=local_rev.strip() or None)
+                info = repo_src.describe()
+                owner, repo, branch = info["owner"], info["repo"], info["branch"]
+                subpath = local_subpath.strip("/") or None
+                source_url, commit_sha = info["source_url"], info["commit_sha"]
+                # local graphs are keyed on the commit SHA (path for plain directories)
+                g_id = fingerprint(owner, repo, commit_sha or branch, subpath, commit_sha or source_url)
+            else:
+                if not gh_url:
+                    st.error("Please enter a GitHub URL.")
+                    st.stop()
+
+                parts = parse_github_url(gh_url)
+                owner = parts["owner"]
+                repo = parts["repo"]
+                branch = parts["branch"] or get_default_branch(owner, repo, token=token)
+                subpath = parts["subpath"] or None
+                source_url, commit_sha = gh_url, ""
+                g_id = fingerprint(owner, repo, branch, subpath, gh_url)
 
             st.write(f"**Repo:** `{owner}/{repo}`  |  **Branch:** `{branch}`  |  **Subpath:** `{subpath or '.'}`")
 
-            with st.status("Downloading repository...", expanded=False) as status:
-                zip_bytes = download_repo_zip(owner, repo, branch)
-                status.update(label="Downloaded ZIP ✔️")
+            if repo_src is None:
+                with st.status("Downloading repository...", expanded=False) as status:
+                    archive = fetch_repo_archive(owner, repo, branch, token=token)
+                    if archive["from_cache"]:
+                        status.update(label="Archive unchanged, using cached ZIP ✔️")
+                    else:
+                        status.update(label=f"Downloaded ZIP ({archive['bytes_downloaded'] / 1e6:.1f} MB) ✔️")
 
-            with st.status("Unzipping archive...", expanded=False) as status:
-                repo_root = unzip_to_temp(zip_bytes)
-                status.update(label="Unzipped ✔️")
+                with st.status("Reading archive index...", expanded=False) as status:
+                    repo_src = ZipRepoSource(archive["path"])
+                    commit_sha = archive["sha"] or ""
+                    status.update(label="Archive indexed (streaming, no extraction) ✔️")
 
             st.write("Parsing repository files (polyglot)...")
             progress = st.progress(0.0, text="Starting...")
             limit = max_files if max_files and max_files > 0 else None
-            graph, totals = build_repo_kg(repo_root, subpath=subpath, progress=progress, max_files=limit)
+            parse_report = ParseReport()
+            graph, totals = build_repo_kg(repo_src, subpath=subpath, progress=progress, max_files=limit,
+                                          workers=int(scan_workers) or None, parse_report=parse_report,
+                                          skip_generated=skip_generated)
 
-            g_id = fingerprint(owner, repo, branch, subpath, gh_url)
             meta = {
-                "source_url": gh_url,
+                "source_url": source_url,
                 "owner": owner,
                 "repo": repo,
                 "branch": branch,
@@ -473,15 +294,14 @@ if run_btn:
                 "created_at": now_iso(),
                 "totals": totals,
                 "graph_id": g_id,
-                "notes": "Non-Python languages parsed heuristically via regex; Python via AST."
+                "commit_sha": commit_sha,
+                "notes": "Non-Python languages parsed heuristically via regex; Python via AST.",
+                "parse": parse_report.to_meta(),
             }
 
             saved_path = save_graph(cache_dir, meta, graph)
 
-            try:
-                shutil.rmtree(os.path.dirname(repo_root))
-            except Exception:
-                pass
+            repo_src.close()
 
             st.success("Knowledge graph built and saved!")
             c1, c2, c3, c4 = st.columns(4)
@@ -489,6 +309,7 @@ if run_btn:
             c2.metric("Classes", totals["classes"])
             c3.metric("Functions", totals["functions"])
             c4.metric("Imports", totals["imports"])
+            show_parse_report(meta["parse"], totals.get("skipped"))
 
             st.code(saved_path, language="bash")
             with open(saved_path, "r", encoding="utf-8") as f:
@@ -512,16 +333,18 @@ with tab_preview:
     st.subheader("Explore a cached graph (per-file view)")
     try:
         ensure_dir(cache_dir)
-        files = [f for f in os.listdir(cache_dir) if f.lower().endswith(".json")]
-        files.sort(reverse=True)
-        selected = st.selectbox("Select a cached graph", options=files, key="preview_select")
+        files = {r["path"]: artifact_label(r) for r in list_artifacts("graph_v1", cache_dir)}
+        selected = st.selectbox("Select a cached graph", options=list(files), format_func=files.get, key="preview_select")
         if selected:
-            full_path = os.path.join(cache_dir, selected)
-            with open(full_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            meta = data.get("meta", {})
-            nodes = data.get("nodes", [])
-            edges = data.get("edges", [])
+            full_path = selected
+            if has_columnar(full_path):
+                # Columnar copy: per-file lists come straight from memory-mapped columns (no JSON parse)
+                data = None
+                cg = cached_load(full_path, ColumnarGraph, kind="columnar")
+                meta = cg.meta
+            else:
+                data = cached_load(full_path, load_graph_json)
+                meta = data.get("meta", {})
 
             st.write(
                 f"**Repo:** `{meta.get('owner','')}/{meta.get('repo','')}`  |  "
@@ -537,43 +360,11 @@ with tab_preview:
 
             # ---------- Unified per-file view (Imports, Classes, Functions) ----------
 
-            # Build file-centric index from nodes & edges
-            nodes_by_id = {n["id"]: n for n in nodes}
-            files_by_id = {n["id"]: n for n in nodes if n.get("type") == "file"}
-
-            file_index = {
-                fid: {
-                    "path": fnode.get("path", fnode.get("label", "")),
-                    "lang": fnode.get("lang", ""),
-                    "classes": [],
-                    "functions": [],
-                    "imports": [],
-                }
-                for fid, fnode in files_by_id.items()
-            }
-
-            for e in edges:
-                src = e.get("source")
-                dst = e.get("target")
-                etype = e.get("type")
-                if src not in file_index:
-                    continue
-                target_node = nodes_by_id.get(dst)
-                if not target_node:
-                    continue
-
-                if etype == "FILE_CONTAINS_CLASS" and target_node.get("type") == "class":
-                    file_index[src]["classes"].append(target_node.get("label", ""))
-                elif etype == "FILE_CONTAINS_FUNCTION" and target_node.get("type") == "function":
-                    file_index[src]["functions"].append(target_node.get("label", ""))
-                elif etype == "FILE_IMPORTS" and target_node.get("type") == "import":
-                    file_index[src]["imports"].append(target_node.get("label", ""))
-
-            # De-duplicate + sort lists
-            for rec in file_index.values():
-                rec["classes"] = sorted(set([x for x in rec["classes"] if x]))
-                rec["functions"] = sorted(set([x for x in rec["functions"] if x]))
-                rec["imports"] = sorted(set([x for x in rec["imports"] if x]))
+            # Build file-centric index (memoized: filter/sort reruns reuse it)
+            if data is None:
+                file_index = cached_load(full_path, lambda _: cg.file_index(), kind="columnar_file_index")
+            else:
+                file_index = cached_load(full_path, lambda _: V1GraphView(data).file_index(), kind="file_index")
 
             st.markdown("### Files (Imports, Classes, Functions)")
 
@@ -598,7 +389,7 @@ with tab_preview:
             # Build rows with filtering
             rows = []
             for fid, rec in file_index.items():
-                path = rec["path"] or files_by_id[fid].get("label", "")
+                path = rec["path"]
                 lang = rec.get("lang", "")
                 is_empty = not (rec["classes"] or rec["functions"] or rec["imports"])
 
@@ -684,7 +475,7 @@ with tab_preview:
 
             # Raw JSON excerpt
             with st.expander("Raw JSON (first 300 lines)"):
-                text = json.dumps(data, indent=2, ensure_ascii=False).splitlines()
+                text = json.dumps(data if data is not None else {"meta": meta}, indent=2, ensure_ascii=False).splitlines()
                 st.code("\n".join(text[:300]))
     except Exception as e:
         st.error(f"Failed to load cached graphs: {e}")
@@ -692,7 +483,7 @@ with tab_preview:
 
 # ===================== Graph Viewer (PyVis) =====================
 
-def build_pyvis_html(data: dict,
+def build_pyvis_html(data,
                      include_types: set[str],
                      lang_filter: str | None,
                      path_contains: str | None,
@@ -702,15 +493,13 @@ def build_pyvis_html(data: dict,
                      height_px: int = 720) -> str:
     """
     Returns an HTML string for embedding the interactive graph.
+    data is a v1 / compact v2 graph dict or a graph_view; nodes and edges are
+    streamed from the view, so only the nodes that get drawn are kept.
     """
     if not PYVIS_AVAILABLE:
         raise RuntimeError("PyVis is not installed. Run: pip install pyvis")
 
-    nodes = data.get("nodes", [])
-    edges = data.get("edges", [])
-
-    # Map node_id -> node
-    node_by_id = {n["id"]: n for n in nodes}
+    view = graph_view(data)
 
     # Filter nodes by type/lang/path
     def node_passes(n):
@@ -731,15 +520,12 @@ def build_pyvis_html(data: dict,
             return n.get("lang") == lang_filter
         return True
 
-    filtered_nodes = [n for n in nodes if node_passes(n)]
-
-    # Limit node count to avoid browser overload
-    if max_nodes and len(filtered_nodes) > max_nodes:
-        filtered_nodes = filtered_nodes[:max_nodes]
+    # Limit node count to avoid browser overload (stop reading nodes once the cap is hit)
+    filtered_nodes = list(islice((n for n in view.iter_nodes() if node_passes(n)), max_nodes or None))
     allowed_ids = set(n["id"] for n in filtered_nodes)
 
     # Filter edges to those whose both endpoints are included
-    filtered_edges = [e for e in edges if e["source"] in allowed_ids and e["target"] in allowed_ids]
+    filtered_edges = [e for e in view.iter_edges() if e["source"] in allowed_ids and e["target"] in allowed_ids]
 
     # Degree for sizing
     degree = {nid: 0 for nid in allowed_ids}
@@ -854,13 +640,16 @@ with tab_viewer:
     else:
         try:
             ensure_dir(cache_dir)
-            files = [f for f in os.listdir(cache_dir) if f.lower().endswith(".json")]
-            files.sort(reverse=True)
-            selected_viz = st.selectbox("Select a cached graph to visualize", options=files, key="viewer_select")
+            files = {r["path"]: artifact_label(r) for r in list_artifacts("graph_v1", cache_dir)}
+            selected_viz = st.selectbox("Select a cached graph to visualize", options=list(files), format_func=files.get,
+                                        key="viewer_select")
             if selected_viz:
-                full_path_viz = os.path.join(cache_dir, selected_viz)
-                with open(full_path_viz, "r", encoding="utf-8") as f:
-                    data_viz = json.load(f)
+                full_path_viz = selected_viz
+                cg_viz = data_viz = None
+                if has_columnar(full_path_viz):
+                    cg_viz = cached_load(full_path_viz, ColumnarGraph, kind="columnar")
+                else:
+                    data_viz = cached_load(full_path_viz, load_graph_json)
 
                 # Controls
                 st.markdown("#### Filters & Layout")
@@ -873,7 +662,10 @@ with tab_viewer:
                     )
                 with colB:
                     # languages present in file nodes
-                    langs = sorted({n.get("lang") for n in data_viz.get("nodes", []) if n.get("lang")})
+                    if cg_viz is not None:
+                        langs = cg_viz.langs()
+                    else:
+                        langs = sorted({n.get("lang") for n in data_viz.get("nodes", []) if n.get("lang")})
                     lang_filter = st.selectbox("Filter by language (files)", options=["(all)"] + langs)
                     lang_filter = None if lang_filter == "(all)" else lang_filter
                 with colC:
@@ -892,6 +684,10 @@ with tab_viewer:
 
                 if render:
                     try:
+                        if cg_viz is not None:
+                            # Only the matching files (up to max_nodes) are materialized from the columns
+                            data_viz = cg_viz.to_v1(cg_viz.match_files(lang_filter, path_contains),
+                                                    max_nodes=max_nodes, include_types=set(include_types))
                         html = build_pyvis_html(
                             data=data_viz,
                             include_types=set(include_types),
@@ -907,7 +703,7 @@ with tab_viewer:
                         st.download_button(
                             "Download Visualization as HTML",
                             data=html,
-                            file_name=os.path.splitext(selected_viz)[0] + "_graph.html",
+                            file_name=os.path.splitext(os.path.basename(selected_viz))[0] + "_graph.html",
                             mime="text/html",
                             use_container_width=True,
                         )
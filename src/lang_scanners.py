@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Single-pass symbol scanners for the regex-parsed languages (everything but
+Python, which goes through ast), plus a line-by-line fallback mode for files
+whose parse exceeds repo_scan's time budget.
+
+Each language's rules (class / function / import patterns) are joined into one
+alternation with a named group per rule and compiled at import time; one
+finditer over the text yields every symbol, the rule that fired being
+m.lastgroup. Used by repo_scan (graph parsers) and code_units (embedding
+units), so the graph and the embeddings see the same symbols.
+
+Rules are matched leftmost-first and matches do not overlap: a rule's span
+hides any other symbol inside it. Spans are kept short: argument lists stop at
+the first unbalanced paren or ; { } (one level of nested parens is allowed),
+so a line that is not a definition is rejected without rescanning the rest
+of the file. The C/C++ function rule starts at a line start and may hide a
+"struct X" written in its return type or parameters, which is a use of X
+rather than its declaration.
+"""
+
+import re
+from typing import Dict, Iterator, List, Tuple
+
+_ident = r"[A-Za-z_][A-Za-z0-9_]*"
+_js_ident = r"[A-Za-z_$][A-Za-z0-9_$]*"
+
+# control-flow words that look like "name(...) {" to the function rules
+_not_keyword = r"(?!(?:if|for|while|switch|catch|return|sizeof|else|do|new|synchronized)\b)"
+
+# (kind, keyword, pattern after the keyword with one (?P<name>...) group).
+# Every rule starts with a literal keyword so the combined regex gets a
+# first-character prefilter (re skips positions whose char starts no rule);
+# word boundaries are checked by a lookbehind after the keyword instead of a
+# leading \b. keyword "\n" marks line-start rules (the text is scanned with a
+# "\n" prepended). kind "imports" is a Go import ( ... ) block.
+LANG_RULES: Dict[str, List[Tuple[str, str, str]]] = {
+    "javascript": [
+        ("import", "import", r"""\s+(?:[^'";]*?\s+from\s+)?['"](?P<name>[^'"\n]+)['"]"""),
+        ("import", "require", r"""\(\s*['"](?P<name>[^'"\n]+)['"]\s*\)"""),
+        ("class", "class", rf"\s+(?P<name>{_js_ident})"),
+        ("function", "function", rf"\s+(?P<name>{_js_ident})\s*\("),
+        ("function", "const", rf"\s+(?P<name>{_js_ident})\s*=\s*(?:function\b|\()"),
+        ("function", "let", rf"\s+(?P<name>{_js_ident})\s*=\s*(?:function\b|\()"),
+        ("function", "var", rf"\s+(?P<name>{_js_ident})\s*=\s*(?:function\b|\()"),
+    ],
+    "java": [
+        ("import", "import", r"\s+(?:static\s+)?(?P<name>[A-Za-z0-9_.]+)\s*;"),
+        ("class", "class", rf"\s+(?P<name>{_ident})"),
+        ("class", "interface", rf"\s+(?P<name>{_ident})"),
+        ("class", "enum", rf"\s+(?P<name>{_ident})"),
+        # modifiers / annotations / <type params> / return type, then name(args) [throws ...] {
+        # (type params allow one level of nesting: <T extends Comparable<T>>); "Map<K, V>"
+        # is split at its comma, which only joins tokens on one line, and at most eight
+        # tokens are taken, so an enum body fails at its first "," + newline instead
+        # of being re-walked from every line
+        ("function", "\n", rf"[ \t]*(?:[A-Za-z_@][\w<>\[\].?@]*(?:\s+|,[ \t]*)|<[^;{{}}()<>\n]*(?:<[^;{{}}()<>\n]*>[^;{{}}()<>\n]*)*>\s*){{1,8}}"
+                           rf"{_not_keyword}(?P<name>{_ident})"
+                           rf"\s*\([^;{{}}()]*\)\s*(?:throws\s+[\w.,\s]+)?\{{"),
+    ],
+    "go": [
+        ("import", "import", r'\s+"(?P<name>[^"\n]+)"'),
+        ("imports", "import", r"\s*\((?P<name>[^)]*)\)"),
+        ("class", "type", rf"\s+(?P<name>{_ident})\s+struct\b"),
+        ("function", "func", rf"\s+(?:\([^)]+\)\s*)?(?P<name>{_ident})\s*\("),
+    ],
+    "c": [
+        ("import", "#", r'[ \t]*include[ \t]*[<"](?P<name>[^>"\n]+)[>"]'),
+        # return type / qualifier tokens, then name(args) { -- as for Java, a "," only
+        # joins tokens on one line ("map<int, int>") and at most eight tokens are taken,
+        # so enum bodies and initializer lists fail fast; "static int\nfoo(void) {" matches
+        ("function", "\n", rf"[ \t]*(?:[A-Za-z_][\w:<>]*(?:[\s*&]+|,[ \t]*)){{1,8}}{_not_keyword}(?P<name>{_ident})"
+                           rf"\s*\((?:[^;{{}}()]|\([^;{{}}()]*\))*\)\s*(?:const\s*)?\{{"),
+        ("class", "class", rf"\s+(?P<name>{_ident})"),
+        ("class", "struct", rf"\s+(?P<name>{_ident})"),
+    ],
+    "rust": [
+        ("import", "use", r"\s+(?P<name>[A-Za-z0-9_:{}*,\s]+);"),
+        ("class", "struct", rf"\s+(?P<name>{_ident})"),
+        ("class", "enum", rf"\s+(?P<name>{_ident})"),
+        ("function", "fn", rf"\s+(?P<name>{_ident})\s*\("),
+    ],
+    "ruby": [
+        ("import", "require", r"""\s+['"](?P<name>[^'"\n]+)['"]"""),
+        ("import", "require_relative", r"""\s+['"](?P<name>[^'"\n]+)['"]"""),
+        ("class", "class", rf"\s+(?P<name>{_ident})"),
+        ("function", "\n", rf"\s*def\s+(?P<name>{_ident})"),
+    ],
+    "php": [
+        ("import", "use", r"\s+(?P<name>[A-Za-z0-9_\\]+)\s*;"),
+        ("class", "class", rf"\s+(?P<name>{_ident})"),
+        ("function", "function", rf"\s+(?P<name>{_ident})\s*\("),
+    ],
+    "kotlin": [
+        ("import", "import", r"\s+(?P<name>[A-Za-z0-9_.]+)"),
+        ("class", "class", rf"\s+(?P<name>{_ident})"),
+        ("class", "object", rf"\s+(?P<name>{_ident})"),
+        ("class", "interface", rf"\s+(?P<name>{_ident})"),
+        ("function", "fun", rf"\s+(?P<name>{_ident})\s*\("),
+    ],
+}
+LANG_RULES["cpp"] = LANG_RULES["c"]
+
+# Python normally goes through ast; these rules only back the line fallback
+# (top-level functions, like repo_scan.parse_python_text; relative imports keep their dots)
+LANG_RULES["python"] = [
+    ("import", "import", r"\s+(?P<name>[\w.]+)"),
+    ("import", "from", r"\s+(?P<name>\.*[\w.]*)\s+import\b"),
+    ("class", "class", rf"\s+(?P<name>{_ident})"),
+    ("function", "\n", rf"(?:async\s+)?def\s+(?P<name>{_ident})"),
+]
+
+# Line fallback: lines are cut to this many characters and scanned one by one
+LINE_SCAN_MAX_CHARS = 400
+
+_GO_IMPORT_PATH_RE = re.compile(r'"([^"\n]+)"')
+_WS_RE = re.compile(r"\s+")
+
+def _rule_regex(i: int, keyword: str, rest: str, word: str) -> str:
+    """keyword[0](?P<r_i>keyword[1:] <boundary> rest): the branch opens with a bare literal."""
+    boundary = f"(?<!{word}{re.escape(keyword)})" if keyword[0].isalpha() else ""
+    body = re.escape(keyword[1:]) + boundary + rest.replace("(?P<name>", f"(?P<n{i}>")
+    return f"{re.escape(keyword[0])}(?P<r{i}>{body})"
+
+class LangScanner:
+    def __init__(self, rules: List[Tuple[str, str, str]], word: str = r"\w"):
+        self.kinds = {}
+        self.line_rules = any(keyword == "\n" for _, keyword, _ in rules)
+        alternatives = []
+        for i, (kind, keyword, rest) in enumerate(rules):
+            # offsets point at the keyword, or at the line start for "\n" rules
+            self.kinds[f"r{i}"] = (kind, f"n{i}", 1 if keyword == "\n" else 0)
+            alternatives.append(_rule_regex(i, keyword, rest, word))
+        self.regex = re.compile("|".join(alternatives))
+
+    def iter_symbols(self, text: str) -> Iterator[Tuple[str, str, int]]:
+        """(kind, name, offset) for every symbol, kind being "class", "function" or "import"."""
+        kinds = self.kinds
+        shift = 0
+        if self.line_rules:
+            text, shift = "\n" + text, 1
+        for m in self.regex.finditer(text):
+            kind, group, skip = kinds[m.lastgroup]
+            if kind == "imports":
+                base = m.start(group) - shift
+                for sub in _GO_IMPORT_PATH_RE.finditer(m.group(group)):
+                    yield "import", sub.group(1), base + sub.start()
+            elif kind == "import" and _WS_RE.search(m.group(group)):  # multi-line rust "use a::{b, c};"
+                yield kind, _WS_RE.sub(" ", m.group(group)).strip(), m.start() - shift
+            else:
+                yield kind, m.group(group), m.start() + skip - shift
+
+    def iter_line_symbols(self, text: str) -> Iterator[Tuple[str, str, int]]:
+        """
+        iter_symbols run on each line separately, cut to LINE_SCAN_MAX_CHARS:
+        bounded work per line whatever the input looks like, at the cost of
+        constructs spanning lines (multi-line signatures, Go import blocks).
+        """
+        offset = 0
+        for line in text.splitlines(keepends=True):
+            for kind, name, start in self.iter_symbols(line[:LINE_SCAN_MAX_CHARS]):
+                yield kind, name, offset + start
+            offset += len(line)
+
+    def scan(self, text: str, by_line: bool = False):
+        """(classes, imports, functions) in the repo_scan parser format."""
+        classes, imports, functions = [], [], []
+        symbols = self.iter_line_symbols(text) if by_line else self.iter_symbols(text)
+        for kind, name, _ in symbols:
+            if kind == "class":
+                classes.append(name)
+            elif kind == "function":
+                functions.append(name)
+            else:
+                imports.append({"type": "import", "module": name, "names": [], "level": 0})
+        return list(dict.fromkeys(classes)), imports, list(dict.fromkeys(functions))
+
+SCANNERS: Dict[str, LangScanner] = {
+    lang: LangScanner(rules, word=r"[\w$]" if lang == "javascript" else r"\w") for lang, rules in LANG_RULES.items()
+}
+
+def scan_text(lang: str, text: str):
+    scanner = SCANNERS.get(lang)
+    return scanner.scan(text) if scanner else ([], [], [])
+
+def line_scan_text(lang: str, text: str):
+    """Cheap fallback parse (see LangScanner.iter_line_symbols)."""
+    scanner = SCANNERS.get(lang)
+    return scanner.scan(text, by_line=True) if scanner else ([], [], [])
+
+def iter_symbols(lang: str, text: str, by_line: bool = False) -> Iterator[Tuple[str, str, int]]:
+    scanner = SCANNERS.get(lang)
+    if not scanner:
+        return iter(())
+    return scanner.iter_line_symbols(text) if by_line else scanner.iter_symbols(text)
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+In-process cache for the loads the Streamlit apps repeat on every rerun:
+graphs, shards and manifests (load_json_autoz), embedding bundles and
+.cache directory listings.
+
+Entries are keyed by (loader, path, signature) where the signature is the
+(mtime_ns, size) of the file -- or of every file directly inside a directory --
+so rewriting a graph or re-running build_code_embeddings invalidates the entry
+on the next access. The cache is process-wide (modules survive Streamlit
+reruns, scripts do not) and bounded by LOAD_CACHE_MAX_MB, evicting least
+recently used entries.
+
+An entry's cost is the larger of the loaded value's estimated in-memory size
+(estimate_size, taken once when the entry is inserted) and the on-disk size of
+its inputs. The estimate is what keeps parsed .json.gz graphs and shards in
+check: their dicts are typically 10-30x the compressed file. The on-disk floor
+covers what the estimate cannot see: opaque objects such as faiss indices, and
+columns a lazy ColumnarGraph maps in after insertion. The bound is therefore on
+the sum of these costs, not on the process's resident memory: memory-mapped
+files are counted at their on-disk size, and a value that later grows past its
+estimate is not re-measured.
+
+Cached values are shared between reruns and sessions: treat them as read-only.
+"""
+
+import os
+import sys
+import threading
+import types
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional, Tuple
+
+LOAD_CACHE_MAX_MB = int(os.environ.get("LOAD_CACHE_MAX_MB", "1024"))
+
+Signature = Tuple[Tuple[str, int, int], ...]
+
+# containers longer than this are sized from an evenly spaced sample of their items
+_SAMPLE_ITEMS = 256
+_ATOMS = (str, bytes, bytearray, int, float, complex, bool, type(None))
+_SHARED = (types.ModuleType, type, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+def _sample(items: list):
+    """(items to visit, weight of each) for a container's items."""
+    if len(items) <= _SAMPLE_ITEMS:
+        return items, 1.0
+    step = len(items) / _SAMPLE_ITEMS
+    return [items[int(i * step)] for i in range(_SAMPLE_ITEMS)], step
+
+def estimate_size(value: Any) -> int:
+    """
+    Approximate bytes held by value: dicts, lists, tuples, sets, strings and
+    numbers are walked (long containers from a sample), numpy arrays count their
+    buffer (0 for memory maps), pandas objects their memory_usage(deep=True),
+    other objects their __dict__. Modules, classes and functions are shared and
+    count 0, as do opaque objects (e.g. faiss indices).
+    """
+    np = sys.modules.get("numpy")
+    total = 0.0
+    seen = set()
+    stack = [(value, 1.0)]
+    while stack:
+        obj, weight = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, _ATOMS):
+            total += weight * sys.getsizeof(obj)
+        elif isinstance(obj, dict):
+            total += weight * sys.getsizeof(obj)
+            items, w = _sample(list(obj.items()))
+            stack.extend((x, weight * w) for kv in items for x in kv)
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            total += weight * sys.getsizeof(obj)
+            items, w = _sample(list(obj))
+            stack.extend((x, weight * w) for x in items)
+        elif np is not None and isinstance(obj, np.ndarray):
+            mapped = isinstance(obj, np.memmap) or isinstance(obj.base, np.memmap)
+            total += weight * (0 if mapped else obj.nbytes)
+        elif type(obj).__module__.split(".", 1)[0] == "pandas" and hasattr(obj, "memory_usage"):
+            usage = obj.memory_usage(deep=True)
+            total += weight * float(usage.sum() if hasattr(usage, "sum") else usage)
+        elif isinstance(obj, _SHARED):
+            continue
+        elif isinstance(getattr(obj, "__dict__", None), dict):
+            total += weight * sys.getsizeof(obj)
+            stack.append((obj.__dict__, weight))
+    return int(total)
+
+def path_signature(path: str) -> Signature:
+    """(name, mtime_ns, size) of path, or of each regular file directly under it for a directory."""
+    if os.path.isdir(path):
+        sig = []
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_file():
+                    st = entry.stat()
+                    sig.append((entry.name, st.st_mtime_ns, st.st_size))
+        return tuple(sorted(sig))
+    st = os.stat(path)
+    return (("", st.st_mtime_ns, st.st_size),)
+
+class LoadCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # key -> (value, cost)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, path: str, loader: Callable[[str], Any], kind: Optional[str] = None) -> Any:
+        sig = path_signature(path)
+        key = (kind or getattr(loader, "__qualname__", repr(loader)), os.path.abspath(path), sig)
+        found, value = self.lookup(key)
+        if found:
+            return value
+        value = loader(path)
+        self.put(key, value, max(estimate_size(value), sum(size for _, _, size in sig)))
+        return value
+
+    def lookup(self, key) -> Tuple[bool, Any]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key][0]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value: Any, cost: int):
+        with self._lock:
+            # drop older signatures of the same (kind, path)
+            for old in [k for k in self._entries if k[:2] == key[:2] and k != key]:
+                self._bytes -= self._entries.pop(old)[1]
+            if cost > self.max_bytes:
+                return
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, cost)
+            self._bytes += cost
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, old_cost) = self._entries.popitem(last=False)
+                self._bytes -= old_cost
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+_CACHE = LoadCache(LOAD_CACHE_MAX_MB * 1024 * 1024)
+
+def cached_load(path: str, loader: Callable[[str], Any], kind: Optional[str] = None) -> Any:
+    """loader(path) memoized on path + mtime + size (see module docstring)."""
+    return _CACHE.get_or_load(path, loader, kind)
+
+def cached_listdir(path: str) -> List[str]:
+    """os.listdir(path) memoized on the directory's own mtime (entries added/removed/renamed)."""
+    st = os.stat(path)
+    key = ("listdir", os.path.abspath(path), (("", st.st_mtime_ns, 0),))
+    found, names = _CACHE.lookup(key)
+    if found:
+        return list(names)
+    names = os.listdir(path)
+    _CACHE.put(key, names, sum(len(n) for n in names))
+    return list(names)
+
+def clear_load_cache():
+    _CACHE.clear()
+
+def load_cache_stats() -> dict:
+    return _CACHE.stats()
@@ -6,8 +6,8 @@ Inputs:
   - Wiki structure XML (pages + sections).
   - Hybrid embeddings bundle at .cache/embeddings/<graph_id>/:
       * units.parquet (or units.parquet.jsonl.gz)
-      * file.index, file_ids.json
-      * symbol.index, symbol_ids.json
+      * file.index and/or file_vectors.npy, file_ids.json
+      * symbol.index and/or symbol_vectors.npy, symbol_ids.json
   - (Optional) README used earlier is not required here.
 
 Features:
@@ -39,6 +39,10 @@ import pandas as pd
 import streamlit as st
 from dotenv import load_dotenv
 
+from artifact_catalog import find_artifacts
+from load_cache import cached_load
+from vector_index import check_bundle_fresh, label_map, load_search_index, search_uids
+
 # ===================== Load environment variables =====================
 
 load_dotenv()
@@ -163,8 +167,8 @@ def load_embeddings_bundle(emb_dir: str) -> Dict[str, Any]:
     """
     Expects:
       - units.parquet  (or units.parquet.jsonl.gz)
-      - file.index, file_ids.json
-      - symbol.index, symbol_ids.json
+      - file.index and/or file_vectors.npy, file_ids.json
+      - symbol.index and/or symbol_vectors.npy, symbol_ids.json
     """
     units_path = os.path.join(emb_dir, "units.parquet")
     units_alt = os.path.join(emb_dir, "units.parquet.jsonl.gz")
@@ -180,17 +184,16 @@ def load_embeddings_bundle(emb_dir: str) -> Dict[str, Any]:
     else:
         raise FileNotFoundError("units.parquet not found in embeddings dir")
 
-    try:
-        import faiss  # noqa: F401
-        import faiss as _faiss
-    except ImportError:
-        raise RuntimeError("faiss-cpu is required. Install: pip install faiss-cpu")
-
-    file_index = _faiss.read_index(os.path.join(emb_dir, "file.index"))
-    symbol_index = _faiss.read_index(os.path.join(emb_dir, "symbol.index"))
+    # units.parquet rewritten by the wiki app after embedding: labels may name dropped uids
+    check_bundle_fresh(emb_dir)
+    # faiss indices when faiss is installed, else NumPy search over <prefix>_vectors.npy
+    file_index = load_search_index(emb_dir, "file")
+    symbol_index = load_search_index(emb_dir, "symbol")
     file_ids = json.loads(read_text(os.path.join(emb_dir, "file_ids.json")))
     symbol_ids = json.loads(read_text(os.path.join(emb_dir, "symbol_ids.json")))
-    return {"df": df, "file_index": file_index, "symbol_index": symbol_index, "file_ids": file_ids, "symbol_ids": symbol_ids}
+    # search label -> uid (uid ids for ID-mapped indices, positions for older bundles)
+    return {"df": df, "file_index": file_index, "symbol_index": symbol_index, "file_ids": file_ids, "symbol_ids": symbol_ids,
+            "file_labels": label_map(file_index, file_ids), "symbol_labels": label_map(symbol_index, symbol_ids)}
 
 def embed_query(texts: List[str]) -> np.ndarray:
     try:
@@ -266,17 +269,19 @@ def search_hybrid_plus(
     topk_file: int,
     topk_symbol: int,
     extra_file: int = 6,
-    extra_symbol: int = 10
+    extra_symbol: int = 10,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None
 ) -> Tuple[pd.DataFrame, pd.DataFrame]:
-    """Hybrid FAISS retrieval + per-section lexical boosters; returns (file_hits, sym_hits)."""
-    import faiss  # noqa: F401
-
+    """
+    Hybrid vector retrieval (FAISS, or NumPy without it) + per-section lexical boosters; returns (file_hits, sym_hits).
+    nprobe (IVF) / ef_search (HNSW) override the search defaults saved with the indices.
+    """
     # Vector search
     qvec = embed_query([query])[0].reshape(1, -1)
-    Df, If = emb["file_index"].search(qvec, topk_file)
-    Ds, Is = emb["symbol_index"].search(qvec, topk_symbol)
-    fids = [emb["file_ids"][i] for i in If[0]]
-    sids = [emb["symbol_ids"][i] for i in Is[0]]
+    Df, Uf = search_uids(emb["file_index"], emb["file_labels"], qvec, topk_file, nprobe, ef_search)
+    Ds, Us = search_uids(emb["symbol_index"], emb["symbol_labels"], qvec, topk_symbol, nprobe, ef_search)
+    fids, sids = Uf[0], Us[0]
     df = emb["df"].set_index("uid")
     file_hits = df.loc[fids].reset_index().assign(score=Df[0])
     sym_hits = df.loc[sids].reset_index().assign(score=Ds[0])
@@ -562,7 +567,9 @@ with st.sidebar:
     if wiki_xml_path:
         suggested_graph_id = infer_graph_id_from_wiki_path(wiki_xml_path)
         if suggested_graph_id:
-            suggested_emb_dir = os.path.join(".cache", "embeddings", suggested_graph_id)
+            # bundle recorded in the artifact catalog by build_code_embeddings, else the default location
+            bundles = find_artifacts("embeddings", graph_id=suggested_graph_id)
+            suggested_emb_dir = bundles[0]["path"] if bundles else os.path.join(".cache", "embeddings", suggested_graph_id)
     embed_dir = st.text_input("Embeddings folder", value=suggested_emb_dir, help="E.g., .cache/embeddings/<graph_id>")
     lang_text = st.text_input("Language for docs", value="English")
 
@@ -580,6 +587,10 @@ with st.sidebar:
     topk_file = st.number_input("Top-K files (FAISS)", min_value=2, max_value=50, value=8, step=1)
     max_units = st.number_input("Max units in context", min_value=6, max_value=50, value=16, step=1)
     max_code_chars = st.number_input("Max code chars per unit", min_value=300, max_value=4000, value=1200, step=100)
+    nprobe = st.number_input("IVF nprobe (0 = index default)", min_value=0, max_value=4096, value=0, step=8,
+                             help="Lists probed per query on IVF indices: higher is slower and more exact")
+    ef_search = st.number_input("HNSW efSearch (0 = index default)", min_value=0, max_value=4096, value=0, step=16,
+                                help="Candidate list size per query on HNSW indices")
 
     st.divider()
     st.header("Generation")
@@ -608,7 +619,7 @@ pages_order: List[str] = []
 sections_by_id: Dict[str, str] = {}
 if wiki_xml_path and os.path.isfile(wiki_xml_path):
     try:
-        wiki = load_wiki_xml(wiki_xml_path)
+        wiki = cached_load(wiki_xml_path, load_wiki_xml)
         # section id -> title
         for s in wiki.get("sections", []):
             sections_by_id[s["id"]] = s["title"]
@@ -629,7 +640,8 @@ if wiki_xml_path and os.path.isfile(wiki_xml_path):
 
 if embed_dir and os.path.isdir(embed_dir):
     try:
-        emb = load_embeddings_bundle(embed_dir)
+        # memoized on the directory's file mtimes/sizes: FAISS indices + units load once per bundle
+        emb = cached_load(embed_dir, load_embeddings_bundle)
     except Exception as e:
         st.error(f"Failed to load embeddings bundle: {e}")
         with st.expander("Traceback"):
@@ -731,7 +743,9 @@ def generate_one_page(
         emb=emb,
         topk_file=int(retrieval_knobs["topk_file"]),
         topk_symbol=int(retrieval_knobs["topk_symbol"]),
-        extra_file=6, extra_symbol=10
+        extra_file=6, extra_symbol=10,
+        nprobe=int(retrieval_knobs["nprobe"]) or None,
+        ef_search=int(retrieval_knobs["ef_search"]) or None
     )
 
     # Build prompts
@@ -834,6 +848,8 @@ def run_generation(page_ids: List[str]):
         "topk_file": int(topk_file),
         "max_units": int(max_units),
         "max_code_chars": int(max_code_chars),
+        "nprobe": int(nprobe),
+        "ef_search": int(ef_search),
     }
     gen_knobs = {
         "min_refs": int(min_refs),
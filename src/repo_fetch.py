@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+GitHub fetch helpers shared by the KG apps and build_code_embeddings: default
+branch / commit SHA resolution and a persistent archive cache.
+
+Layout under .cache/archives/<owner>/<repo>/:
+  - refs.json            default branch + ref -> commit SHA, with ETags
+  - <sha>.zip            finished archive for a resolved commit
+  - ref-<branch>.zip     archive keyed by branch when the SHA could not be resolved
+  - <key>.zip.json       {url, etag, sha, ref, size, fetched_at}
+  - <key>.zip.part       partial download (resumed with Range/If-Range)
+
+Endpoints come from GITHUB_API_BASE / GITHUB_CODELOAD_BASE so the cache can be
+exercised against a local HTTP stand-in.
+"""
+
+import json
+import os
+import re
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+GITHUB_API_BASE = os.environ.get("GITHUB_API_BASE", "https://api.github.com").rstrip("/")
+GITHUB_CODELOAD_BASE = os.environ.get("GITHUB_CODELOAD_BASE", "https://codeload.github.com").rstrip("/")
+
+DEFAULT_ARCHIVE_DIR = os.path.join(os.getcwd(), ".cache", "archives")
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+DEFAULT_BRANCH_TTL_SECONDS = 24 * 3600   # default branch is re-validated at most daily
+MAX_ARCHIVES_PER_REPO = 3                # keep the newest N commit archives per repo
+
+USER_AGENT = "streamlit-kg-app"
+_SHA_RE = re.compile(r"^[0-9a-f]{40}$")
+
+# ===================== Utilities =====================
+
+def now_iso():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def _open(url: str, token: Optional[str] = None, headers: Optional[Dict[str, str]] = None,
+          method: Optional[str] = None, timeout: int = 30):
+    h = {"User-Agent": USER_AGENT}
+    if token:
+        h["Authorization"] = f"Bearer {token}"
+    h.update(headers or {})
+    return urlopen(Request(url, headers=h, method=method), timeout=timeout)
+
+def _load_json(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def _save_json(obj: dict, path: str):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+def repo_archive_dir(owner: str, repo: str, cache_dir: str = DEFAULT_ARCHIVE_DIR) -> str:
+    path = os.path.join(cache_dir, owner, repo)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def _safe_ref(ref: str) -> str:
+    return re.sub(r"[^\w\-\.]+", "_", ref)
+
+# ===================== Ref resolution =====================
+
+def can_download_zip(owner: str, repo: str, branch: str) -> bool:
+    url = f"{GITHUB_CODELOAD_BASE}/{owner}/{repo}/zip/refs/heads/{branch}"
+    try:
+        with _open(url, method="HEAD", timeout=10) as resp:
+            return resp.status == 200
+    except Exception:
+        return False
+
+def get_default_branch(owner: str, repo: str, token: Optional[str] = None,
+                       cache_dir: str = DEFAULT_ARCHIVE_DIR) -> str:
+    """
+    Default branch from the repos API, cached in refs.json: skipped entirely within
+    DEFAULT_BRANCH_TTL_SECONDS, otherwise re-validated with If-None-Match (a 304 is
+    free of rate limit). Falls back to the last known value, then main/master probing.
+    """
+    refs_path = os.path.join(repo_archive_dir(owner, repo, cache_dir), "refs.json")
+    refs = _load_json(refs_path)
+    entry = refs.get("repo", {})
+    if entry.get("default_branch") and time.time() - entry.get("checked_at", 0) < DEFAULT_BRANCH_TTL_SECONDS:
+        return entry["default_branch"]
+
+    headers = {"If-None-Match": entry["etag"]} if entry.get("etag") and entry.get("default_branch") else {}
+    try:
+        with _open(f"{GITHUB_API_BASE}/repos/{owner}/{repo}", token=token, headers=headers) as resp:
+            info = json.load(resp)
+            etag = resp.headers.get("ETag")
+        if info.get("default_branch"):
+            refs["repo"] = {"default_branch": info["default_branch"], "etag": etag, "checked_at": time.time()}
+            _save_json(refs, refs_path)
+            return info["default_branch"]
+    except HTTPError as e:
+        if e.code == 304:
+            refs["repo"] = entry | {"checked_at": time.time()}
+            _save_json(refs, refs_path)
+            return entry["default_branch"]
+    except Exception:
+        pass
+    if entry.get("default_branch"):
+        return entry["default_branch"]
+    for candidate in ("main", "master"):
+        if can_download_zip(owner, repo, candidate):
+            return candidate
+    return "main"
+
+def resolve_commit_sha(owner: str, repo: str, ref: str, token: Optional[str] = None,
+                       cache_dir: str = DEFAULT_ARCHIVE_DIR) -> Optional[str]:
+    """
+    Resolve a branch/tag/commit-ish to a full commit SHA via the commits API
+    (sha media type, conditional on the cached ETag). None if it cannot be resolved.
+    """
+    if _SHA_RE.match(ref or ""):
+        return ref
+    refs_path = os.path.join(repo_archive_dir(owner, repo, cache_dir), "refs.json")
+    refs = _load_json(refs_path)
+    commits = refs.setdefault("commits", {})
+    entry = commits.get(ref, {})
+    headers = {"Accept": "application/vnd.github.sha"}
+    if entry.get("etag") and entry.get("sha"):
+        headers["If-None-Match"] = entry["etag"]
+    try:
+        with _open(f"{GITHUB_API_BASE}/repos/{owner}/{repo}/commits/{ref}", token=token, headers=headers) as resp:
+            sha = resp.read().decode("utf-8", errors="ignore").strip()
+            etag = resp.headers.get("ETag")
+    except HTTPError as e:
+        return entry.get("sha") if e.code == 304 else None
+    except Exception:
+        return None
+    if not _SHA_RE.match(sha):
+        return None
+    commits[ref] = {"sha": sha, "etag": etag, "checked_at": time.time()}
+    _save_json(refs, refs_path)
+    return sha
+
+# ===================== Archive cache =====================
+
+def _prune_archives(repo_dir: str, keep: int = MAX_ARCHIVES_PER_REPO):
+    zips = [os.path.join(repo_dir, n) for n in os.listdir(repo_dir) if _SHA_RE.match(n[:-4]) and n.endswith(".zip")]
+    zips.sort(key=os.path.getmtime, reverse=True)
+    for p in zips[keep:]:
+        for q in (p, p + ".json"):
+            try:
+                os.remove(q)
+            except OSError:
+                pass
+
+def fetch_repo_archive(owner: str, repo: str, ref: str, token: Optional[str] = None,
+                       cache_dir: str = DEFAULT_ARCHIVE_DIR, progress=None) -> Dict[str, Any]:
+    """
+    Return {path, sha, from_cache, bytes_downloaded} for a local ZIP of owner/repo@ref.
+
+      - ref resolved to a commit SHA and <sha>.zip cached -> no archive request at all
+      - otherwise GET codeload (by SHA when known), If-None-Match against the cached
+        ETag (304 -> reuse), Range/If-Range to resume a leftover .part file
+      - the body is streamed to disk in DOWNLOAD_CHUNK_BYTES chunks
+    progress (optional) is a st.progress-like object.
+    """
+    repo_dir = repo_archive_dir(owner, repo, cache_dir)
+    sha = resolve_commit_sha(owner, repo, ref, token=token, cache_dir=cache_dir)
+    key = sha or f"ref-{_safe_ref(ref)}"
+    zip_path = os.path.join(repo_dir, key + ".zip")
+    meta_path = zip_path + ".json"
+    part_path = zip_path + ".part"
+    meta = _load_json(meta_path)
+
+    if sha and os.path.isfile(zip_path):
+        os.utime(zip_path)
+        return {"path": zip_path, "sha": sha, "from_cache": True, "bytes_downloaded": 0}
+
+    if sha:
+        url = f"{GITHUB_CODELOAD_BASE}/{owner}/{repo}/zip/{sha}"
+    else:
+        url = f"{GITHUB_CODELOAD_BASE}/{owner}/{repo}/zip/refs/heads/{ref}"
+
+    headers = {}
+    if os.path.isfile(zip_path) and meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    offset = 0
+    if os.path.isfile(part_path) and meta.get("part_etag") and meta.get("part_url") == url:
+        offset = os.path.getsize(part_path)
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = meta["part_etag"]
+
+    try:
+        resp = _open(url, headers=headers, timeout=60)
+    except HTTPError as e:
+        if e.code == 304:
+            os.utime(zip_path)
+            return {"path": zip_path, "sha": meta.get("sha") or sha, "from_cache": True, "bytes_downloaded": 0}
+        if e.code == 416 and offset:
+            # stale partial (archive changed or already complete): start over
+            os.remove(part_path)
+            return fetch_repo_archive(owner, repo, ref, token=token, cache_dir=cache_dir, progress=progress)
+        raise
+
+    downloaded = 0
+    with resp:
+        etag = resp.headers.get("ETag")
+        if resp.status != 206:
+            offset = 0
+        length = resp.headers.get("Content-Length")
+        total = offset + int(length) if length and length.isdigit() else None
+        _save_json(meta | {"part_url": url, "part_etag": etag}, meta_path)
+        with open(part_path, "ab" if offset else "wb") as f:
+            while True:
+                chunk = resp.read(DOWNLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                f.write(chunk)
+                downloaded += len(chunk)
+                if progress:
+                    done = offset + downloaded
+                    frac = min(done / total, 1.0) if total else 0.0
+                    progress.progress(frac, text=f"Downloading archive... {done / 1e6:.1f} MB")
+
+    os.replace(part_path, zip_path)
+    _save_json({
+        "url": url, "etag": etag, "sha": sha, "ref": ref,
+        "size": os.path.getsize(zip_path), "fetched_at": now_iso(),
+    }, meta_path)
+    if sha:
+        _prune_archives(repo_dir)
+    return {"path": zip_path, "sha": sha, "from_cache": False, "bytes_downloaded": downloaded}
@@ -0,0 +1,791 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shared repository scanning: repository sources (directory, ZIP archive or
+local git repository), text reading, polyglot parsers and a multi-process scan driver used
+by the KG builders (kg_generator, wiki apps) and build_code_embeddings.
+
+The parsers live in an importable module (rather than inside the Streamlit
+scripts) so that worker processes can run them.
+
+Each file's parse runs under a time budget (PARSE_TIME_BUDGET_S, enforced with
+SIGALRM, which also interrupts a running regex); a file that exceeds it is
+re-parsed with the line-by-line fallback scanner (lang_scanners) instead of
+stalling the build. Per-file parse times are returned with each scan result and
+summarized by ParseReport for the build meta.
+
+Generated, minified, vendored and git-ignored files (file_classifier) are
+skipped before parsing: their records carry the reason under "skipped" and no
+symbols or units.
+
+Byte-identical files (copied configs, vendored headers, duplicated examples)
+are parsed once: scan_repo_files takes content_keys() and hands every copy the
+first file's result, re-keyed to the copy's path.
+"""
+
+import ast
+import bisect
+import hashlib
+import heapq
+import io
+import multiprocessing
+import os
+import re
+import signal
+import threading
+import time
+import zipfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from code_units import extract_unit_records, rebase_unit_records
+from file_classifier import FileClassifier
+from lang_scanners import line_scan_text, scan_text
+
+# Optional: GitPython (local working tree / bare repo ingestion)
+try:
+    import git
+    GIT_AVAILABLE = True
+except Exception:
+    GIT_AVAILABLE = False
+
+# ===================== Configuration =====================
+
+SKIP_DIRS = {
+    ".git", "__pycache__", "venv", ".venv", "build", "dist", "node_modules",
+    ".mypy_cache", ".pytest_cache", "target", "out", ".gradle", ".idea"
+}
+MAX_FILE_BYTES = 2 * 1024 * 1024  # 2MB per file safety limit
+
+# Version of the per-file records the parsers produce; bump it whenever their
+# output changes (rules, import naming, record fields) so incremental rebuilds
+# re-parse files whose stored records came from an older parser.
+PARSER_VERSION = 4
+
+# Language sets by extension (lowercase, without dot)
+PY_EXTS   = {"py"}
+JS_TS_EXTS= {"js", "jsx", "ts", "tsx", "mjs", "cjs"}
+JAVA_EXTS = {"java"}
+GO_EXTS   = {"go"}
+C_EXTS    = {"c", "h"}
+CPP_EXTS  = {"cc", "cpp", "cxx", "hpp", "hh", "hxx", "h++", "c++"}
+RUST_EXTS = {"rs"}
+RUBY_EXTS = {"rb"}
+PHP_EXTS  = {"php"}
+KT_EXTS   = {"kt", "kts"}
+
+# Files handed to a worker per task; small enough to keep workers busy, large
+# enough to amortize pickling of the results.
+DEFAULT_SCAN_CHUNK = 64
+
+README_NAME_RE = re.compile(r"(?i)^readme(\.(md|rst|txt))?$")
+
+# Seconds one file may spend in its parsers (graph symbols + embedding units)
+# before falling back to the line scanner; 0 disables the budget.
+PARSE_TIME_BUDGET_S = float(os.environ.get("PARSE_TIME_BUDGET_S", "5"))
+SLOWEST_FILES_REPORTED = 20
+
+# ===================== Files =====================
+
+def detect_lang_by_ext(ext: str) -> str:
+    e = ext.lower().lstrip(".")
+    if e in PY_EXTS: return "python"
+    if e in JS_TS_EXTS: return "javascript"
+    if e in JAVA_EXTS: return "java"
+    if e in GO_EXTS: return "go"
+    if e in CPP_EXTS or e in C_EXTS: return "cpp" if e in CPP_EXTS else "c"
+    if e in RUST_EXTS: return "rust"
+    if e in RUBY_EXTS: return "ruby"
+    if e in PHP_EXTS: return "php"
+    if e in KT_EXTS: return "kotlin"
+    return "text"
+
+def iter_repo_files(root_dir: str, subpath: Optional[str] = None, max_files: Optional[int] = None):
+    base = os.path.join(root_dir, subpath) if subpath else root_dir
+    count = 0
+    for dirpath, dirnames, filenames in os.walk(base):
+        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.startswith(".")]
+        for fn in filenames:
+            abs_path = os.path.join(dirpath, fn)
+            rel_path = os.path.relpath(abs_path, root_dir).replace("\\", "/")
+            yield abs_path, rel_path
+            count += 1
+            if max_files and count >= max_files:
+                return
+
+def is_readme_path(rel_path: str) -> bool:
+    return bool(README_NAME_RE.match(rel_path.rsplit("/", 1)[-1]))
+
+def decode_text_bytes(data: bytes) -> Optional[str]:
+    if b"\x00" in data:
+        return None
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return data.decode("utf-8", errors="ignore")
+
+def file_size(path: str) -> Optional[int]:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+def read_text_file(path: str) -> Optional[str]:
+    try:
+        if os.path.getsize(path) > MAX_FILE_BYTES:
+            return None
+        with open(path, "rb") as f:
+            data = f.read()
+        return decode_text_bytes(data)
+    except Exception:
+        return None
+
+def hash_file(path: str) -> Optional[str]:
+    """
+    Content hash used for incremental rebuilds. Files above MAX_FILE_BYTES are
+    never parsed, so they are keyed by size only instead of being read.
+    """
+    try:
+        size = os.path.getsize(path)
+        if size > MAX_FILE_BYTES:
+            return f"size:{size}"
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        return h.hexdigest()
+    except Exception:
+        return None
+
+# ===================== Repository sources =====================
+# A source lists (locator, rel_path) pairs and reads/hashes a file by locator.
+# Sources are picklable so worker processes can read files themselves.
+
+class DirRepoSource:
+    """
+    Repository already on disk (extracted archive or working tree); locators are absolute paths.
+    """
+    kind = "dir"
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+
+    def describe(self) -> Dict[str, str]:
+        path = os.path.abspath(self.root_dir)
+        return {"owner": "local", "repo": os.path.basename(os.path.normpath(path)), "branch": "",
+                "commit_sha": "", "source_url": f"file://{path}"}
+
+    def iter_files(self, subpath: Optional[str] = None, max_files: Optional[int] = None):
+        return iter_repo_files(self.root_dir, subpath, max_files=max_files)
+
+    def iter_dir_files(self, rel_dir: str = ""):
+        """
+        Files directly inside rel_dir (non-recursive), as (locator, rel_path).
+        """
+        base = os.path.join(self.root_dir, rel_dir) if rel_dir else self.root_dir
+        try:
+            names = sorted(os.listdir(base))
+        except OSError:
+            return
+        for fn in names:
+            abs_path = os.path.join(base, fn)
+            if os.path.isfile(abs_path):
+                yield abs_path, os.path.relpath(abs_path, self.root_dir).replace("\\", "/")
+
+    def file_size(self, locator: str) -> Optional[int]:
+        return file_size(locator)
+
+    def read_text(self, locator: str) -> Optional[str]:
+        return read_text_file(locator)
+
+    def content_hash(self, locator: str) -> Optional[str]:
+        return hash_file(locator)
+
+    def close(self):
+        pass
+
+class ZipRepoSource:
+    """
+    GitHub archive read straight from the ZIP, without extracting it to disk.
+    Members are filtered (SKIP_DIRS, hidden dirs, subpath) by name and
+    MAX_FILE_BYTES by the uncompressed size recorded in the central directory,
+    so skipped/oversized members are never decompressed. Locators are member names.
+    Member names are kept sorted, so a subpath listing only visits that subtree.
+
+    zip_data is the downloaded archive (bytes) or a path to a .zip file.
+    """
+    kind = "zip"
+
+    def __init__(self, zip_data: Union[bytes, str], root_prefix: Optional[str] = None):
+        self._data = zip_data if isinstance(zip_data, (bytes, bytearray)) else None
+        self.zip_path = None if self._data is not None else zip_data
+        self._zf = None
+        self._pid = None
+        self._infos = {}
+        self._names = []
+        self.root_prefix = root_prefix if root_prefix is not None else self._detect_root_prefix()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.update(_zf=None, _pid=None, _infos={}, _names=[])
+        return state
+
+    def _zip(self) -> zipfile.ZipFile:
+        # One handle per process: a forked child must not share the parent's file offset.
+        if self._zf is None or self._pid != os.getpid():
+            self._zf = zipfile.ZipFile(io.BytesIO(self._data) if self._data is not None else self.zip_path)
+            self._pid = os.getpid()
+            self._infos = {i.filename: i for i in self._zf.infolist()}
+            self._names = sorted(n for n, i in self._infos.items() if not i.is_dir())
+        return self._zf
+
+    def _iter_names_under(self, base: str):
+        names = self._names
+        for k in range(bisect.bisect_left(names, base), len(names)):
+            if not names[k].startswith(base):
+                return
+            yield names[k]
+
+    def _detect_root_prefix(self) -> str:
+        # codeload archives hold a single <repo>-<branch>/ dir; pick the largest top dir by file count
+        counts = {}
+        for info in self._zip().infolist():
+            if not info.is_dir() and "/" in info.filename:
+                top = info.filename.split("/", 1)[0]
+                counts[top] = counts.get(top, 0) + 1
+        if not counts:
+            raise RuntimeError("Unexpected ZIP structure.")
+        return max(counts, key=counts.get)
+
+    def iter_files(self, subpath: Optional[str] = None, max_files: Optional[int] = None):
+        prefix = self.root_prefix + "/"
+        sub = (subpath or "").strip("/")
+        base = prefix + sub + "/" if sub else prefix
+        count = 0
+        self._zip()
+        for name in self._iter_names_under(base):
+            dirs = name[len(base):].split("/")[:-1]
+            if any(d in SKIP_DIRS or d.startswith(".") for d in dirs):
+                continue
+            yield name, name[len(prefix):]
+            count += 1
+            if max_files and count >= max_files:
+                return
+
+    def iter_dir_files(self, rel_dir: str = ""):
+        """
+        Members directly inside rel_dir (non-recursive), as (locator, rel_path).
+        """
+        prefix = self.root_prefix + "/"
+        rel_dir = rel_dir.strip("/")
+        base = prefix + rel_dir + "/" if rel_dir else prefix
+        self._zip()
+        k = bisect.bisect_left(self._names, base)
+        names = self._names
+        while k < len(names) and names[k].startswith(base):
+            rest = names[k][len(base):]
+            if "/" not in rest:
+                yield names[k], names[k][len(prefix):]
+                k += 1
+            else:
+                # skip the whole subdirectory: jump past every name sharing "<base><subdir>/"
+                k = bisect.bisect_left(names, base + rest.split("/", 1)[0] + "0", k)  # "0" sorts right after "/"
+
+    def file_size(self, locator: str) -> Optional[int]:
+        self._zip()
+        info = self._infos.get(locator)
+        return info.file_size if info else None
+
+    def read_text(self, locator: str) -> Optional[str]:
+        zf = self._zip()
+        info = self._infos.get(locator)
+        if info is None or info.file_size > MAX_FILE_BYTES:
+            return None
+        try:
+            return decode_text_bytes(zf.read(info))
+        except Exception:
+            return None
+
+    def content_hash(self, locator: str) -> Optional[str]:
+        # CRC + size come from the central directory, so hashing costs no decompression.
+        self._zip()
+        info = self._infos.get(locator)
+        if info is None:
+            return None
+        if info.file_size > MAX_FILE_BYTES:
+            return f"size:{info.file_size}"
+        return f"crc32:{info.CRC:08x}:{info.file_size}"
+
+    def close(self):
+        if self._zf is not None:
+            self._zf.close()
+        self._zf, self._pid, self._infos = None, None, {}
+
+class GitRepoSource:
+    """
+    Local working tree or bare repository read straight from the git object
+    database at a commit-ish (default HEAD): no checkout, no extraction.
+    Uncommitted changes are not visible. Locators are blob SHAs, which double as
+    content hashes; blob sizes are checked before the content is streamed.
+    """
+    kind = "git"
+
+    def __init__(self, repo_path: str, rev: Optional[str] = None):
+        if not GIT_AVAILABLE:
+            raise RuntimeError("GitPython is required for local git sources (pip install GitPython).")
+        self.repo_path = os.path.abspath(repo_path)
+        self._repo = None
+        self._pid = None
+        repo = self._git()
+        commit = repo.commit(rev or "HEAD")
+        self.commit_sha = commit.hexsha
+        if rev:
+            self.ref_name = rev
+        elif not repo.head.is_detached:
+            self.ref_name = repo.active_branch.name
+        else:
+            self.ref_name = commit.hexsha[:12]
+        top = repo.working_tree_dir or repo.git_dir
+        name = os.path.basename(os.path.normpath(top))
+        self.repo_name = name[:-4] if name.endswith(".git") else name
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.update(_repo=None, _pid=None)
+        return state
+
+    def _git(self):
+        # One Repo per process: its persistent `git cat-file` pipes must not be shared across fork.
+        if self._repo is None or self._pid != os.getpid():
+            self._repo = git.Repo(self.repo_path)
+            self._pid = os.getpid()
+        return self._repo
+
+    def _tree(self, rel_dir: str):
+        tree = self._git().commit(self.commit_sha).tree
+        rel_dir = (rel_dir or "").strip("/")
+        if not rel_dir:
+            return tree
+        try:
+            sub = tree / rel_dir
+        except KeyError:
+            return None
+        return sub if sub.type == "tree" else None
+
+    def describe(self) -> Dict[str, str]:
+        return {"owner": "local", "repo": self.repo_name, "branch": self.ref_name,
+                "commit_sha": self.commit_sha, "source_url": f"file://{self.repo_path}@{self.commit_sha}"}
+
+    def iter_files(self, subpath: Optional[str] = None, max_files: Optional[int] = None):
+        tree = self._tree(subpath or "")
+        if tree is None:
+            return
+        count = 0
+        stack = [tree]
+        while stack:
+            t = stack.pop()
+            for blob in t.blobs:
+                if blob.mode == blob.link_mode:
+                    continue
+                yield blob.hexsha, blob.path
+                count += 1
+                if max_files and count >= max_files:
+                    return
+            subdirs = [d for d in t.trees if d.name not in SKIP_DIRS and not d.name.startswith(".")]
+            stack.extend(reversed(subdirs))
+
+    def iter_dir_files(self, rel_dir: str = ""):
+        tree = self._tree(rel_dir)
+        if tree is None:
+            return
+        for blob in tree.blobs:
+            if blob.mode != blob.link_mode:
+                yield blob.hexsha, blob.path
+
+    def read_text(self, locator: str) -> Optional[str]:
+        try:
+            odb = self._git().odb
+            binsha = bytes.fromhex(locator)
+            if odb.info(binsha).size > MAX_FILE_BYTES:
+                return None
+            return decode_text_bytes(odb.stream(binsha).read())
+        except Exception:
+            return None
+
+    def content_hash(self, locator: str) -> Optional[str]:
+        return f"git:{locator}"
+
+    def close(self):
+        if self._repo is not None:
+            self._repo.close()
+        self._repo, self._pid = None, None
+
+def open_local_repo_source(path: str, rev: Optional[str] = None):
+    """
+    Local path → GitRepoSource when it is a git working tree or bare repo (read at
+    rev, default HEAD), otherwise a plain DirRepoSource (rev must then be empty).
+    """
+    path = os.path.abspath(os.path.expanduser(path))
+    if not os.path.isdir(path):
+        raise ValueError(f"Local path does not exist or is not a directory: {path}")
+    is_git = os.path.exists(os.path.join(path, ".git")) or (
+        os.path.isfile(os.path.join(path, "HEAD")) and os.path.isdir(os.path.join(path, "objects"))
+    )
+    if is_git:
+        return GitRepoSource(path, rev=rev)
+    if rev:
+        raise ValueError(f"{path} is not a git repository; a commit-ish cannot be used.")
+    return DirRepoSource(path)
+
+def open_repo_source(root) -> Any:
+    """
+    Accept either a directory path or an already constructed source.
+    """
+    return DirRepoSource(root) if isinstance(root, str) else root
+
+# ===================== Language Parsers =====================
+
+def parse_python_text(py_src: str):
+    classes, imports, functions = [], [], []
+    try:
+        tree = ast.parse(py_src)
+    except SyntaxError:
+        return classes, imports, functions
+    if hasattr(tree, "body"):
+        for n in tree.body:
+            if isinstance(n, ast.FunctionDef) or isinstance(n, ast.AsyncFunctionDef):
+                functions.append(n.name)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ClassDef):
+            classes.append(node.name)
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                imports.append({"type": "import", "module": alias.name, "names": [], "level": 0})
+        elif isinstance(node, ast.ImportFrom):
+            mod = node.module or ""
+            names = [alias.name for alias in node.names]
+            imports.append({"type": "from", "module": mod, "names": names, "level": node.level or 0})
+    return classes, imports, functions
+
+# The regex-parsed languages share one precompiled single-pass scanner each
+# (lang_scanners); these wrappers keep the per-language entry points.
+
+def parse_js_ts_text(src: str):
+    return scan_text("javascript", src)
+
+def parse_java_text(src: str):
+    return scan_text("java", src)
+
+def parse_go_text(src: str):
+    return scan_text("go", src)
+
+def parse_c_cpp_text(src: str):
+    """#include -> imports, class/struct -> classes, top-level definitions (not declarations) -> functions."""
+    return scan_text("c", src)
+
+def parse_rust_text(src: str):
+    return scan_text("rust", src)
+
+def parse_ruby_text(src: str):
+    return scan_text("ruby", src)
+
+def parse_php_text(src: str):
+    return scan_text("php", src)
+
+def parse_kotlin_text(src: str):
+    return scan_text("kotlin", src)
+
+def parse_any_text_by_ext(ext: str, text: str):
+    e = ext.lower().lstrip(".")
+    if e in PY_EXTS: return parse_python_text(text)
+    if e in JS_TS_EXTS: return parse_js_ts_text(text)
+    if e in JAVA_EXTS: return parse_java_text(text)
+    if e in GO_EXTS: return parse_go_text(text)
+    if e in C_EXTS or e in CPP_EXTS: return parse_c_cpp_text(text)
+    if e in RUST_EXTS: return parse_rust_text(text)
+    if e in RUBY_EXTS: return parse_ruby_text(text)
+    if e in PHP_EXTS: return parse_php_text(text)
+    if e in KT_EXTS: return parse_kotlin_text(text)
+    return [], [], []
+
+def line_parse_text_by_ext(ext: str, text: str):
+    """Fallback for parse_any_text_by_ext: bounded-time line scan, any language."""
+    return line_scan_text(detect_lang_by_ext(ext), text)
+
+# ===================== Parse time budget =====================
+
+class ParseTimeout(Exception):
+    pass
+
+def parse_budget_enforceable() -> bool:
+    """SIGALRM can only be armed from the main thread (and not at all on Windows)."""
+    return hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+
+def _raise_parse_timeout(signum, frame):
+    raise ParseTimeout()
+
+@contextmanager
+def parse_time_budget(seconds: Optional[float]):
+    """Raise ParseTimeout in the block after `seconds`; a no-op when not enforceable."""
+    if not seconds or seconds <= 0 or not parse_budget_enforceable():
+        yield
+        return
+    previous = signal.signal(signal.SIGALRM, _raise_parse_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+class ParseReport:
+    """
+    Collects scan_file timings while a build consumes scan_repo_files and
+    summarizes them for the graph meta (meta["parse"]): the slowest files and
+    the files that fell back to the line scanner, to tune skip rules, and how
+    many files were copies of an already parsed one ("duplicates").
+    """
+    def __init__(self, budget_s: Optional[float] = None, keep: int = SLOWEST_FILES_REPORTED):
+        self.budget_s = PARSE_TIME_BUDGET_S if budget_s is None else budget_s
+        self.keep = keep
+        self.files = 0
+        self.total_ms = 0.0
+        self.fallbacks: List[str] = []
+        self.duplicates = 0
+        self._slowest: List[Tuple[float, str]] = []   # min-heap of (ms, path)
+
+    def add(self, rel_path: str, rec: Dict[str, Any]):
+        if rec.get("dup_of"):
+            self.duplicates += 1
+        ms = rec.get("parse_ms")
+        if ms is None:
+            return
+        self.files += 1
+        self.total_ms += ms
+        if rec.get("parse_fallback"):
+            self.fallbacks.append(rel_path)
+        if len(self._slowest) < self.keep:
+            heapq.heappush(self._slowest, (ms, rel_path))
+        elif ms > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, (ms, rel_path))
+
+    def to_meta(self) -> Dict[str, Any]:
+        return {
+            "budget_s": self.budget_s,
+            "files": self.files,
+            "total_ms": round(self.total_ms, 1),
+            "fallbacks": self.fallbacks,
+            "duplicates": self.duplicates,
+            "slowest": [[path, round(ms, 1)] for ms, path in sorted(self._slowest, reverse=True)],
+        }
+
+# ===================== Parallel scan =====================
+
+def default_scan_workers() -> int:
+    return os.cpu_count() or 1
+
+def count_skipped(totals: Dict[str, Any], rec: Dict[str, Any]) -> Optional[str]:
+    """Count a record's skip reason under totals["skipped"] ({reason: files}); returns the reason."""
+    reason = rec.get("skipped")
+    if reason:
+        skipped = totals.setdefault("skipped", {})
+        skipped[reason] = skipped.get(reason, 0) + 1
+    return reason
+
+def scan_file(locator: str, rel_path: str, source=None, with_units: bool = False,
+              budget_s: Optional[float] = None, classifier: Optional[FileClassifier] = None) -> Dict[str, Any]:
+    """
+    Read + parse one file. Returns {lang, has_text, classes, imports, functions};
+    has_text is False for unreadable/binary/oversized/empty files.
+    locator is an absolute path unless a source (e.g. ZipRepoSource) is given.
+
+    The same read also feeds the other consumers of a build: README files carry
+    their text under "readme", and with_units adds the embedding units
+    (code_units.extract_unit_records) under "units".
+
+    Parsing runs under budget_s (default PARSE_TIME_BUDGET_S); past it the file
+    is parsed again with the line scanner and "parse_fallback" is set. Text
+    files carry "parse_ms" (wall time of the parse, fallback included).
+
+    With a classifier, files it rejects are not parsed: "skipped" holds the
+    reason and has_text stays False. Path rules are checked before the read.
+    """
+    ext = os.path.splitext(rel_path)[1]
+    rec = {"lang": detect_lang_by_ext(ext), "has_text": False, "classes": [], "imports": [], "functions": []}
+    if with_units:
+        rec["units"] = []
+    if classifier is not None:
+        reason = classifier.classify_path(rel_path)
+        if reason:
+            rec["skipped"] = reason
+            return rec
+    text = source.read_text(locator) if source is not None else read_text_file(locator)
+    if not text:
+        return rec
+    if classifier is not None:
+        reason = classifier.classify_text(rel_path, text)
+        if reason:
+            rec["skipped"] = reason
+            return rec
+    t0 = time.perf_counter()
+    try:
+        with parse_time_budget(PARSE_TIME_BUDGET_S if budget_s is None else budget_s):
+            classes, imports, functions = parse_any_text_by_ext(ext, text)
+            units = extract_unit_records(rel_path, text) if with_units else None
+    except ParseTimeout:
+        classes, imports, functions = line_parse_text_by_ext(ext, text)
+        units = extract_unit_records(rel_path, text, by_line=True) if with_units else None
+        rec["parse_fallback"] = True
+    rec["parse_ms"] = (time.perf_counter() - t0) * 1000.0
+    rec.update(has_text=True, classes=classes, imports=imports, functions=functions)
+    if is_readme_path(rel_path):
+        rec["readme"] = text
+    if with_units:
+        rec["units"] = units
+    return rec
+
+_worker_source = None
+_worker_with_units = False
+_worker_budget_s = None
+_worker_classifier = None
+
+def _init_scan_worker(source, with_units: bool = False, budget_s: Optional[float] = None,
+                      classifier: Optional[FileClassifier] = None):
+    global _worker_source, _worker_with_units, _worker_budget_s, _worker_classifier
+    _worker_source = source
+    _worker_with_units = with_units
+    _worker_budget_s = budget_s
+    _worker_classifier = classifier
+
+def _scan_chunk(chunk: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    return [scan_file(locator, rel_path, _worker_source, _worker_with_units, _worker_budget_s, _worker_classifier)
+            for locator, rel_path in chunk]
+
+def content_keys(file_list: List[Tuple[str, str]], source=None,
+                 hashes: Optional[Dict[str, Optional[str]]] = None) -> List[Optional[str]]:
+    """
+    Dedup key per (locator, rel_path) of file_list for scan_repo_files: files
+    with the same key have identical bytes and parse identically (the extension
+    and README-ness are part of the key). None for files with no copy in the list.
+
+    Only files whose size another file shares are hashed (a directory source
+    reads the file to hash it; ZIP and git hashes cost nothing). hashes
+    ({rel_path: content_hash}, e.g. from an incremental build) are reused.
+    """
+    hashes = hashes or {}
+    # sources without file_size (git: the blob SHA is the hash) skip the size filter
+    size_of = file_size if source is None else getattr(source, "file_size", None)
+    sizes = [size_of(loc) if size_of else -1 for loc, _ in file_list]
+    size_counts = Counter(sizes)
+    keys = []
+    for (locator, rel_path), size in zip(file_list, sizes):
+        if not size or size_counts[size] < 2:  # empty, unknown or unique size
+            keys.append(None)
+            continue
+        h = hashes.get(rel_path) or (source.content_hash(locator) if source is not None else hash_file(locator))
+        if not h or h.startswith("size:"):  # oversized: never parsed
+            keys.append(None)
+            continue
+        ext = os.path.splitext(rel_path)[1].lower()
+        keys.append(f"{h}|{ext}|{int(is_readme_path(rel_path))}")
+    key_counts = Counter(k for k in keys if k)
+    return [k if k and key_counts[k] > 1 else None for k in keys]
+
+def rebase_scan(rec: Dict[str, Any], src_path: str, rel_path: str, content_key: Optional[str] = None) -> Dict[str, Any]:
+    """
+    scan_file result of src_path handed to a byte-identical file at rel_path:
+    units are re-keyed to rel_path, "dup_of" names src_path and the parse time
+    is dropped (nothing was parsed).
+    """
+    copy = dict(rec, dup_of=src_path)
+    copy.pop("parse_ms", None)
+    if "units" in rec:
+        copy["units"] = rebase_unit_records(rec["units"], src_path, rel_path, content_key)
+    return copy
+
+def _mp_context():
+    # Prefer fork: spawn/forkserver re-import __main__, which for Streamlit
+    # entry points would re-run the whole UI script inside every worker.
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+def scan_repo_files(file_list: List[Tuple[str, str]], workers: Optional[int] = None,
+                    chunk_size: int = DEFAULT_SCAN_CHUNK, source=None,
+                    with_units: bool = False, budget_s: Optional[float] = None,
+                    classifier: Optional[FileClassifier] = None,
+                    dedup_keys: Optional[List[Optional[str]]] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Yield (rel_path, scan_file result) for every (locator, rel_path) in file_list,
+    in the same order as file_list regardless of worker count, so callers that
+    assign ids/indices while consuming get identical output to a serial scan.
+
+    workers=None uses all cores; workers<=1 (or a list smaller than one chunk)
+    scans in-process. Results are consumed in the calling process, so progress
+    reporting (e.g. st.progress) belongs in the caller's loop. source is handed
+    to each worker once (not per chunk), as is classifier; with_units, budget_s
+    and classifier are passed on to scan_file.
+
+    The parse budget needs SIGALRM, so an in-process scan only happens where it
+    can be armed (main thread); elsewhere -- e.g. a Streamlit script thread --
+    a small or serial scan still goes through one worker process.
+
+    dedup_keys (content_keys(file_list, source)) makes every distinct content
+    scanned once, by its first file; later copies get that result through
+    rebase_scan, and the units of every copy carry the key as "content_key".
+    Files the classifier rejects by path are scanned on their own.
+    """
+    if dedup_keys is None:
+        yield from _scan_files(file_list, workers, chunk_size, source, with_units, budget_s, classifier)
+        return
+    keys = [None if key and classifier is not None and classifier.classify_path(rel_path) else key
+            for (_, rel_path), key in zip(file_list, dedup_keys)]
+    remaining = Counter(k for k in keys if k)
+    first = {}
+    to_scan = []
+    for item, key in zip(file_list, keys):
+        if key and key in first:
+            continue
+        if key:
+            first[key] = item[1]
+        to_scan.append(item)
+    scans = _scan_files(to_scan, workers, chunk_size, source, with_units, budget_s, classifier)
+    shared = {}   # key -> (rel_path, scan result) of the scanned copy, while copies remain
+    for (_, rel_path), key in zip(file_list, keys):
+        if key and first[key] != rel_path:
+            src_path, rec = shared[key]
+            yield rel_path, rebase_scan(rec, src_path, rel_path, key)
+        else:
+            _, rec = next(scans)
+            if key:
+                if "units" in rec:
+                    rec["units"] = [dict(u, content_key=key) for u in rec["units"]]
+                shared[key] = (rel_path, rec)
+            yield rel_path, rec
+        if key:
+            remaining[key] -= 1
+            if not remaining[key]:
+                del shared[key]
+
+def _scan_files(file_list: List[Tuple[str, str]], workers: Optional[int], chunk_size: int, source,
+                with_units: bool, budget_s: Optional[float],
+                classifier: Optional[FileClassifier]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    workers = workers or default_scan_workers()
+    chunk_size = max(1, int(chunk_size))
+    budget = PARSE_TIME_BUDGET_S if budget_s is None else budget_s
+    if workers <= 1 or len(file_list) <= chunk_size:
+        if budget <= 0 or parse_budget_enforceable() or not hasattr(signal, "setitimer") or not file_list:
+            for locator, rel_path in file_list:
+                yield rel_path, scan_file(locator, rel_path, source, with_units, budget, classifier)
+            return
+        workers = 1
+
+    chunks = [file_list[i:i + chunk_size] for i in range(0, len(file_list), chunk_size)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=_mp_context(),
+                             initializer=_init_scan_worker, initargs=(source, with_units, budget, classifier)) as ex:
+        # map() returns results in submission order, which gives the deterministic merge.
+        for chunk, results in zip(chunks, ex.map(_scan_chunk, chunks)):
+            for (_, rel_path), rec in zip(chunk, results):
+                yield rel_path, rec
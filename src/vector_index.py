@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FAISS indices keyed by unit uid, shared by build_code_embeddings (build /
+delta patch) and the page generators (search).
+
+Vectors are added under a stable int64 id derived from the unit uid
+(uid_to_id: first 63 bits of its sha1), so a unit can be removed or replaced
+without touching the others and search results name uids directly. Bundles
+written before this use a plain IndexFlatIP whose labels are positions in
+<prefix>_ids.json; search_uids accepts both.
+
+Index types (choose_index; "auto" picks by unit count and flat memory size):
+
+  flat    exact IndexFlatIP in an IndexIDMap2             n < FLAT_MAX_UNITS
+  ivf     IVF<nlist>,Flat (ids stored natively)           up to IVFFLAT_MAX_BYTES of vectors
+  ivfpq   IVF<nlist>,PQ<m> (8-bit codes, ~d/m x smaller)  above that
+  hnsw    HNSW<M>,Flat in an IndexIDMap2                  only on request: no removal,
+                                                          so deltas rebuild it
+
+IVF indices are trained on up to IVF_TRAIN_PER_LIST * nlist vectors of the
+build. Query-time knobs (nprobe for IVF, efSearch for HNSW) are baked into the
+saved index as defaults and can be overridden per search without touching
+the (possibly shared) index object.
+
+Bundles also keep the L2-normalized vectors as <prefix>_vectors.npy (float32
+or float16, rows in <prefix>_ids.json order). NumpyIndex searches them exactly
+through a read-only memmap, in blocks of NUMPY_BLOCK_ROWS rows (one matrix
+product plus an argpartition top-k per block), behind the same search() call
+as a faiss index. load_search_index falls back to it when faiss is not
+installed (or VECTOR_SEARCH_BACKEND=numpy), and the vectors let an index be
+rebuilt without embedding anything again.
+
+faiss is imported lazily.
+"""
+
+import hashlib
+import json
+import math
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# recorded in meta.json so readers know how labels map back to uids
+UID_ID_SCHEME = "uid_sha1_63"
+
+INDEX_KINDS = ("auto", "flat", "ivf", "ivfpq", "hnsw")
+FLAT_MAX_UNITS = 50_000
+IVFFLAT_MAX_BYTES = 2 * 1024 ** 3
+IVF_TRAIN_PER_LIST = 64
+IVF_DEFAULT_NPROBE = 16
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_DEFAULT_EF_SEARCH = 64
+PQ_MAX_SUBQUANTIZERS = 64
+PQ_TRAIN_MIN = 16_384           # PQ codebooks (256 centroids each) need more points than small IVFs
+
+VECTOR_SEARCH_BACKEND = os.environ.get("VECTOR_SEARCH_BACKEND", "auto")   # auto | faiss | numpy
+NUMPY_BLOCK_ROWS = 65_536
+VECTOR_DTYPES = ("float32", "float16")
+
+def _faiss():
+    try:
+        import faiss
+    except ImportError:
+        raise RuntimeError("Please install: pip install faiss-cpu")
+    return faiss
+
+def uid_to_id(uid: str) -> int:
+    """Non-negative int64 id for uid (faiss uses -1 for "no result")."""
+    return int.from_bytes(hashlib.sha1(uid.encode("utf-8")).digest()[:8], "big") >> 1
+
+def uid_ids(uids: Sequence[str]) -> np.ndarray:
+    ids = np.fromiter((uid_to_id(u) for u in uids), dtype=np.int64, count=len(uids))
+    if len(np.unique(ids)) != len(ids):
+        dup = {}
+        for u, i in zip(uids, ids.tolist()):
+            if i in dup and dup[i] != u:
+                raise ValueError(f"uid id collision: {dup[i]!r} and {u!r}")
+            dup[i] = u
+    return ids
+
+def have_faiss() -> bool:
+    try:
+        import faiss  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def normalize_rows(vecs: np.ndarray) -> np.ndarray:
+    """float32 copy of vecs with unit-length rows (zero rows stay zero), so inner product is cosine."""
+    vecs = np.asarray(vecs, dtype=np.float32)
+    if vecs.ndim != 2 or not len(vecs):
+        return vecs
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    return vecs / np.where(norms > 0, norms, 1.0)
+
+class NumpyIndex:
+    """Exact inner-product search over an (n, d) matrix, faiss-style (positional labels, -1 padding)."""
+
+    def __init__(self, vectors: np.ndarray, block_rows: int = NUMPY_BLOCK_ROWS):
+        self.vectors = vectors
+        self.ntotal, self.d = vectors.shape
+        self.block_rows = max(1, int(block_rows))
+
+    def search(self, qvecs: np.ndarray, k: int, params=None):
+        qvecs = np.asarray(qvecs, dtype=np.float32)
+        m = len(qvecs)
+        D = np.full((m, k), -np.inf, dtype=np.float32)
+        I = np.full((m, k), -1, dtype=np.int64)
+        for start in range(0, self.ntotal, self.block_rows):
+            block = np.asarray(self.vectors[start:start + self.block_rows], dtype=np.float32)
+            scores = qvecs @ block.T
+            kk = min(k, scores.shape[1])
+            part = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+            # merge this block's top-kk with the running top-k
+            cand_d = np.concatenate([D, np.take_along_axis(scores, part, axis=1)], axis=1)
+            cand_i = np.concatenate([I, part + start], axis=1)
+            keep = np.argpartition(-cand_d, k - 1, axis=1)[:, :k]
+            D = np.take_along_axis(cand_d, keep, axis=1)
+            I = np.take_along_axis(cand_i, keep, axis=1)
+        order = np.argsort(-D, axis=1, kind="stable")
+        return np.take_along_axis(D, order, axis=1), np.take_along_axis(I, order, axis=1)
+
+def save_vectors(path: str, vecs: np.ndarray, dtype: str = "float32"):
+    """Write vecs as .npy through a temp file, so memmaps of the previous file stay valid."""
+    if dtype not in VECTOR_DTYPES:
+        raise ValueError(f"unsupported vector dtype {dtype!r} (expected one of {', '.join(VECTOR_DTYPES)})")
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, np.ascontiguousarray(vecs, dtype=dtype))
+    os.replace(tmp, path)
+
+def merge_vectors(uids: Sequence[str], old_uids: Sequence[str], old_vecs: np.ndarray,
+                  new_uids: Sequence[str], new_vecs: np.ndarray) -> np.ndarray:
+    """float32 rows for uids: from new_vecs when listed in new_uids, else from old_vecs (rows follow old_uids)."""
+    dim = old_vecs.shape[1] if len(old_vecs) else new_vecs.shape[1]
+    out = np.empty((len(uids), dim), dtype=np.float32)
+    new_row = {uid: j for j, uid in enumerate(new_uids)}
+    old_row = {uid: i for i, uid in enumerate(old_uids)}
+    dst_new, src_new, dst_old, src_old = [], [], [], []
+    for k, uid in enumerate(uids):
+        if uid in new_row:
+            dst_new.append(k)
+            src_new.append(new_row[uid])
+        else:
+            dst_old.append(k)
+            src_old.append(old_row[uid])
+    if dst_new:
+        out[dst_new] = new_vecs[src_new]
+    if dst_old:
+        out[dst_old] = old_vecs[np.asarray(src_old, dtype=np.int64)]
+    return out
+
+def load_vectors(path: str) -> np.ndarray:
+    """Read-only memmap of a <prefix>_vectors.npy (rows follow <prefix>_ids.json)."""
+    return np.load(path, mmap_mode="r")
+
+def load_search_index(out_dir: str, prefix: str, backend: Optional[str] = None):
+    """
+    <prefix>.index read by faiss, or a NumpyIndex over <prefix>_vectors.npy when
+    faiss is missing / backend is "numpy" / the bundle has no faiss index.
+    """
+    backend = backend or VECTOR_SEARCH_BACKEND
+    index_path = os.path.join(out_dir, f"{prefix}.index")
+    vectors_path = os.path.join(out_dir, f"{prefix}_vectors.npy")
+    if backend != "numpy" and os.path.isfile(index_path) and (backend == "faiss" or have_faiss()):
+        return _faiss().read_index(index_path)
+    if backend != "faiss" and os.path.isfile(vectors_path):
+        return NumpyIndex(load_vectors(vectors_path))
+    raise RuntimeError(f"No searchable {prefix} index in {out_dir}: install faiss-cpu, "
+                       f"or rebuild the bundle so it has {prefix}_vectors.npy")
+
+def check_bundle_fresh(out_dir: str):
+    """
+    Raise when meta.json marks the bundle stale: the wiki app rewrote
+    units.parquet after the indices / vectors were built, so search labels may
+    name uids that are no longer among the units.
+    """
+    try:
+        with open(os.path.join(out_dir, "meta.json"), "r", encoding="utf-8") as f:
+            stale = json.load(f).get("stale")
+    except (OSError, ValueError):
+        return
+    if stale:
+        graph_id = os.path.basename(os.path.normpath(out_dir))
+        raise RuntimeError(f"Embeddings in {out_dir} are older than its units.parquet; re-embed with: "
+                           f"python build_code_embeddings.py --graph-id {graph_id} --delta")
+
+def _ivf(index):
+    faiss = _faiss()
+    try:
+        return faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return None
+
+def _hnsw(index):
+    faiss = _faiss()
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    return inner if isinstance(inner, faiss.IndexHNSW) else None
+
+def is_id_mapped(index) -> bool:
+    """True when search labels are uid ids (IDMap wrapper or IVF's native ids)."""
+    if isinstance(index, NumpyIndex):
+        return False
+    faiss = _faiss()
+    return isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)) or _ivf(index) is not None
+
+def supports_remove(index) -> bool:
+    return _hnsw(index) is None
+
+def _pq_subquantizers(dim: int) -> int:
+    """Largest divisor of dim <= PQ_MAX_SUBQUANTIZERS leaving >= 4 dims per subquantizer."""
+    for m in range(min(PQ_MAX_SUBQUANTIZERS, dim // 4), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+def choose_index(n: int, dim: int, kind: str = "auto") -> Dict[str, Any]:
+    """Index spec for n vectors of size dim: {kind, factory, params...}; stored in meta.json."""
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"unknown index kind {kind!r} (expected one of {', '.join(INDEX_KINDS)})")
+    if kind == "auto":
+        if n < FLAT_MAX_UNITS:
+            kind = "flat"
+        elif n * dim * 4 <= IVFFLAT_MAX_BYTES:
+            kind = "ivf"
+        else:
+            kind = "ivfpq"
+    if kind == "flat":
+        return {"kind": "flat", "factory": "Flat"}
+    if kind == "hnsw":
+        return {"kind": "hnsw", "factory": f"HNSW{HNSW_M},Flat", "efConstruction": HNSW_EF_CONSTRUCTION,
+                "efSearch": HNSW_DEFAULT_EF_SEARCH}
+    # ~4 sqrt(n) lists (power of two), each trained on enough points
+    nlist = 2 ** max(0, round(math.log2(max(1.0, 4 * math.sqrt(n)))))
+    nlist = max(1, min(nlist, n // IVF_TRAIN_PER_LIST or 1))
+    spec = {"kind": kind, "nlist": nlist, "nprobe": min(nlist, IVF_DEFAULT_NPROBE)}
+    if kind == "ivfpq":
+        spec["m"] = _pq_subquantizers(dim)
+        spec["factory"] = f"IVF{nlist},PQ{spec['m']}"
+    else:
+        spec["factory"] = f"IVF{nlist},Flat"
+    return spec
+
+def new_index(dim: int, spec: Optional[Dict[str, Any]] = None):
+    """Empty inner-product index (cosine for normalized vectors) taking uid ids."""
+    faiss = _faiss()
+    spec = spec or {"kind": "flat", "factory": "Flat"}
+    index = faiss.index_factory(dim, spec["factory"], faiss.METRIC_INNER_PRODUCT)
+    if spec["kind"] == "hnsw":
+        index.hnsw.efConstruction = spec["efConstruction"]
+        index.hnsw.efSearch = spec["efSearch"]
+    elif spec["kind"] in ("ivf", "ivfpq"):
+        index.nprobe = spec["nprobe"]
+        if spec["kind"] == "ivfpq":
+            index.do_polysemous_training = False  # factory default; costs minutes, unused by IP search
+        return index
+    return faiss.IndexIDMap2(index)
+
+def train_index(index, vecs: np.ndarray, spec: Dict[str, Any], seed: int = 0):
+    if index.is_trained:
+        return
+    sample = vecs
+    limit = max(IVF_TRAIN_PER_LIST * spec.get("nlist", 1), PQ_TRAIN_MIN)
+    if len(vecs) > limit:
+        rng = np.random.default_rng(seed)
+        sample = vecs[np.sort(rng.choice(len(vecs), size=limit, replace=False))]
+    index.train(np.ascontiguousarray(sample, dtype=np.float32))
+
+def upsert_units(index, uids: Sequence[str], vecs: np.ndarray) -> int:
+    """
+    Add or replace the vectors of uids; returns how many were already present.
+    Indices without remove_ids (HNSW) only take uids they do not hold yet.
+    """
+    if not len(uids):
+        return 0
+    ids = uid_ids(uids)
+    removed = index.remove_ids(ids) if supports_remove(index) else 0
+    index.add_with_ids(np.ascontiguousarray(vecs, dtype=np.float32), ids)
+    return int(removed)
+
+def remove_units(index, uids: Sequence[str]) -> int:
+    if not len(uids):
+        return 0
+    return int(index.remove_ids(uid_ids(uids)))
+
+def build_id_index(uids: Sequence[str], vecs: np.ndarray, spec: Optional[Dict[str, Any]] = None):
+    index = new_index(vecs.shape[1], spec)
+    if spec:
+        train_index(index, vecs, spec)
+    upsert_units(index, uids, vecs)
+    return index
+
+def rebuild_keeping(index, keep_uids: Sequence[str], spec: Dict[str, Any]):
+    """Fresh index of spec holding the stored vectors of keep_uids (for indices without remove_ids)."""
+    ids = uid_ids(keep_uids)
+    vecs = np.vstack([index.reconstruct(int(i)) for i in ids]) if len(ids) else np.zeros((0, index.d), np.float32)
+    fresh = new_index(index.d, spec)
+    if len(ids):
+        train_index(fresh, vecs, spec)
+        fresh.add_with_ids(vecs, ids)
+    return fresh
+
+def search_params(index, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    """Per-call faiss SearchParameters overriding the index defaults (None when nothing applies)."""
+    if isinstance(index, NumpyIndex) or not (nprobe or ef_search):
+        return None
+    faiss = _faiss()
+    if nprobe and _ivf(index) is not None:
+        return faiss.SearchParametersIVF(nprobe=int(nprobe))
+    if ef_search and _hnsw(index) is not None:
+        return faiss.SearchParametersHNSW(efSearch=int(ef_search))
+    return None
+
+def label_map(index, uids: Sequence[str]) -> Dict[int, str]:
+    """
+    {search label: uid} for index, uids being the bundle's <prefix>_ids.json
+    list: uid ids for an ID-mapped index, positions for a plain one. Build it
+    once per loaded index.
+    """
+    if is_id_mapped(index):
+        return dict(zip(uid_ids(uids).tolist(), uids))
+    return dict(enumerate(uids))
+
+def search_uids(index, labels: Dict[int, str], qvecs: np.ndarray, topk: int,
+                nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> Tuple[List[List[float]], List[List[str]]]:
+    """
+    (scores, uids) per query row; missing results (fewer than topk vectors, or
+    unfilled IVF probes) are dropped. Queries are normalized, so scores are
+    cosines against a normalized bundle. nprobe / ef_search override the
+    index defaults.
+    """
+    params = search_params(index, nprobe, ef_search)
+    qvecs = np.ascontiguousarray(normalize_rows(qvecs))
+    D, I = index.search(qvecs, topk, params=params) if params is not None else index.search(qvecs, topk)
+    out_scores, out_uids = [], []
+    for srow, irow in zip(D.tolist(), I.tolist()):
+        keep = [(s, labels[i]) for s, i in zip(srow, irow) if i in labels]
+        out_scores.append([s for s, _ in keep])
+        out_uids.append([u for _, u in keep])
+    return out_scores, out_uids
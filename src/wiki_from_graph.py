@@ -45,6 +45,8 @@ from collections import Counter
 from typing import Dict, List, Any, Optional
 from dotenv import load_dotenv
 
+from graph_stats import guess_area_from_path, load_graph_stats, summary_from_stats
+
 load_dotenv()
 
 # ---------------------- Graph loading & summarization ----------------------
@@ -101,21 +103,27 @@ def build_file_index(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -
 
     return file_index
 
-def guess_area_from_path(path: str) -> str:
-    p = path.lower()
-    if any(x in p for x in ["infra", "deploy", "k8s", "helm", "terraform", "ansible", "docker", ".github/workflows", "ci", "cd"]):
-        return "Deployment/Infrastructure"
-    if any(x in p for x in ["frontend", "ui", "client", "web", "components", "pages", "src/app", "src/components"]):
-        return "Frontend Components"
-    if any(x in p for x in ["backend", "server", "api", "controllers", "routes", "services"]):
-        return "Backend Systems"
-    if any(x in p for x in ["model", "ml", "nn", "inference", "training", "weights"]):
-        return "Model Integration"
-    if any(x in p for x in ["data", "dataset", "etl", "pipeline", "db", "sql", "repository", "storage"]):
-        return "Data Management/Flow"
-    if any(x in p for x in ["docs", "readme", "readme.md"]):
-        return "Overview"
-    return "Other"
+def summary_meta(meta: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "owner": meta.get("owner", ""),
+        "repo": meta.get("repo", ""),
+        "branch": meta.get("branch", ""),
+        "subpath": meta.get("subpath", ""),
+        "created_at": meta.get("created_at", ""),
+        "totals": meta.get("totals", {}),
+        "graph_id": meta.get("graph_id", "graph"),
+        "source_url": meta.get("source_url", ""),
+    }
+
+def load_summary(graph_path: str, max_files_in_prompt: int = 200, top_imports_k: int = 50) -> Dict[str, Any]:
+    """
+    Summary from the <graph>.stats file written at build time; the graph itself is
+    only loaded and summarized when the stats are missing, stale or too short.
+    """
+    summary = summary_from_stats(load_graph_stats(graph_path), max_files=max_files_in_prompt, top_imports_k=top_imports_k)
+    if summary is not None:
+        return summary | {"meta": summary_meta(summary["meta"])}
+    return summarize_graph(load_graph(graph_path), max_files_in_prompt=max_files_in_prompt, top_imports_k=top_imports_k)
 
 def summarize_graph(graph: Dict[str, Any],
                     max_files_in_prompt: int = 200,
@@ -162,16 +170,7 @@ def summarize_graph(graph: Dict[str, Any],
             top_dirs[parts[0]] += 1
 
     summary = {
-        "meta": {
-            "owner": meta.get("owner", ""),
-            "repo": meta.get("repo", ""),
-            "branch": meta.get("branch", ""),
-            "subpath": meta.get("subpath", ""),
-            "created_at": meta.get("created_at", ""),
-            "totals": meta.get("totals", {}),
-            "graph_id": meta.get("graph_id", "graph"),
-            "source_url": meta.get("source_url", ""),
-        },
+        "meta": summary_meta(meta),
         "langs": langs.most_common(),
         "areas": area_counter.most_common(),
         "top_dirs": top_dirs.most_common(20),
@@ -229,6 +228,7 @@ def build_prompt(summary: Dict[str, Any], lang_text: str) -> str:
             "classes": f["classes"][:12],
             "functions": f["functions"][:12],
             "imports": f["imports"][:12],
+            "depends_on": f.get("depends_on", [])[:12],
         })
 
     prompt = f"""You are a senior documentation architect.
@@ -456,8 +456,9 @@ def main():
     args = parse_args()
 
     # Load and summarize graph
-    graph = load_graph(args.graph)
-    summary = summarize_graph(graph, max_files_in_prompt=args.max_files_in_prompt, top_imports_k=args.top_imports_k)
+    if not os.path.isfile(args.graph):
+        raise FileNotFoundError(f"Graph JSON not found: {args.graph}")
+    summary = load_summary(args.graph, max_files_in_prompt=args.max_files_in_prompt, top_imports_k=args.top_imports_k)
     prompt = build_prompt(summary, lang_text=args.lang_text)
     print(prompt)
     # Generate with qgenie